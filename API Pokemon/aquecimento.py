@@ -0,0 +1,201 @@
+# Aquecimento do cache depois de um deploy ou de um restart do Redis.
+#
+# Os handlers registram cada chave pedida num contador em memória (barato e
+# limitado: quando passa do dobro da capacidade, só as mais frequentes ficam).
+# De tempos em tempos os incrementos vão para um sorted set no Redis, somando
+# os de todos os workers, e o ranking é copiado para um arquivo local, que
+# sobrevive a um Redis reiniciado sem persistência.
+#
+# O aquecimento lê as chaves mais pedidas, pula as que já estão no Redis e
+# recarrega as demais em paralelo, com concorrência e vazão limitadas para não
+# estourar o rate limit da PokeAPI. Roda no startup (em segundo plano, um
+# worker só) ou pela linha de comando:
+#
+#   python aquecimento.py [--chaves 500] [--por-segundo 20] [--concorrencia 5]
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from cache import aguardar
+from upstream import em_paralelo
+
+NO_STARTUP = os.getenv("AQUECIMENTO_NO_STARTUP", "1").lower() in ("1", "true", "sim")
+CHAVES = int(os.getenv("AQUECIMENTO_CHAVES", 500))
+RASTREADAS = int(os.getenv("AQUECIMENTO_RASTREADAS", 2048))
+POR_SEGUNDO = float(os.getenv("AQUECIMENTO_POR_SEGUNDO", 20))
+CONCORRENCIA = int(os.getenv("AQUECIMENTO_CONCORRENCIA", 5))
+# Intervalo (segundos) entre as gravações das frequências no Redis e no arquivo
+INTERVALO = float(os.getenv("AQUECIMENTO_INTERVALO", 30))
+ARQUIVO = os.getenv("AQUECIMENTO_ARQUIVO", "./data/aquecimento.json")
+
+CHAVE_FREQUENCIAS = "aquecimento:frequencias"
+CHAVE_LOCK = "aquecimento:lock"
+
+
+class Frequencias:
+    def __init__(self, capacidade: int = RASTREADAS):
+        self.capacidade = capacidade
+        self._lock = threading.Lock()
+        # desde a última gravação no Redis / desde o início do processo
+        self._pendentes = Counter()
+        self._total = Counter()
+
+    def _aparar(self, contador: Counter) -> Counter:
+        if len(contador) > 2 * self.capacidade:
+            return Counter(dict(contador.most_common(self.capacidade)))
+        return contador
+
+    def registrar(self, chave: str):
+        with self._lock:
+            self._pendentes[chave] += 1
+            self._total[chave] += 1
+            self._pendentes = self._aparar(self._pendentes)
+            self._total = self._aparar(self._total)
+
+    def drenar(self) -> Counter:
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, Counter()
+        return pendentes
+
+    def mais_frequentes(self, quantidade: int) -> list:
+        with self._lock:
+            return [chave for chave, _ in self._total.most_common(quantidade)]
+
+
+frequencias = Frequencias()
+
+
+def _texto(chave) -> str:
+    return chave.decode() if isinstance(chave, bytes) else chave
+
+
+def ler_arquivo(caminho: str = None) -> list:
+    try:
+        with open(caminho or ARQUIVO, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return []
+
+
+# Grava de forma atômica; sem o diretório (ex.: fora do container), não grava
+def gravar_arquivo(chaves: list, caminho: str = None):
+    caminho = caminho or ARQUIVO
+    if not os.path.isdir(os.path.dirname(caminho) or "."):
+        return
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(chaves, arquivo)
+        os.replace(temporario, caminho)
+    except OSError as e:
+        logging.warning(f"Falha ao gravar as chaves do aquecimento ({caminho}): {e}")
+
+
+# Chaves mais pedidas: do Redis (todos os workers) ou, se ele estiver vazio ou
+# fora do ar, do arquivo e deste processo
+async def mais_frequentes(redis_client, quantidade: int = CHAVES) -> list:
+    if redis_client:
+        try:
+            chaves = await aguardar(redis_client.zrevrange(CHAVE_FREQUENCIAS, 0, quantidade - 1))
+            if chaves:
+                return [_texto(chave) for chave in chaves]
+        except Exception as e:
+            logging.warning(f"Falha ao ler as frequências do Redis: {e}")
+    return list(dict.fromkeys(ler_arquivo() + frequencias.mais_frequentes(quantidade)))[:quantidade]
+
+
+# Soma os incrementos deste worker no sorted set (um pipeline), descarta as
+# chaves além de RASTREADAS e atualiza o arquivo com o ranking
+async def salvar(redis_client):
+    pendentes = frequencias.drenar()
+    if redis_client and pendentes:
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for chave, quantidade in pendentes.items():
+                pipeline.zincrby(CHAVE_FREQUENCIAS, quantidade, chave)
+            pipeline.zremrangebyrank(CHAVE_FREQUENCIAS, 0, -RASTREADAS - 1)
+            await aguardar(pipeline.execute())
+        except Exception as e:
+            logging.warning(f"Falha ao gravar as frequências no Redis: {e}")
+    gravar_arquivo(await mais_frequentes(redis_client))
+
+
+async def salvar_periodicamente(redis_client, intervalo: float = INTERVALO):
+    while True:
+        await asyncio.sleep(intervalo)
+        await salvar(redis_client)
+
+
+# Só um worker aquece por vez; os demais encontram o lock e seguem
+async def obter_lock(redis_client, ttl: int = 300) -> bool:
+    if not redis_client:
+        return True
+    try:
+        return bool(await aguardar(redis_client.set(CHAVE_LOCK, os.getpid(), nx=True, ex=ttl)))
+    except Exception as e:
+        logging.warning(f"Falha ao obter o lock do aquecimento: {e}")
+        return False
+
+
+# `recarregar(chave)` é uma corrotina que carrega e grava a chave no cache e
+# retorna False se não souber tratá-la. As chaves partem no máximo
+# `por_segundo` por segundo, com até `concorrencia` em andamento.
+async def aquecer(redis_client, chaves: list, recarregar, por_segundo: float = POR_SEGUNDO, concorrencia: int = CONCORRENCIA) -> dict:
+    frias = chaves
+    if redis_client and chaves:
+        try:
+            valores = await aguardar(redis_client.mget(chaves))
+            frias = [chave for chave, valor in zip(chaves, valores) if valor is None]
+        except Exception as e:
+            logging.warning(f"Falha ao consultar o Redis antes do aquecimento: {e}")
+
+    inicio = time.monotonic()
+
+    async def aquecer_uma(item):
+        posicao, chave = item
+        espera = inicio + posicao / por_segundo - time.monotonic()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return await recarregar(chave)
+
+    resultados = await em_paralelo(aquecer_uma, list(enumerate(frias)), concorrencia)
+    falhas = [resultado for resultado in resultados if isinstance(resultado, Exception)]
+    for falha in falhas[:5]:
+        logging.warning(f"Falha ao aquecer chave: {falha!r}")
+    resumo = {
+        "chaves": len(chaves),
+        "ja_no_cache": len(chaves) - len(frias),
+        "aquecidas": sum(1 for resultado in resultados if resultado is True),
+        "ignoradas": sum(1 for resultado in resultados if resultado is False),
+        "falhas": len(falhas),
+        "segundos": round(time.monotonic() - inicio, 2),
+    }
+    logging.info(f"Aquecimento do cache: {resumo}")
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chaves", type=int, default=CHAVES, help="quantas das chaves mais pedidas aquecer")
+    parser.add_argument("--por-segundo", type=float, default=POR_SEGUNDO)
+    parser.add_argument("--concorrencia", type=int, default=CONCORRENCIA)
+    args = parser.parse_args()
+
+    import main as app
+
+    async def executar():
+        try:
+            return await app.aquecer_cache(args.chaves, args.por_segundo, args.concorrencia)
+        finally:
+            await app.pokeapi.close()
+
+    print(json.dumps(asyncio.run(executar())))
+
+
+if __name__ == "__main__":
+    main()
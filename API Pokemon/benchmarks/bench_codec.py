@@ -0,0 +1,75 @@
+# Tamanho por entrada e tempo de codificação/decodificação de cada codec do
+# cache (ver codec.py), com payloads no formato das respostas da API
+#
+# Uso: python benchmarks/bench_codec.py [--repeticoes 2000]
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec
+
+
+def payloads():
+    pokemon = {
+        "name": "Pikachu",
+        "id": 25,
+        "height": 4,
+        "weight": 60,
+        "types": ["electric"],
+        "sprites": {
+            "front_default": "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/25.png",
+            "back_default": "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/back/25.png",
+        },
+    }
+    lista = {
+        "data": [{"name": f"pokemon-{i}", "url": f"https://pokeapi.co/api/v2/pokemon/{i}/"} for i in range(1, 101)],
+        "pagination": {"total": 1025, "limit": 100, "offset": 0, "next": "...", "previous": "..."},
+    }
+    pagina = {
+        "page": 1, "limit": 100, "total": 100000, "next_cursor": "eyJpZCI6MTAwLCJkIjoibiJ9", "prev_cursor": None,
+        "pokemons": [{"id": i, "name": f"pokemon-{i}", "weight": i % 1000, "height": i % 100} for i in range(1, 101)],
+    }
+    return {"/pokemons/{id}": pokemon, "/pokemons (100)": lista, "/data (100)": pagina}
+
+
+def medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    combinacoes = [
+        (nome, compressao)
+        for nome in codec.CODECS
+        for compressao in codec.COMPRESSOES
+        if not (nome == "msgpack" and codec.msgpack is None) and not (compressao == "zstd" and codec.zstd is None)
+    ]
+    print(f"json via {'orjson' if codec.orjson else 'json (stdlib)'}")
+
+    for rotulo, valor in payloads().items():
+        print(f"\n{rotulo}")
+        print(f"{'codec':>10} {'compressão':>10} {'bytes':>8} {'codificar (µs)':>15} {'decodificar (µs)':>17}")
+        # Formato anterior: json.dumps da biblioteca padrão, sem cabeçalho
+        antigo = json.dumps(valor)
+        codificar = medir(lambda: json.dumps(valor), args.repeticoes)
+        decodificar = medir(lambda: json.loads(antigo), args.repeticoes)
+        print(f"{'antigo':>10} {'nenhuma':>10} {len(antigo.encode()):>8} {codificar:>15.1f} {decodificar:>17.1f}")
+        for nome, compressao in combinacoes:
+            dados = codec.codificar(valor, codec=nome, compressao=compressao, comprimir_acima=0)
+            codificar = medir(lambda: codec.codificar(valor, codec=nome, compressao=compressao, comprimir_acima=0), args.repeticoes)
+            decodificar = medir(lambda: codec.decodificar(dados), args.repeticoes)
+            print(f"{nome:>10} {compressao:>10} {len(dados):>8} {codificar:>15.1f} {decodificar:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Vazão de inserção em pokemons com o schema antigo (um índice por coluna e
+# duplicidade checada com SELECT antes do INSERT) vs. o atual (índice único em
+# (name, weight) e a unicidade garantida pelo banco: IntegrityError no
+# unitário, INSERT ... ON CONFLICT no lote)
+#
+# Uso: python benchmarks/bench_indices.py [--base 100000] [--itens 5000] [--lote 1000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import lote
+from main import Base, PokemonDB
+
+CHAVE = [PokemonDB.name, PokemonDB.weight]
+
+
+def preparar(caminho, antigo: bool, base: int):
+    engine = create_engine(f"sqlite:///{caminho}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        if antigo:
+            conn.execute(text("DROP INDEX ux_pokemons_name_weight"))
+            for coluna in ("id", "name", "weight", "height"):
+                conn.execute(text(f"CREATE INDEX ix_pokemons_{coluna} ON pokemons ({coluna})"))
+        conn.exec_driver_sql(
+            "INSERT INTO pokemons (name, weight, height) VALUES (?, ?, ?)",
+            [(f"base-{i}", i, i % 100) for i in range(base)],
+        )
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+# 10% dos itens repetem um anterior, para exercitar o caminho do duplicado
+def gerar_itens(quantidade: int):
+    itens = [{"name": f"novo-{i}", "weight": i, "height": i % 100} for i in range(quantidade)]
+    return itens + itens[: quantidade // 10]
+
+
+def unitario(Sessao, itens, antigo: bool):
+    for item in itens:
+        with Sessao() as db:
+            if antigo:
+                if db.query(PokemonDB).filter(PokemonDB.name == item["name"], PokemonDB.weight == item["weight"]).first():
+                    continue
+                db.add(PokemonDB(**item))
+                db.commit()
+            else:
+                db.add(PokemonDB(**item))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+
+
+def em_lote(Sessao, itens, tamanho: int, antigo: bool):
+    # Sem ON CONFLICT, criar_em_lote usa o caminho antigo (SELECT dos duplicados)
+    inserts = lote.INSERTS_COM_CONFLITO
+    if antigo:
+        lote.INSERTS_COM_CONFLITO = {}
+    try:
+        for parte in lote.em_partes(enumerate(itens), tamanho):
+            with Sessao() as db:
+                lote.criar_em_lote(db, PokemonDB, CHAVE, parte)
+                db.commit()
+    finally:
+        lote.INSERTS_COM_CONFLITO = inserts
+
+
+def medir(funcao, *args):
+    inicio = time.perf_counter()
+    funcao(*args)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", type=int, default=100_000, help="linhas já existentes na tabela")
+    parser.add_argument("--itens", type=int, default=5000)
+    parser.add_argument("--lote", type=int, default=1000)
+    args = parser.parse_args()
+    itens = gerar_itens(args.itens)
+
+    print(f"{'schema':<8} {'modo':<10} {'segundos':>10} {'itens/s':>10}")
+    with tempfile.TemporaryDirectory() as diretorio:
+        for antigo in (True, False):
+            nome = "antigo" if antigo else "atual"
+            Sessao = preparar(os.path.join(diretorio, f"{nome}-unitario.db"), antigo, args.base)
+            segundos = medir(unitario, Sessao, itens, antigo)
+            print(f"{nome:<8} {'unitario':<10} {segundos:>10.2f} {len(itens) / segundos:>10.0f}")
+
+            Sessao = preparar(os.path.join(diretorio, f"{nome}-lote.db"), antigo, args.base)
+            segundos = medir(em_lote, Sessao, itens, args.lote, antigo)
+            print(f"{nome:<8} {'lote':<10} {segundos:>10.2f} {len(itens) / segundos:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Vazão de criação de pokémons: POST /pokemons item a item vs. POST /pokemons/lote
+#
+# Uso: python benchmarks/bench_lote.py [--itens 2000]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import main
+
+
+def usar_banco(caminho):
+    engine = create_engine(f"sqlite:///{caminho}", connect_args={"check_same_thread": False})
+    main.Base.metadata.create_all(bind=engine)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def sessao_db():
+        db = Sessao()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.sessao_db] = sessao_db
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--itens", type=int, default=2000)
+    args = parser.parse_args()
+    main.redis_client = None
+    client = TestClient(main.app)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        usar_banco(f"{diretorio}/unitario.db")
+        inicio = time.perf_counter()
+        for i in range(args.itens):
+            client.post("/pokemons", json={"name": f"p{i}", "weight": i, "height": 1})
+        unitario = time.perf_counter() - inicio
+
+        usar_banco(f"{diretorio}/lote.db")
+        itens = [{"name": f"p{i}", "weight": i, "height": 1} for i in range(args.itens)]
+        inicio = time.perf_counter()
+        client.post("/pokemons/lote", json=itens)
+        em_lote = time.perf_counter() - inicio
+
+        ndjson = "\n".join(json.dumps({"name": f"q{i}", "weight": i, "height": 1}) for i in range(args.itens))
+        inicio = time.perf_counter()
+        client.post("/pokemons/lote", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+        em_ndjson = time.perf_counter() - inicio
+
+    print(f"{'modo':<12} {'segundos':>10} {'itens/s':>12}")
+    for nome, duracao in (("unitário", unitario), ("lote JSON", em_lote), ("lote NDJSON", em_ndjson)):
+        print(f"{nome:<12} {duracao:>10.3f} {args.itens / duracao:>12.0f}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,112 @@
+# Carga em /data com o acesso ao banco síncrono vs. assíncrono (MODO_ASYNC)
+#
+# Uso: python benchmarks/bench_modo_async.py [--linhas 100000] [--requisicoes 2000] [--concorrencia 50]
+#
+# Sobe um uvicorn (um worker) para cada modo sobre o mesmo SQLite e dispara
+# requisições concorrentes em páginas aleatórias. O cache L1 é desligado e o
+# Redis não é configurado, então toda requisição vai ao banco. O modo
+# assíncrono precisa do aiosqlite e do greenlet instalados.
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DIRETORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(DIRETORIO)
+
+import httpx
+from sqlalchemy import create_engine
+
+from main import Base
+
+
+def popular(caminho, linhas: int):
+    engine = create_engine(f"sqlite:///{caminho}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO pokemons (name, weight, height) VALUES (?, ?, ?)",
+            [(f"pokemon-{i}", i % 1000, i % 100) for i in range(linhas)],
+        )
+
+
+def subir_servidor(caminho, modo_async: bool, porta: int):
+    ambiente = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{caminho}",
+        "MODO_ASYNC": "1" if modo_async else "0",
+        "CACHE_L1_DATA_TAMANHO": "0",
+    }
+    ambiente.pop("REDIS_URL", None)
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(porta), "--log-level", "warning"],
+        cwd=DIRETORIO,
+        env=ambiente,
+    )
+    prazo = time.monotonic() + 30
+    while time.monotonic() < prazo:
+        try:
+            httpx.get(f"http://127.0.0.1:{porta}/cache/stats")
+            return processo
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("O servidor não subiu.")
+
+
+async def carga(porta: int, requisicoes: int, concorrencia: int, paginas: int):
+    limites = httpx.Limits(max_connections=concorrencia)
+    semaforo = asyncio.Semaphore(concorrencia)
+    latencias = []
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{porta}", limits=limites, timeout=60) as client:
+        async def requisitar():
+            async with semaforo:
+                inicio = time.perf_counter()
+                resposta = await client.get(f"/data?page={random.randint(1, paginas)}&limit=20")
+                resposta.raise_for_status()
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(requisitar() for _ in range(requisicoes)))
+        duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "req/s": requisicoes / duracao,
+        "p50 (ms)": statistics.median(latencias) * 1000,
+        "p99 (ms)": latencias[int(len(latencias) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "bench.db")
+        popular(caminho, args.linhas)
+
+        print(f"{'modo':>10} {'req/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+        for modo_async in (False, True):
+            processo = subir_servidor(caminho, modo_async, args.porta)
+            try:
+                resultado = asyncio.run(carga(args.porta, args.requisicoes, args.concorrencia, args.linhas // 20))
+            finally:
+                processo.terminate()
+                processo.wait()
+            nome = "async" if modo_async else "sync"
+            print(f"{nome:>10} {resultado['req/s']:>10.0f} {resultado['p50 (ms)']:>10.1f} {resultado['p99 (ms)']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
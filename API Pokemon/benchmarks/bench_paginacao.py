@@ -0,0 +1,72 @@
+# Latência de /data por profundidade de página: OFFSET vs. keyset (cursor)
+#
+# Uso: python benchmarks/bench_paginacao.py [--linhas 2000000] [--limit 10]
+#
+# Cria um SQLite temporário com a tabela de pokémons e mede, para cada
+# profundidade, a consulta que o endpoint faz em cada modo.
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import keyset
+from main import Base, PokemonDB
+
+
+def popular(engine, linhas: int):
+    with engine.begin() as conn:
+        lote = 100_000
+        for inicio in range(0, linhas, lote):
+            conn.exec_driver_sql(
+                "INSERT INTO pokemons (name, weight, height) VALUES (?, ?, ?)",
+                [(f"pokemon-{i}", i % 1000, i % 100) for i in range(inicio, min(inicio + lote, linhas))],
+            )
+
+
+def medir(funcao, repeticoes: int = 5):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return sorted(tempos)[len(tempos) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=2_000_000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        engine = create_engine(f"sqlite:///{diretorio}/bench.db")
+        Base.metadata.create_all(bind=engine, tables=[PokemonDB.__table__])
+        print(f"Populando {args.linhas} linhas...")
+        popular(engine, args.linhas)
+        Sessao = sessionmaker(bind=engine)
+
+        print(f"{'página':>10} {'offset (ms)':>12} {'cursor (ms)':>12}")
+        total_paginas = args.linhas // args.limit
+        pagina = 1
+        while pagina <= total_paginas:
+            with Sessao() as db:
+                def por_offset():
+                    db.query(PokemonDB).order_by(PokemonDB.id).offset((pagina - 1) * args.limit).limit(args.limit).all()
+
+                cursor = keyset.codificar_cursor((pagina - 1) * args.limit, "n")
+
+                def por_cursor():
+                    keyset.paginar_por_cursor(db.query(PokemonDB), PokemonDB.id, cursor, args.limit)
+
+                print(f"{pagina:>10} {medir(por_offset):>12.3f} {medir(por_cursor):>12.3f}")
+            pagina *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Leituras e escritas por segundo no SQLite sob carga mista, com a
+# configuração antiga (journal padrão, um engine só) vs. o perfil de banco.py
+# (WAL + pragmas, pool de leitura separado e uma conexão de escrita)
+#
+# Uso: python benchmarks/bench_sqlite.py [--linhas 100000] [--leitores 8] [--escritores 4] [--segundos 10]
+#
+# Leitores buscam páginas de /data (OFFSET aleatório); escritores inserem um
+# registro por transação, como o POST /pokemons. Erros "database is locked"
+# são contados à parte.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import banco
+from main import Base, PokemonDB
+
+
+def preparar(caminho, otimizado: bool, linhas: int):
+    if otimizado:
+        escrita, leitura = banco.criar_engines(f"sqlite:///{caminho}")
+    else:
+        escrita = leitura = create_engine(f"sqlite:///{caminho}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=escrita)
+    with escrita.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO pokemons (name, weight, height) VALUES (?, ?, ?)",
+            [(f"base-{i}", i, i % 100) for i in range(linhas)],
+        )
+    return sessionmaker(bind=escrita, autoflush=False), sessionmaker(bind=leitura, autoflush=False)
+
+
+class Contagem:
+    def __init__(self):
+        self.leituras = self.escritas = self.bloqueios = 0
+        self.lock = threading.Lock()
+
+    def somar(self, campo: str):
+        with self.lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+
+def ler(Sessao, linhas: int, fim: float, contagem: Contagem):
+    while time.perf_counter() < fim:
+        try:
+            with Sessao() as db:
+                db.query(PokemonDB).order_by(PokemonDB.id).offset(random.randrange(linhas)).limit(10).all()
+            contagem.somar("leituras")
+        except OperationalError:
+            contagem.somar("bloqueios")
+
+
+def escrever(Sessao, numero: int, fim: float, contagem: Contagem):
+    i = 0
+    while time.perf_counter() < fim:
+        i += 1
+        try:
+            with Sessao() as db:
+                db.add(PokemonDB(name=f"novo-{numero}-{i}", weight=i, height=1))
+                db.commit()
+            contagem.somar("escritas")
+        except OperationalError:
+            contagem.somar("bloqueios")
+
+
+def medir(Escrita, Leitura, args) -> Contagem:
+    contagem = Contagem()
+    fim = time.perf_counter() + args.segundos
+    threads = [threading.Thread(target=ler, args=(Leitura, args.linhas, fim, contagem)) for _ in range(args.leitores)]
+    threads += [threading.Thread(target=escrever, args=(Escrita, numero, fim, contagem)) for numero in range(args.escritores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--leitores", type=int, default=8)
+    parser.add_argument("--escritores", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{'perfil':<10} {'leituras/s':>12} {'escritas/s':>12} {'bloqueios':>10}")
+    with tempfile.TemporaryDirectory() as diretorio:
+        for otimizado in (False, True):
+            nome = "otimizado" if otimizado else "padrao"
+            Escrita, Leitura = preparar(os.path.join(diretorio, f"{nome}.db"), otimizado, args.linhas)
+            contagem = medir(Escrita, Leitura, args)
+            print(
+                f"{nome:<10} {contagem.leituras / args.segundos:>12.0f} "
+                f"{contagem.escritas / args.segundos:>12.0f} {contagem.bloqueios:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
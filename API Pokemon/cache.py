@@ -0,0 +1,543 @@
+# Camada de cache (cache-aside) usada pelos endpoints de leitura
+import asyncio
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import NamedTuple
+
+import codec
+import respostas
+
+# Lock distribuído no Redis para coordenar misses entre vários workers
+LOCK_DISTRIBUIDO = os.getenv("CACHE_LOCK_DISTRIBUIDO", "0").lower() in ("1", "true", "sim")
+LOCK_TTL = int(os.getenv("CACHE_LOCK_TTL", 10))
+LOCK_ESPERA = float(os.getenv("CACHE_LOCK_ESPERA", 5))
+LOCK_INTERVALO = float(os.getenv("CACHE_LOCK_INTERVALO", 0.05))
+
+# Cache local (L1) em memória, na frente do Redis (L2)
+L1_TAMANHO = int(os.getenv("CACHE_L1_TAMANHO", 1024))
+L1_TTL = float(os.getenv("CACHE_L1_TTL", 10))
+CANAL_INVALIDACAO = os.getenv("CACHE_CANAL_INVALIDACAO", "cache:invalidar")
+
+
+# soft: idade a partir da qual o valor é revalidado em segundo plano
+# hard: expiração da chave no Redis (após ela, a requisição espera o upstream)
+# negativo: as entradas gravadas com ele são de cache negativo (ex.: 404)
+class TTL(NamedTuple):
+    soft: int
+    hard: int
+    negativo: bool = False
+
+
+# TTLs por endpoint, sobrescrevíveis por CACHE_TTL_<NOME>_SOFT / _HARD
+def ttl_configurado(nome: str, soft: int, hard: int, negativo: bool = False) -> TTL:
+    nome = nome.upper()
+    return TTL(
+        soft=int(os.getenv(f"CACHE_TTL_{nome}_SOFT", soft)),
+        hard=int(os.getenv(f"CACHE_TTL_{nome}_HARD", hard)),
+        negativo=negativo,
+    )
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = defaultdict(
+            lambda: {"l1_hits": 0, "l2_hits": 0, "stale": 0, "misses": 0, "errors": 0, "coalesced": 0}
+        )
+
+    def registrar(self, nome: str, evento: str):
+        with self._lock:
+            self._contadores[nome][evento] += 1
+
+    def snapshot(self):
+        def razao(parte, total):
+            return round(parte / total, 4) if total else 0.0
+
+        with self._lock:
+            resultado = {}
+            for nome, contador in self._contadores.items():
+                hits = contador["l1_hits"] + contador["l2_hits"] + contador["stale"]
+                total = hits + contador["misses"]
+                resultado[nome] = {
+                    **contador,
+                    "hits": hits,
+                    "hit_ratio": razao(hits, total),
+                    "l1_hit_ratio": razao(contador["l1_hits"], total),
+                    # fração das consultas que chegaram ao Redis e foram atendidas por ele
+                    "l2_hit_ratio": razao(contador["l2_hits"] + contador["stale"], total - contador["l1_hits"]),
+                }
+            return resultado
+
+    def reset(self):
+        with self._lock:
+            self._contadores.clear()
+
+
+stats = CacheStats()
+
+
+# LRU com expiração por TTL; protegido por lock porque a invalidação
+# chega pela thread do pub/sub. `versao` conta as invalidações: um valor
+# calculado antes de uma delas não deve mais entrar no cache.
+class CacheLocal:
+    def __init__(self, max_itens: int, ttl: float):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.versao = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave: str):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    # Com `versao` (lida antes de calcular o valor), não grava se houve uma
+    # invalidação desde então
+    def set(self, chave: str, valor, ttl: float = None, versao: int = None):
+        if self.max_itens <= 0 or self.ttl <= 0:
+            return
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        with self._lock:
+            if versao is not None and versao != self.versao:
+                return
+            self._itens[chave] = (time.monotonic() + ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave: str):
+        with self._lock:
+            self.versao += 1
+            self._itens.pop(chave, None)
+
+    def invalidar_prefixo(self, prefixo: str):
+        with self._lock:
+            self.versao += 1
+            for chave in [c for c in self._itens if c.startswith(prefixo)]:
+                del self._itens[chave]
+
+    def limpar(self):
+        with self._lock:
+            self.versao += 1
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+# L1 segmentado por prefixo de chave: cada prefixo tem seu próprio tamanho e TTL,
+# e a chave usa o segmento de prefixo mais longo que casar com ela.
+class CacheL1:
+    def __init__(self, max_itens: int = L1_TAMANHO, ttl: float = L1_TTL):
+        self._segmentos = {"": CacheLocal(max_itens, ttl)}
+
+    def configurar(self, prefixo: str, max_itens: int = L1_TAMANHO, ttl: float = L1_TTL):
+        self._segmentos[prefixo] = CacheLocal(max_itens, ttl)
+
+    def _segmento(self, chave: str) -> CacheLocal:
+        prefixo = max((p for p in self._segmentos if chave.startswith(p)), key=len)
+        return self._segmentos[prefixo]
+
+    def get(self, chave: str):
+        return self._segmento(chave).get(chave)
+
+    def versao(self, chave: str) -> int:
+        return self._segmento(chave).versao
+
+    def set(self, chave: str, valor, ttl: float = None, versao: int = None):
+        self._segmento(chave).set(chave, valor, ttl, versao)
+
+    # Houve uma invalidação no segmento da chave desde `versao`
+    def desatualizada(self, chave: str, versao: int = None) -> bool:
+        return versao is not None and versao != self.versao(chave)
+
+    def invalidar(self, chave: str):
+        self._segmento(chave).invalidar(chave)
+
+    def invalidar_prefixo(self, prefixo: str):
+        for segmento in self._segmentos.values():
+            segmento.invalidar_prefixo(prefixo)
+
+    def limpar(self):
+        for segmento in self._segmentos.values():
+            segmento.limpar()
+
+    def tamanhos(self):
+        return {prefixo or "*": len(segmento) for prefixo, segmento in self._segmentos.items()}
+
+
+l1 = CacheL1()
+
+# Identifica este worker nas mensagens de invalidação
+ORIGEM = uuid.uuid4().hex
+_assinatura = None
+
+
+def _receber_invalidacao(mensagem):
+    try:
+        dados = json.loads(mensagem["data"])
+    except Exception:
+        logging.warning(f"Mensagem de invalidação inválida: {mensagem!r}")
+        return
+    if dados.get("origem") == ORIGEM:
+        return
+    if "chave" in dados:
+        l1.invalidar(dados["chave"])
+    if "prefixo" in dados:
+        l1.invalidar_prefixo(dados["prefixo"])
+
+
+def iniciar_invalidacao(redis_client):
+    global _assinatura
+    if not redis_client or _assinatura is not None:
+        return
+    try:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{CANAL_INVALIDACAO: _receber_invalidacao})
+        _assinatura = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        logging.info("Invalidação do cache local via pub/sub iniciada.")
+    except Exception as e:
+        logging.warning(f"Falha ao assinar canal de invalidação: {e}")
+
+
+def parar_invalidacao():
+    global _assinatura
+    if _assinatura is not None:
+        _assinatura.stop()
+        _assinatura = None
+
+
+# Aceita tanto o cliente Redis síncrono quanto o redis.asyncio (MODO_ASYNC=1)
+async def aguardar(resultado):
+    return await resultado if inspect.isawaitable(resultado) else resultado
+
+
+async def _listar_chaves(redis_client, padrao: str):
+    chaves = redis_client.scan_iter(match=padrao)
+    if hasattr(chaves, "__aiter__"):
+        return [chave async for chave in chaves]
+    return list(chaves)
+
+
+# Invalida o L1 deste worker e avisa os demais pelo pub/sub
+async def publicar_invalidacao(redis_client, chave: str = None, prefixo: str = None):
+    mensagem = {"origem": ORIGEM}
+    if chave is not None:
+        l1.invalidar(chave)
+        mensagem["chave"] = chave
+    if prefixo is not None:
+        l1.invalidar_prefixo(prefixo)
+        mensagem["prefixo"] = prefixo
+    if redis_client:
+        try:
+            await aguardar(redis_client.publish(CANAL_INVALIDACAO, json.dumps(mensagem)))
+        except Exception as e:
+            logging.warning(f"Falha ao publicar invalidação: {e}")
+
+
+# Remove do Redis todas as chaves com o prefixo e invalida o L1 dos workers
+async def invalidar_prefixo(redis_client, prefixo: str):
+    if redis_client:
+        try:
+            chaves = await _listar_chaves(redis_client, f"{prefixo}*")
+            if chaves:
+                await aguardar(redis_client.delete(*chaves))
+        except Exception as e:
+            logging.warning(f"Falha ao invalidar chaves do Redis ({prefixo}*): {e}")
+    await publicar_invalidacao(redis_client, prefixo=prefixo)
+
+
+# Single-flight: chamadas concorrentes com a mesma chave compartilham uma única execução
+class SingleFlight:
+    def __init__(self):
+        self._em_andamento = {}
+
+    def _remover(self, chave, tarefa):
+        if self._em_andamento.get(chave) is tarefa:
+            del self._em_andamento[chave]
+
+    async def executar(self, chave: str, funcao, nome: str = None):
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            tarefa = asyncio.ensure_future(funcao())
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._remover(chave, t))
+        elif nome:
+            stats.registrar(nome, "coalesced")
+        # shield: o cancelamento de um cliente não cancela a busca dos demais
+        return await asyncio.shield(tarefa)
+
+
+voos = SingleFlight()
+
+
+# Cada entrada no Redis guarda (no cabeçalho do codec) o instante em que foi
+# gerada, para que o soft TTL seja avaliado sem um TTL extra por leitura
+def _envelope(valor):
+    return codec.codificar(valor)
+
+
+# Retorna (respostas.Corpo, idade em segundos) ou None em caso de miss. O JSON
+# guardado é devolvido em bytes, sem desserializar.
+async def ler_cache(redis_client, cache_key: str, nome: str):
+    if not redis_client:
+        return None
+    try:
+        cached = await aguardar(redis_client.get(cache_key))
+    except Exception as e:
+        logging.warning(f"Erro ao acessar cache: {e}")
+        stats.registrar(nome, "errors")
+        return None
+
+    return _decodificar(cache_key, cached, nome)
+
+
+def _decodificar(cache_key: str, cached, nome: str):
+    if not cached:
+        return None
+    try:
+        conteudo, criado_em, negativa = codec.para_json(cached)
+        if criado_em is None:
+            # formato antigo: {"criado_em": ..., "valor": ...} em JSON
+            entrada = json.loads(conteudo)
+            conteudo, criado_em = codec.json_bytes(entrada["valor"]), entrada["criado_em"]
+        return respostas.corpo(conteudo, criado_em, negativa), time.time() - criado_em
+    except Exception:
+        logging.warning(f"Cache inválido ({cache_key}).")
+        stats.registrar(nome, "errors")
+        return None
+
+
+# Várias chaves com um único MGET. Retorna {chave: (Corpo, idade)} das encontradas.
+async def ler_varios(redis_client, chaves: list, nome: str) -> dict:
+    if not redis_client or not chaves:
+        return {}
+    try:
+        valores = await aguardar(redis_client.mget(chaves))
+    except Exception as e:
+        logging.warning(f"Erro ao acessar cache: {e}")
+        stats.registrar(nome, "errors")
+        return {}
+    entradas = {}
+    for chave, cached in zip(chaves, valores):
+        entrada = _decodificar(chave, cached, nome)
+        if entrada is not None:
+            entradas[chave] = entrada
+    return entradas
+
+
+# Serializa o valor uma vez: o mesmo JSON vai para o L1, para o Redis (com o
+# codec json) e para a resposta. Com `versao` (do L1, lida antes de carregar o
+# valor), um valor carregado antes de uma invalidação só vai para a resposta:
+# gravá-lo traria de volta o que a escrita acabou de invalidar.
+async def gravar_cache(redis_client, cache_key: str, ttl: TTL, valor, versao: int = None):
+    agora = time.time()
+    corpo = respostas.corpo(codec.json_bytes(valor), agora, ttl.negativo)
+    if l1.desatualizada(cache_key, versao):
+        return corpo
+    l1.set(cache_key, corpo, ttl.soft)
+    if not redis_client:
+        return corpo
+    try:
+        await aguardar(redis_client.setex(cache_key, ttl.hard, codec.codificar(valor, agora, serializado=corpo.conteudo, negativa=ttl.negativo)))
+    except Exception as e:
+        logging.warning(f"Falha ao escrever no Redis: {e}")
+    return corpo
+
+
+# Grava {chave: valor} no L1 e no Redis, com todos os SETEX num único pipeline.
+# `versoes`: {chave: versão do L1 antes da carga}, como em gravar_cache.
+# Retorna {chave: Corpo}.
+async def gravar_varios(redis_client, valores: dict, ttl: TTL, versoes: dict = None) -> dict:
+    agora = time.time()
+    corpos = {}
+    for chave, valor in valores.items():
+        corpos[chave] = respostas.corpo(codec.json_bytes(valor), agora)
+    valores = {chave: valor for chave, valor in valores.items() if not l1.desatualizada(chave, (versoes or {}).get(chave))}
+    for chave in valores:
+        l1.set(chave, corpos[chave], ttl.soft)
+    if not redis_client or not valores:
+        return corpos
+    try:
+        pipeline = redis_client.pipeline(transaction=False)
+        for chave, valor in valores.items():
+            pipeline.setex(chave, ttl.hard, codec.codificar(valor, agora, serializado=corpos[chave].conteudo))
+        await aguardar(pipeline.execute())
+    except Exception as e:
+        logging.warning(f"Falha ao escrever no Redis: {e}")
+    return corpos
+
+
+async def _liberar_lock(redis_client, lock_key: str, token: str):
+    try:
+        if await aguardar(redis_client.get(lock_key)) in (token, token.encode()):
+            await aguardar(redis_client.delete(lock_key))
+    except Exception as e:
+        logging.warning(f"Falha ao liberar lock do Redis ({lock_key}): {e}")
+
+
+# Variante entre workers: quem obtém o lock busca no upstream; os demais
+# aguardam um valor fresco aparecer no cache até LOCK_ESPERA e, se não
+# aparecer, buscam por conta própria.
+async def _buscar_com_lock(redis_client, cache_key: str, ttl: TTL, buscar, nome: str):
+    lock_key = f"lock:{cache_key}"
+    token = secrets.token_hex(8)
+    try:
+        adquirido = await aguardar(redis_client.set(lock_key, token, nx=True, ex=LOCK_TTL))
+    except Exception as e:
+        logging.warning(f"Falha ao obter lock do Redis ({lock_key}): {e}")
+        return await buscar()
+
+    if adquirido:
+        try:
+            return await buscar()
+        finally:
+            await _liberar_lock(redis_client, lock_key, token)
+
+    stats.registrar(nome, "coalesced")
+    prazo = time.monotonic() + LOCK_ESPERA
+    while time.monotonic() < prazo:
+        await asyncio.sleep(LOCK_INTERVALO)
+        entrada = await ler_cache(redis_client, cache_key, nome)
+        if entrada is not None and entrada[1] < ttl.soft:
+            return entrada[0]
+    logging.warning(f"Tempo de espera do lock esgotado ({lock_key}).")
+    return await buscar()
+
+
+def _buscar_agrupado(redis_client, cache_key: str, ttl: TTL, carregar, nome: str):
+    async def buscar():
+        versao = l1.versao(cache_key)
+        valor, cachear = await carregar()
+        if cachear:
+            return await gravar_cache(redis_client, cache_key, cachear if isinstance(cachear, TTL) else ttl, valor, versao)
+        return respostas.corpo(codec.json_bytes(valor))
+
+    if LOCK_DISTRIBUIDO and redis_client:
+        return voos.executar(cache_key, lambda: _buscar_com_lock(redis_client, cache_key, ttl, buscar, nome), nome)
+    return voos.executar(cache_key, buscar, nome)
+
+
+# Carrega e grava a chave sem consultar o cache antes (ex.: aquecimento),
+# agrupada com misses concorrentes da mesma chave
+async def recarregar(redis_client, cache_key: str, ttl: TTL, carregar, nome: str):
+    return await _buscar_agrupado(redis_client, cache_key, ttl, carregar, nome)
+
+
+# Referências às revalidações em andamento (evita que sejam coletadas pelo GC)
+revalidacoes = set()
+
+
+def _revalidar(redis_client, cache_key: str, ttl: TTL, carregar, nome: str):
+    async def revalidar():
+        try:
+            await _buscar_agrupado(redis_client, cache_key, ttl, carregar, nome)
+        except Exception as e:
+            logging.warning(f"Falha ao revalidar cache em segundo plano ({cache_key}): {e!r}")
+
+    tarefa = asyncio.ensure_future(revalidar())
+    revalidacoes.add(tarefa)
+    tarefa.add_done_callback(revalidacoes.discard)
+
+
+# Pipeline cache-aside: consulta o L1, depois o Redis, e só chama `carregar`
+# em caso de miss nos dois. Retorna um respostas.Corpo (o JSON em bytes e sua
+# ETag), pronto para respostas.responder. `carregar` é uma corrotina que retorna
+# (valor, cachear); respostas de erro voltam com cachear=False e não são
+# gravadas, e `cachear` pode ser um TTL próprio (ex.: cache negativo de 404). Misses concorrentes da mesma chave são agrupados (single-flight)
+# em uma única chamada a `carregar`.
+#
+# Stale-while-revalidate: entre o soft e o hard TTL o valor do Redis é
+# servido imediatamente e atualizado em segundo plano; só depois do hard
+# TTL (quando o Redis expira a chave) a requisição espera o upstream.
+async def buscar_com_cache(redis_client, cache_key: str, ttl: TTL, carregar, nome: str):
+    cached = l1.get(cache_key)
+    if cached is not None:
+        stats.registrar(nome, "l1_hits")
+        return cached
+
+    versao = l1.versao(cache_key)
+    entrada = await ler_cache(redis_client, cache_key, nome)
+    if entrada is not None:
+        corpo, idade = entrada
+        if idade < ttl.soft:
+            stats.registrar(nome, "l2_hits")
+            l1.set(cache_key, corpo, ttl.soft - idade, versao)
+        else:
+            stats.registrar(nome, "stale")
+            _revalidar(redis_client, cache_key, ttl, carregar, nome)
+        return corpo
+
+    stats.registrar(nome, "misses")
+    return await _buscar_agrupado(redis_client, cache_key, ttl, carregar, nome)
+
+
+def _revalidar_varios(redis_client, chaves: list, ttl: TTL, carregar_varios):
+    async def revalidar():
+        try:
+            versoes = {chave: l1.versao(chave) for chave in chaves}
+            await gravar_varios(redis_client, await carregar_varios(chaves), ttl, versoes)
+        except Exception as e:
+            logging.warning(f"Falha ao revalidar cache em segundo plano ({len(chaves)} chaves): {e!r}")
+
+    tarefa = asyncio.ensure_future(revalidar())
+    revalidacoes.add(tarefa)
+    tarefa.add_done_callback(revalidacoes.discard)
+
+
+# Versão de buscar_com_cache para várias chaves: o que não está no L1 é lido
+# com um MGET, os misses são carregados juntos por `carregar_varios` e gravados
+# com um único pipeline. `carregar_varios` é uma corrotina que recebe a lista
+# de chaves e retorna {chave: valor} só do que deve ir para o cache; as chaves
+# ausentes do retorno ficam de fora do resultado, assim como as que estão no
+# cache negativo (ex.: um 404 gravado por buscar_com_cache), que também não
+# são carregadas de novo. Retorna {chave: Corpo}.
+# Valores stale são servidos e revalidados juntos em segundo plano.
+async def buscar_varios_com_cache(redis_client, chaves: list, ttl: TTL, carregar_varios, nome: str) -> dict:
+    resultado = {}
+    faltando = []
+    for chave in dict.fromkeys(chaves):
+        cached = l1.get(chave)
+        if cached is not None:
+            stats.registrar(nome, "l1_hits")
+            if not cached.negativo:
+                resultado[chave] = cached
+        else:
+            faltando.append(chave)
+
+    stale = []
+    versoes = {chave: l1.versao(chave) for chave in faltando}
+    encontradas = await ler_varios(redis_client, faltando, nome)
+    for chave, (corpo, idade) in encontradas.items():
+        if idade < ttl.soft:
+            stats.registrar(nome, "l2_hits")
+            l1.set(chave, corpo, ttl.soft - idade, versoes[chave])
+        else:
+            stats.registrar(nome, "stale")
+            stale.append(chave)
+        if not corpo.negativo:
+            resultado[chave] = corpo
+    if stale:
+        _revalidar_varios(redis_client, stale, ttl, carregar_varios)
+
+    faltando = [chave for chave in faltando if chave not in encontradas]
+    if faltando:
+        for _ in faltando:
+            stats.registrar(nome, "misses")
+        resultado.update(await gravar_varios(redis_client, await carregar_varios(faltando), ttl, versoes))
+    return resultado
@@ -0,0 +1,100 @@
+# Inspeção do Redis sem travar o servidor: SCAN paginado por cursor (nunca
+# KEYS) e, para cada página, GET/TTL/MEMORY USAGE num único pipeline em vez
+# de 2N round-trips
+import os
+
+import codec
+
+PAGINA_PADRAO = int(os.getenv("INSPECAO_PAGINA_PADRAO", 100))
+PAGINA_MAX = int(os.getenv("INSPECAO_PAGINA_MAX", 1000))
+# Máximo de chaves percorridas pelo resumo de memória por prefixo
+AMOSTRA_MAX = int(os.getenv("INSPECAO_AMOSTRA_MAX", 10000))
+
+
+# Agrupa as chaves pelo trecho até o primeiro "=" (ex.: "pokemons:page=")
+# ou, sem "=", até o último ":" (ex.: "pokemons:")
+def prefixo_da_chave(chave: str) -> str:
+    if "=" in chave:
+        return chave[:chave.index("=") + 1]
+    return chave[:chave.rindex(":") + 1] if ":" in chave else chave
+
+
+def _texto(valor):
+    return valor.decode("utf-8", "replace") if isinstance(valor, (bytes, bytearray)) else valor
+
+
+def _valor(valor):
+    if not valor:
+        return None
+    try:
+        return codec.decodificar(valor).valor
+    except Exception:
+        return _texto(valor)
+
+
+def _ou_none(resultado):
+    return None if isinstance(resultado, Exception) else resultado
+
+
+def _limitar(count: int) -> int:
+    return max(1, min(count, PAGINA_MAX))
+
+
+# Uma página do SCAN. `cursor` 0 começa a varredura; o cursor retornado é o da
+# próxima página (0 quando terminou). O COUNT é só uma dica para o Redis, então
+# uma página pode vir com mais ou menos chaves, inclusive nenhuma.
+def inspecionar(redis_client, padrao: str, cursor: int = 0, count: int = PAGINA_PADRAO, valores: bool = True):
+    cursor, chaves = redis_client.scan(cursor=cursor, match=padrao, count=_limitar(count))
+    chaves = [_texto(chave) for chave in chaves]
+
+    pipe = redis_client.pipeline(transaction=False)
+    for chave in chaves:
+        if valores:
+            pipe.get(chave)
+        pipe.ttl(chave)
+        pipe.memory_usage(chave)
+    resultados = iter(pipe.execute(raise_on_error=False))
+
+    itens = []
+    memoria = {}
+    for chave in chaves:
+        item = {"chave": chave}
+        if valores:
+            item["valor"] = _valor(_ou_none(next(resultados)))
+        item["ttl"] = _ou_none(next(resultados))
+        item["memoria"] = _ou_none(next(resultados))
+        itens.append(item)
+        _somar(memoria, chave, item["memoria"])
+
+    return {"cursor": int(cursor), "chaves": itens, "memoria_por_prefixo": memoria}
+
+
+# Memória por prefixo de todas as chaves que casam com `padrao`, em páginas
+# de SCAN com MEMORY USAGE em pipeline. Para depois de `limite` chaves
+# ("amostrado": true) para não varrer um keyspace enorme numa requisição.
+def memoria_por_prefixo(redis_client, padrao: str, limite: int = AMOSTRA_MAX, count: int = PAGINA_MAX):
+    limite = max(limite, 0)
+    memoria = {}
+    vistas = 0
+    cursor = 0
+    while True:
+        cursor, chaves = redis_client.scan(cursor=cursor, match=padrao, count=_limitar(count))
+        chaves = [_texto(chave) for chave in chaves]
+        amostrado = len(chaves) > limite - vistas
+        chaves = chaves[:limite - vistas]
+        pipe = redis_client.pipeline(transaction=False)
+        for chave in chaves:
+            pipe.memory_usage(chave)
+        for chave, bytes_usados in zip(chaves, pipe.execute(raise_on_error=False)):
+            _somar(memoria, chave, _ou_none(bytes_usados))
+        vistas += len(chaves)
+        if int(cursor) == 0 or vistas >= limite:
+            break
+
+    return {"chaves": vistas, "amostrado": amostrado or int(cursor) != 0, "memoria_por_prefixo": memoria}
+
+
+def _somar(memoria: dict, chave: str, bytes_usados):
+    grupo = memoria.setdefault(prefixo_da_chave(chave), {"chaves": 0, "bytes": 0})
+    grupo["chaves"] += 1
+    grupo["bytes"] += bytes_usados or 0
@@ -1,50 +1,143 @@
 # Import Fastapi, framework que facilita a criação de APIs
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
+import asyncio
+import re
 import redis
+import redis.asyncio
 import time
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String, JSON
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 import logging
-import json
 import os 
-import requests
+import banco
+import cache
+import codec
+import keyset
+import filtros
+import lote
+import migracoes
+import aquecimento
+import respostas
+import exportacao
+import inspecao
+import upstream
+from contadores import Contadores
+from upstream import POKEAPI_URL, PokeAPIClient, UpstreamError
 logging.basicConfig(level=logging.INFO)
 app = FastAPI()
-url_base = "https://pokeapi.co/api/v2/"
+
+# Cliente HTTP compartilhado (pool de conexões com keep-alive) para a PokeAPI
+pokeapi = PokeAPIClient()
+
+# Com POKEDEX_LOCAL=1, /pokemons e /pokemons/{id} são servidos pelo espelho
+# local da Pokédex (ver pokedex.py), recorrendo à PokeAPI só se faltar o registro
+POKEDEX_LOCAL = os.getenv("POKEDEX_LOCAL", "0").lower() in ("1", "true", "sim")
 
 DATABASE_URL = os.getenv("DATABASE_URL") or "sqlite:///./data/pokemons.db"
 
 
-engine = create_engine(
+# `engine` é o de escrita (e das migrações); com SQLite em arquivo as leituras
+# usam um pool separado (ver banco.py)
+engine, engine_leitura = banco.criar_engines(
     DATABASE_URL,
     pool_pre_ping=True,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessaoLeitura = sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura)
 Base = declarative_base()
+# O contador é reconciliado pela sessão de escrita, nunca pela de leitura
+contadores = Contadores(Base.metadata, SessionLocal)
 
 @app.on_event("startup")
 def startup_create_tables():
     try:
         Base.metadata.create_all(bind=engine)
+        migracoes.aplicar(engine, MIGRACOES)
         logging.info("Tabelas criadas/verificadas com sucesso.")
+    except migracoes.ChavesRepetidas:
+        # não sobe sem o índice único: a unicidade dos cadastros depende dele
+        raise
     except Exception as e:
         logging.error(f"Erro ao criar/verificar tabelas no startup: {e}")
 
+@app.on_event("startup")
+async def startup_pokeapi():
+    await pokeapi.start()
+
+@app.on_event("shutdown")
+async def shutdown_pokeapi():
+    await pokeapi.close()
+
 class PokemonDB(Base):
     __tablename__ = "pokemons"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    weight = Column(Integer, index=True)
-    height = Column(Integer, index=True)
+    # (name, weight) é a chave de duplicidade: o índice único garante a
+    # unicidade nas inserções e também atende buscas por name
+    __table_args__ = (Index("ux_pokemons_name_weight", "name", "weight", unique=True),)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    weight = Column(Integer)
+    height = Column(Integer)
+
+# Espelho local dos dados da PokeAPI, preenchido por `python pokedex.py`
+class PokedexDB(Base):
+    __tablename__ = "pokedex"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    height = Column(Integer)
+    weight = Column(Integer)
+    types = Column(JSON, nullable=False)
+    sprites = Column(JSON, nullable=False)
+
+    def para_resposta(self):
+        return {
+            "name": self.name.capitalize(),
+            "id": self.id,
+            "height": self.height,
+            "weight": self.weight,
+            "types": self.types,
+            "sprites": self.sprites,
+        }
+
+# Migrações do schema de bancos já existentes (ver migracoes.py); a posição na
+# lista é a versão. Não remova nem reordene: só acrescente no fim.
+def indices_por_chave_de_duplicidade(conn):
+    # os índices de coluna única não atendiam nenhuma consulta e só pesavam nas escritas
+    migracoes.remover_indices(conn, "pokemons", ["ix_pokemons_id", "ix_pokemons_name", "ix_pokemons_weight", "ix_pokemons_height"])
+    if migracoes.criar_indice_unico(conn, PokemonDB.__table__, "ux_pokemons_name_weight"):
+        contadores.invalidar(conn, PokemonDB)
+
+def busca_textual(conn):
+    filtros.criar_indice_busca(conn, PokemonDB.__table__, ["name"])
+
+MIGRACOES = [indices_por_chave_de_duplicidade, busca_textual]
+
+# Reduz a resposta da PokeAPI aos campos que a API expõe (e que o espelho guarda)
+def resumir_pokemon(dados_pokemon):
+    sprites = dados_pokemon["sprites"]
+    return {
+        "name": dados_pokemon["name"],
+        "id": dados_pokemon["id"],
+        "height": dados_pokemon["height"],
+        "weight": dados_pokemon["weight"],
+        "types": [tipo["type"]["name"] for tipo in dados_pokemon["types"]],
+        "sprites": {
+            "front_default": sprites.get("front_default"),
+            "back_default": sprites.get("back_default")
+        },
+    }
 
 class Pokemon(BaseModel):
     name: str
     weight: int
     height: int   
 
+class PokemonComId(Pokemon):
+    id: int
+
 def sessao_db():
     db = SessionLocal()
     try:
@@ -52,12 +145,35 @@ def sessao_db():
     finally:
         db.close()
 
+# Sessão dos endpoints que só leem
+def sessao_leitura():
+    db = SessaoLeitura()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Com MODO_ASYNC=1 os endpoints recebem uma AsyncSession e usam redis.asyncio,
+# sobrepondo I/O de banco e cache num mesmo worker. A exportação em streaming
+# continua com a sessão síncrona (o gerador roda no threadpool).
+sessao_db_sync = sessao_leitura
+
+if banco.MODO_ASYNC:
+    engine_async, SessaoAsync = banco.criar_sessao_async(DATABASE_URL, pool_pre_ping=True)
+
+    async def sessao_db():
+        async with SessaoAsync() as db:
+            yield db
+
+    sessao_leitura = sessao_db
+
 REDIS_URL = os.getenv("REDIS_URL")
 
 def connect_redis(url, retries=3, delay=2):
     for attempt in range(1, retries + 1):
         try:
-            client = redis.from_url(url, decode_responses=True)
+            # Respostas em bytes: as entradas do cache são binárias (ver codec.py)
+            client = redis.from_url(url)
             client.ping()  
             logging.info("Redis conectado com sucesso.")
             return client
@@ -68,74 +184,129 @@ def connect_redis(url, retries=3, delay=2):
     return None
 
 redis_client = connect_redis(REDIS_URL)
+# O cliente síncrono continua atendendo o pub/sub e a inspeção do cache
+redis_sync = redis_client
+
+if banco.MODO_ASYNC and redis_client:
+    redis_client = redis.asyncio.Redis(connection_pool=redis.asyncio.BlockingConnectionPool.from_url(
+        REDIS_URL,
+        max_connections=int(os.getenv("REDIS_MAX_CONEXOES", 50)),
+    ))
+
+# Segmentos do cache local (L1): páginas do banco mudam com escritas, então
+# ficam menos tempo em memória que os dados vindos da PokeAPI
+cache.l1.configurar("pokemons:page=", max_itens=int(os.getenv("CACHE_L1_DATA_TAMANHO", 256)), ttl=float(os.getenv("CACHE_L1_DATA_TTL", 5)))
+cache.l1.configurar("pokemons:offset=", max_itens=int(os.getenv("CACHE_L1_LISTA_TAMANHO", 256)), ttl=float(os.getenv("CACHE_L1_LISTA_TTL", 30)))
+cache.l1.configurar("pokemons:", max_itens=int(os.getenv("CACHE_L1_ID_TAMANHO", 2048)), ttl=float(os.getenv("CACHE_L1_ID_TTL", 30)))
+
+# TTLs do cache por endpoint (segundos). Dados da PokeAPI quase não mudam, então
+# ficam no Redis bem além do soft TTL e são revalidados em segundo plano;
+# páginas do banco são invalidadas nas escritas e não usam janela stale.
+TTL_POKEMONS = cache.ttl_configurado("pokemons", soft=90, hard=900)
+TTL_POKEMONS_ID = cache.ttl_configurado("pokemons_id", soft=90, hard=3600)
+TTL_DATA = cache.ttl_configurado("data", soft=90, hard=90)
+# Cache negativo: um 404 da PokeAPI fica guardado por pouco tempo, para
+# repetições do mesmo id não irem ao upstream
+TTL_NEGATIVO = cache.ttl_configurado("negativo", soft=60, hard=60, negativo=True)
+
+# Timeouts das chamadas à PokeAPI por endpoint (UPSTREAM_TIMEOUT_POKEMONS, ...)
+TIMEOUT_POKEMONS = upstream.timeout_configurado("pokemons")
+TIMEOUT_POKEMONS_ID = upstream.timeout_configurado("pokemons_id")
+
+# /pokemons/batch: máximo de ids por requisição e de buscas simultâneas à PokeAPI
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 50))
+BATCH_CONCORRENCIA = int(os.getenv("BATCH_CONCORRENCIA", 10))
+
+@app.on_event("startup")
+def startup_invalidacao():
+    cache.iniciar_invalidacao(redis_sync)
+
+@app.on_event("shutdown")
+def shutdown_invalidacao():
+    cache.parar_invalidacao()
+
+@app.on_event("shutdown")
+async def shutdown_modo_async():
+    if banco.MODO_ASYNC:
+        await engine_async.dispose()
+        if redis_client:
+            await redis_client.aclose()
 
+# Inspeção paginada do cache: passe o `cursor` retornado para a próxima página
+# (0 quando acabou). Com valores=false, só TTL e memória de cada chave.
 @app.get("/cache")
-def pokemon_cache():
-    if not redis_client:
+def pokemon_cache(cursor: int = 0, count: int = inspecao.PAGINA_PADRAO, valores: bool = True):
+    if not redis_sync:
         logging.warning("Redis não está disponível.")
         return {"message": "Redis não disponível"}
 
-    pokemons = []
     try:
-        keys_iter = redis_client.scan_iter(match="pokemons:*")
-    except Exception:
-        try:
-            keys_iter = redis_client.keys("pokemons:*")
-        except Exception as e:
-            logging.warning(f"Falha ao listar chaves do Redis: {e}")
-            return {"message": "Erro ao listar chaves do Redis"}
-
-    for chave in keys_iter:
-        try:
-            valor = redis_client.get(chave)
-            
-            if isinstance(valor, (bytes, bytearray)):
-                valor_s = valor.decode("utf-8")
-            else:
-                valor_s = valor
-
-            
-            try:
-                parsed = json.loads(valor_s) if valor_s else None
-            except Exception:
-                parsed = valor_s
-
-            try:
-                ttl = redis_client.ttl(chave)
-            except Exception:
-                ttl = None
-
-            pokemons.append({"chave": chave, "valor": parsed, "ttl": ttl})
-        except Exception as e:
-            logging.warning(f"Erro ao ler chave do Redis ({chave}): {e}")
-
-    return pokemons
+        return inspecao.inspecionar(redis_sync, "pokemons:*", cursor, count, valores)
+    except Exception as e:
+        logging.warning(f"Falha ao inspecionar o Redis: {e}")
+        return {"message": "Erro ao listar chaves do Redis"}
 
-# Endpoint GET que retornará os dados dos Pokémons
-@app.get("/pokemons")
-async def get_pokemons(limit: int = 20, offset: int = 0):
-    url = f"{url_base}/pokemon?limit={limit}&offset={offset}"
-    resposta = requests.get(url)
-    dados_pokemons = resposta.json()
-    pokemons = dados_pokemons["results"]
+# Memória usada pelo cache, agrupada por prefixo de chave
+@app.get("/cache/memoria")
+def pokemon_cache_memoria(limite: int = inspecao.AMOSTRA_MAX):
+    if not redis_sync:
+        logging.warning("Redis não está disponível.")
+        return {"message": "Redis não disponível"}
 
-    if limit < 1 or offset < 0:
-        raise HTTPException(status_code=400, detail="Valores inválidos.")
-    
-    cache_key = f"pokemons:offset={offset}&limit={limit}"
     try:
-        cached = redis_client.get(cache_key)
+        return inspecao.memoria_por_prefixo(redis_sync, "pokemons:*", limite)
     except Exception as e:
-        logging.warning(f"Erro ao acessar cache: {e}")
-        cached = None
+        logging.warning(f"Falha ao inspecionar o Redis: {e}")
+        return {"message": "Erro ao listar chaves do Redis"}
+
+@app.get("/cache/stats")
+def pokemon_cache_stats():
+    return {**cache.stats.snapshot(), "l1_itens": cache.l1.tamanhos()}
+
+# Estado do disjuntor da PokeAPI e contagem de sucessos, falhas, novas
+# tentativas e chamadas rejeitadas com o disjuntor aberto
+@app.get("/upstream/stats")
+def pokemon_upstream_stats():
+    return pokeapi.disjuntor.snapshot()
+
+# Retorna (valor, cachear) do Pokémon `id` vindo da PokeAPI; levanta UpstreamError.
+# Um 404 volta com o TTL do cache negativo.
+async def pokemon_da_pokeapi(id: int):
+    status_code, dados_pokemon = await pokeapi.get_json(f"/pokemon/{id}", timeout=TIMEOUT_POKEMONS_ID)
+    if status_code == 404:
+        return {"message": "Pokémon não encontrado na PokeAPI."}, TTL_NEGATIVO
+    if status_code != 200:
+        return {"message": f"Falha ao retornar dados. {status_code}"}, False
+
+    paginacao = resumir_pokemon(dados_pokemon)
+    paginacao["name"] = paginacao["name"].capitalize()
+    return paginacao, True
+
+# Carregadores de /pokemons e /pokemons/{id}: corrotinas que retornam (valor,
+# cachear), usadas pelos endpoints e pelo aquecimento do cache
+def carregar_lista(db, limit: int, offset: int):
+    async def carregar():
+        locais = []
+        # Pelos ids e não por OFFSET: o espelho pode ter buracos (ids que
+        # falharam na ingestão), e a página só sai dele se estiver completa
+        esperados = max(0, min(offset + limit, 1025) - offset)
+        if POKEDEX_LOCAL and esperados:
+            locais = await banco.no_banco(
+                db, lambda db: db.query(PokedexDB.id, PokedexDB.name).filter(PokedexDB.id.between(offset + 1, offset + limit)).order_by(PokedexDB.id).all()
+            )
+
+        if locais and len(locais) == esperados:
+            pokemons = [{"name": name, "url": f"{POKEAPI_URL}/pokemon/{id}/"} for id, name in locais]
+        else:
+            try:
+                status_code, dados_pokemons = await pokeapi.get_json("/pokemon", params={"limit": limit, "offset": offset}, timeout=TIMEOUT_POKEMONS)
+            except UpstreamError as e:
+                raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-    if cached:
-        try:
-            return json.loads(cached)
-        except Exception:
-            logging.warning("Cache inválido")
+            if status_code != 200:
+                return {"message": f"Falha ao retornar dados. {status_code}"}, False
+            pokemons = dados_pokemons["results"]
 
-    if resposta.status_code == 200:
         resultado = {
             "data": pokemons,
             "pagination": {
@@ -146,150 +317,305 @@ async def get_pokemons(limit: int = 20, offset: int = 0):
                 "previous": f"https://apis-gsuq.onrender.com/pokemons?limit={limit}&offset={max(offset - limit, 0)}", # placeholder, arrumar problema de numeros negativos
             }
         }
-        if redis_client:
-            try:    
-                redis_client.setex(cache_key, 90, json.dumps(resultado))
-            except Exception as e:
-                logging.warning(f"Erro ao escrever no Redis. {e}")
+        return resultado, True
 
-        return resultado
-    else:
-        return {"message": f"Falha ao retornar dados. {resposta.status_code}"}
+    return carregar
 
+def carregar_pokemon(db, id: int):
+    async def carregar():
+        if POKEDEX_LOCAL:
+            registro = await banco.no_banco(db, lambda db: db.get(PokedexDB, id))
+            if registro:
+                return registro.para_resposta(), True
+            logging.info(f"Pokémon {id} ausente do espelho local, consultando a PokeAPI.")
+
+        try:
+            return await pokemon_da_pokeapi(id)
+        except UpstreamError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return carregar
+
+# Endpoint GET que retornará os dados dos Pokémons
+@app.get("/pokemons")
+async def get_pokemons(request: Request, limit: int = 20, offset: int = 0, db: Session = Depends(sessao_leitura)):
+    if limit < 1 or offset < 0:
+        raise HTTPException(status_code=400, detail="Valores inválidos.")
+
+    cache_key = f"pokemons:offset={offset}&limit={limit}"
+    aquecimento.frequencias.registrar(cache_key)
+    return respostas.responder(request, await cache.buscar_com_cache(redis_client, cache_key, TTL_POKEMONS, carregar_lista(db, limit, offset), "pokemons"))
+
+
+# Vários Pokémon numa requisição: /pokemons/batch?ids=1,4,7. Os que estão no
+# cache saem de um MGET, os demais são buscados juntos (espelho local numa
+# consulta só e PokeAPI em paralelo, até BATCH_CONCORRENCIA de cada vez) e
+# gravados com um pipeline. "data" segue a ordem de `ids`; os que falharam
+# ficam como null e são listados em "falhas".
+# Declarada antes de /pokemons/{id}, que também casaria com "batch".
+@app.get("/pokemons/batch")
+async def get_pokemons_batch(request: Request, ids: str, db: Session = Depends(sessao_leitura)):
+    try:
+        lista = [int(parte) for parte in ids.split(",") if parte.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Informe os ids como números separados por vírgula.")
+    if not lista or len(lista) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Informe de 1 a {BATCH_MAX_IDS} ids.")
+
+    async def carregar_varios(chaves):
+        faltando = [int(chave.removeprefix("pokemons:")) for chave in chaves]
+        valores = {}
+        if POKEDEX_LOCAL:
+            registros = await banco.no_banco(db, lambda db: db.query(PokedexDB).filter(PokedexDB.id.in_(faltando)).all())
+            valores = {f"pokemons:{registro.id}": registro.para_resposta() for registro in registros}
+            faltando = [id for id in faltando if f"pokemons:{id}" not in valores]
+
+        resultados = await upstream.em_paralelo(pokemon_da_pokeapi, faltando, BATCH_CONCORRENCIA)
+        for id, resultado in zip(faltando, resultados):
+            if isinstance(resultado, Exception):
+                logging.warning(f"Falha ao buscar o Pokémon {id} no lote: {resultado!r}")
+            # só os encontrados; um 404 (cache negativo) fica em "falhas"
+            elif resultado[1] is True:
+                valores[f"pokemons:{id}"] = resultado[0]
+        return valores
+
+    chaves = [f"pokemons:{id}" if 1 <= id <= 1025 else None for id in lista]
+    for chave in chaves:
+        if chave:
+            aquecimento.frequencias.registrar(chave)
+    corpos = await cache.buscar_varios_com_cache(redis_client, [chave for chave in chaves if chave], TTL_POKEMONS_ID, carregar_varios, "pokemons:id")
+
+    # Junta os JSONs já serializados de cada Pokémon, sem desserializar
+    partes = [corpos[chave].conteudo if chave in corpos else b"null" for chave in chaves]
+    falhas = [id for id, chave in zip(lista, chaves) if chave not in corpos]
+    conteudo = b'{"data":[' + b",".join(partes) + b'],"falhas":' + codec.json_bytes(falhas) + b"}"
+    modificado_em = max((corpo.modificado_em for corpo in corpos.values() if corpo.modificado_em), default=None)
+    return respostas.responder(request, respostas.corpo(conteudo, modificado_em))
 
 # Endpoint GET que retorna dados do Pokémon especificado por ID
 @app.get("/pokemons/{id}")
-async def get_pokemons_id(id: int):
+async def get_pokemons_id(request: Request, id: int, db: Session = Depends(sessao_leitura)):
     if id > 1025 or id < 1:
         raise HTTPException(status_code=404, detail="Pokémon não encontrado.")
-    
-    url = f"{url_base}/pokemon/{id}"
-    resposta = requests.get(url)
-    dados_pokemon = resposta.json()
 
     cache_key = f"pokemons:{id}"
-    try: 
-        cached = redis_client.get(cache_key) if redis_client else None
-    except Exception as e:
-        logging.warning(f"Erro ao acessar cache: {e}")
-        cached = None
+    aquecimento.frequencias.registrar(cache_key)
+    return respostas.responder(request, await cache.buscar_com_cache(redis_client, cache_key, TTL_POKEMONS_ID, carregar_pokemon(db, id), "pokemons:id"))
+
+# Aquecimento do cache (ver aquecimento.py): só as chaves de /pokemons e
+# /pokemons/{id}; as páginas de /data são invalidadas nas escritas e não entram
+def carregador_da_chave(db, chave: str):
+    if lista := re.fullmatch(r"pokemons:offset=(\d+)&limit=(\d+)", chave):
+        return TTL_POKEMONS, carregar_lista(db, int(lista[2]), int(lista[1])), "pokemons"
+    if (id := re.fullmatch(r"pokemons:(\d+)", chave)) and 1 <= int(id[1]) <= 1025:
+        return TTL_POKEMONS_ID, carregar_pokemon(db, int(id[1])), "pokemons:id"
+    return None
 
-    if cached:
-        try:
-            return json.loads(cached)
-        except Exception:
-            logging.warning("Cache inválido.")
-    
-    if resposta.status_code == 200:
-        sprites = dados_pokemon["sprites"]
-        sprites_selecionados = {
-            "front_default": sprites.get("front_default"),
-            "back_default": sprites.get("back_default")
-        }
-        tipos = [tipo["type"]["name"] for tipo in dados_pokemon["types"]]
-        paginacao = {
-            "name": dados_pokemon["name"].capitalize(),
-            "id": dados_pokemon["id"],
-            "height": dados_pokemon["height"],
-            "weight": dados_pokemon["weight"],
-            "types": tipos,
-            "sprites": sprites_selecionados    
-        }
-        if redis_client:
-            try:
-                redis_client.setex(cache_key, 90, json.dumps(paginacao))
-            except Exception as e:
-                logging.warning(f"Falha ao escrever no Redis: {e}")
+async def aquecer_cache(quantidade: int = aquecimento.CHAVES, por_segundo: float = aquecimento.POR_SEGUNDO, concorrencia: int = aquecimento.CONCORRENCIA):
+    with SessaoLeitura() as db:
+        async def recarregar(chave):
+            carregador = carregador_da_chave(db, chave)
+            if carregador is None:
+                return False
+            ttl, carregar, nome = carregador
+            await cache.recarregar(redis_client, chave, ttl, carregar, nome)
+            return True
 
-        return paginacao
-    else:
-        return {"message": f"Falha ao retornar dados. {resposta.status_code}"}
+        chaves = await aquecimento.mais_frequentes(redis_client, quantidade)
+        return await aquecimento.aquecer(redis_client, chaves, recarregar, por_segundo, concorrencia)
+
+# Tarefas em segundo plano do aquecimento (evita que sejam coletadas pelo GC)
+tarefas_aquecimento = set()
+
+@app.on_event("startup")
+async def startup_aquecimento():
+    tarefas = [aquecimento.salvar_periodicamente(redis_client)]
+    if aquecimento.NO_STARTUP and await aquecimento.obter_lock(redis_client):
+        tarefas.append(aquecer_cache())
+    for tarefa in tarefas:
+        tarefa = asyncio.ensure_future(tarefa)
+        tarefas_aquecimento.add(tarefa)
+        tarefa.add_done_callback(tarefas_aquecimento.discard)
+
+@app.on_event("shutdown")
+async def shutdown_aquecimento():
+    for tarefa in list(tarefas_aquecimento):
+        tarefa.cancel()
+    await aquecimento.salvar(redis_client)
+
+# Filtros: `name` (prefixo), `q` (busca textual no nome) e `ordenar` (name,
+# weight ou height; "-" na frente para ordem decrescente)
+CAMPOS_ORDENACAO = {"name": PokemonDB.name, "weight": PokemonDB.weight, "height": PokemonDB.height}
 
 @app.get("/data")
-async def get_pokemons(page: int = 1, limit: int = 10, db: Session = Depends(sessao_db)):
+async def get_pokemons(request: Request, page: int = 1, limit: int = 10, cursor: str | None = None, incluir_total: bool = True, name: str | None = None, q: str | None = None, ordenar: str | None = None, db: Session = Depends(sessao_leitura)):
     if page < 1 or limit < 1:
         raise HTTPException(status_code=400, detail="Page ou limit com valores inválidos.")
+    ordem = filtros.ordenacao(ordenar, CAMPOS_ORDENACAO, PokemonDB.id)
+    if cursor and ordem:
+        raise HTTPException(status_code=400, detail="A paginação por cursor só aceita a ordenação padrão (id).")
+
+    def consultar(db):
+        query = db.query(PokemonDB)
+        if name:
+            query = query.filter(filtros.prefixo(PokemonDB.name, name))
+        if q:
+            query = filtros.buscar(query, PokemonDB, ["name"], q)
+
+        if cursor:
+            pokemons, next_cursor, prev_cursor = keyset.paginar_por_cursor(query, PokemonDB.id, cursor, limit)
+        else:
+            pokemons = query.order_by(*(ordem or [PokemonDB.id])).offset((page - 1) * limit).limit(limit).all()
+            # com outra ordenação os cursores (por id) não valem
+            next_cursor, prev_cursor = (None, None) if ordem else keyset.cursores_da_pagina(pokemons, PokemonDB.id, page, limit)
+        if not pokemons:
+            return None
+
+        # O contador mantido só vale para a tabela inteira; com filtro, conta a consulta
+        if not incluir_total:
+            total_pokemons = None
+        elif name or q:
+            total_pokemons = query.count()
+        else:
+            total_pokemons = contadores.total(db, PokemonDB)
 
-    cache_key = f"pokemons:page={page}:limit={limit}"
+        paginacao = {
+            "page": None if cursor else page,
+            "limit": limit,
+            "total": total_pokemons,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "pokemons": [
+                {"id": pokemon.id, "name": pokemon.name, "weight": pokemon.weight, "height": pokemon.height}
+                for pokemon in pokemons
+            ],
+        }
+        return paginacao
 
-    
-    cached = None
-    if redis_client:
-        try:
-            cached = redis_client.get(cache_key)
-        except Exception as e:
-            logging.warning(f"Erro ao acessar cache: {e}")
-            cached = None
+    async def carregar():
+        paginacao = await banco.no_banco(db, consultar)
+        if paginacao is None:
+            return {"message": "Não existe nenhum Pokémon."}, False
+        return paginacao, True
 
-    if cached:
+    if cursor:
+        cache_key = f"pokemons:page=cursor={cursor}:limit={limit}"
+    else:
+        cache_key = f"pokemons:page={page}:limit={limit}"
+    if not incluir_total:
+        cache_key += ":sem_total"
+    # Os filtros entram na chave; como ela continua começando por
+    # "pokemons:page=", as escritas também invalidam as páginas filtradas
+    cache_key += filtros.chave(":", name=name, q=q, ordenar=ordenar)
+    return respostas.responder(request, await cache.buscar_com_cache(redis_client, cache_key, TTL_DATA, carregar, "data"))
+
+# Exporta a tabela inteira em streaming (NDJSON ou CSV, com gzip se o cliente aceitar)
+@app.get("/data/exportar")
+def exportar_pokemons(request: Request, formato: str = "ndjson", db: Session = Depends(sessao_db_sync)):
+    return exportacao.exportar(request, db, PokemonDB, ["id", "name", "weight", "height"], formato, "pokemons")
+
+@app.post("/pokemons")
+async def post_pokemons(pokemon: Pokemon, db: Session = Depends(sessao_db)):
+    def inserir(db):
+        novo_pokemon = PokemonDB(name=pokemon.name, weight=pokemon.weight, height=pokemon.height)
+        db.add(novo_pokemon)
+        # Sem consulta prévia: o índice único de (name, weight) recusa o duplicado
         try:
-            if isinstance(cached, (bytes, bytearray)):
-                cached = cached.decode("utf-8")
-            return json.loads(cached)
-        except Exception:
-            logging.warning("Cache inválido. Continuando para consulta ao DB.")
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Esse pokémon já existe no banco de dados.")
+        contadores.ajustar(db, PokemonDB, +1)
+        db.commit()
 
-    
-    pokemons = db.query(PokemonDB).offset((page - 1) * limit).limit(limit).all()
-    if not pokemons:
-        return {"message": "Não existe nenhum Pokémon."}
-
-    total_pokemons = db.query(PokemonDB).count()
-
-    paginacao = {
-        "page": page,
-        "limit": limit,
-        "total": total_pokemons,
-        "pokemons": [
-            {"id": pokemon.id, "name": pokemon.name, "weight": pokemon.weight, "height": pokemon.height}
-            for pokemon in pokemons
-        ],
-    }
+    await banco.no_banco(db, inserir, em_thread=True)
+    await cache.invalidar_prefixo(redis_client, "pokemons:page=")
 
-    
-    if redis_client:
-        try:
-            redis_client.setex(cache_key, 90, json.dumps(paginacao))
-        except Exception as e:
-            logging.warning(f"Falha ao escrever no Redis: {e}")
+    return {"message": "O Pokémon foi adicionado."}
 
-    return paginacao
 
-@app.post("/pokemons")
-async def post_pokemons(pokemon: Pokemon, db: Session = Depends(sessao_db)):
-    db_pokemon = db.query(PokemonDB).filter(PokemonDB.name == pokemon.name, PokemonDB.weight == pokemon.weight).first()
-    if db_pokemon:
-        raise HTTPException(status_code=400, detail="Esse pokémon já existe no banco de dados.")
-    novo_pokemon = PokemonDB(name=pokemon.name, weight=pokemon.weight, height=pokemon.height)
-    db.add(novo_pokemon)
-    db.commit()
-    db.refresh(novo_pokemon)
+# Endpoints em lote: aceitam um array JSON ou NDJSON (Content-Type: application/x-ndjson)
+# e respondem com o resultado de cada item, na ordem de envio
+@app.post("/pokemons/lote")
+async def post_pokemons_lote(request: Request, atualizar_existentes: bool = False, db: Session = Depends(sessao_db)):
+    validos, resultados = await lote.ler_lote(request, Pokemon)
+    itens = [(indice, pokemon.model_dump()) for indice, pokemon in validos]
 
-    return {"message": "O Pokémon foi adicionado."}
+    def gravar(db):
+        gravados = lote.criar_em_lote(db, PokemonDB, [PokemonDB.name, PokemonDB.weight], itens, atualizar_existentes, contadores)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+    await cache.invalidar_prefixo(redis_client, "pokemons:page=")
+
+    return lote.resumir(resultados)
+
+@app.put("/pokemons/lote")
+async def put_pokemons_lote(request: Request, db: Session = Depends(sessao_db)):
+    validos, resultados = await lote.ler_lote(request, PokemonComId)
+    itens = [(indice, pokemon.id, pokemon.model_dump(exclude={"id"})) for indice, pokemon in validos]
+
+    def gravar(db):
+        gravados = lote.atualizar_em_lote(db, PokemonDB, PokemonDB.id, itens)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+    await cache.invalidar_prefixo(redis_client, "pokemons:page=")
+
+    return lote.resumir(resultados)
+
+@app.delete("/pokemons/lote")
+async def del_pokemons_lote(request: Request, db: Session = Depends(sessao_db)):
+    validos, resultados = await lote.ler_lote(request, int)
+
+    def gravar(db):
+        gravados = lote.remover_em_lote(db, PokemonDB, PokemonDB.id, validos, contadores)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+    await cache.invalidar_prefixo(redis_client, "pokemons:page=")
+
+    return lote.resumir(resultados)
 
 
 @app.put("/pokemons/{id_pokemon}")
 async def put_pokemons(id_pokemon: int, pokemon: Pokemon, db: Session = Depends(sessao_db)):
-    db_pokemon = db.query(PokemonDB).filter(PokemonDB.id == id_pokemon).first()
-    if not db_pokemon:
-        raise HTTPException(status_code=404, detail="Pokemon não encontrado.")
-    db_pokemon.name = pokemon.name
-    db_pokemon.weight = pokemon.weight
-    db_pokemon.height = pokemon.height
-    db.commit()
-    db.refresh(db_pokemon)
+    def atualizar(db):
+        db_pokemon = db.query(PokemonDB).filter(PokemonDB.id == id_pokemon).first()
+        if not db_pokemon:
+            raise HTTPException(status_code=404, detail="Pokemon não encontrado.")
+        db_pokemon.name = pokemon.name
+        db_pokemon.weight = pokemon.weight
+        db_pokemon.height = pokemon.height
+        # (name, weight) de outro registro: o índice único recusa
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Esse pokémon já existe no banco de dados.")
+
+    await banco.no_banco(db, atualizar, em_thread=True)
+    await cache.invalidar_prefixo(redis_client, "pokemons:page=")
 
     return {"message": "O Pokémon foi atualizado."}    
 
 @app.delete("/pokemons/{id_pokemon}")
 async def del_pokemons(id_pokemon: int, db: Session = Depends(sessao_db)):
-    db_pokemon = db.query(PokemonDB).filter(PokemonDB.id == id_pokemon).first()
-
-    if not db_pokemon:
-        raise HTTPException(status_code=404, detail="Esse pokémon não existe.")
-    
-    db.delete(db_pokemon)
-    db.commit()
+    def remover(db):
+        db_pokemon = db.query(PokemonDB).filter(PokemonDB.id == id_pokemon).first()
+
+        if not db_pokemon:
+            raise HTTPException(status_code=404, detail="Esse pokémon não existe.")
+        
+        db.delete(db_pokemon)
+        contadores.ajustar(db, PokemonDB, -1)
+        db.commit()
+
+    await banco.no_banco(db, remover, em_thread=True)
+    await cache.invalidar_prefixo(redis_client, "pokemons:page=")
 
     return {"message": "Pokémon deletado com sucesso!"}
     
@@ -0,0 +1,120 @@
+# Ingestão da PokeAPI no espelho local (tabela "pokedex")
+#
+# Uso:
+#   python pokedex.py                          # ids 1..1025 direto da PokeAPI
+#   python pokedex.py --gravar fixtures/       # também grava as respostas em disco
+#   python pokedex.py --fixtures fixtures/     # offline, a partir das respostas gravadas
+#
+# A ingestão é retomável: ids que já estão na tabela são pulados e cada lote
+# é gravado em sua própria transação, então uma execução interrompida
+# continua de onde parou.
+import argparse
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+
+from main import Base, PokedexDB, SessionLocal, engine, resumir_pokemon
+from upstream import PokeAPIClient, UpstreamError
+
+TOTAL_POKEMONS = 1025
+
+
+# Cliente offline: responde a partir de um diretório com <dir>/pokemon/<id>.json
+class FixtureClient:
+    def __init__(self, diretorio):
+        self.diretorio = Path(diretorio)
+
+    async def get_json(self, path: str, params: dict | None = None):
+        arquivo = self.diretorio / f"{path.strip('/')}.json"
+        if not arquivo.exists():
+            return 404, None
+        return 200, json.loads(arquivo.read_text(encoding="utf-8"))
+
+    async def close(self):
+        pass
+
+
+# Repassa as chamadas a outro cliente e grava as respostas 200 como fixtures
+class GravadorClient:
+    def __init__(self, cliente, diretorio):
+        self.cliente = cliente
+        self.diretorio = Path(diretorio)
+
+    async def get_json(self, path: str, params: dict | None = None):
+        status_code, dados = await self.cliente.get_json(path, params=params)
+        if status_code == 200:
+            arquivo = self.diretorio / f"{path.strip('/')}.json"
+            arquivo.parent.mkdir(parents=True, exist_ok=True)
+            arquivo.write_text(json.dumps(dados), encoding="utf-8")
+        return status_code, dados
+
+    async def close(self):
+        await self.cliente.close()
+
+
+async def _buscar(cliente, id: int):
+    try:
+        status_code, dados = await cliente.get_json(f"/pokemon/{id}")
+    except UpstreamError as e:
+        logging.warning(f"Falha ao buscar Pokémon {id}: {e.detail}")
+        return id, None
+    if status_code != 200:
+        logging.warning(f"Falha ao buscar Pokémon {id}: {status_code}")
+        return id, None
+    return id, resumir_pokemon(dados)
+
+
+async def ingerir(cliente, ids, sessao=SessionLocal, lote: int = 100):
+    ids = list(ids)
+    with sessao() as db:
+        existentes = {id for (id,) in db.query(PokedexDB.id).filter(PokedexDB.id.in_(ids))}
+    pendentes = [id for id in ids if id not in existentes]
+    resumo = {"ingeridos": 0, "ja_existentes": len(existentes), "falhas": []}
+
+    # A concorrência das chamadas é limitada pelo semáforo do cliente
+    for inicio in range(0, len(pendentes), lote):
+        resultados = await asyncio.gather(*(_buscar(cliente, id) for id in pendentes[inicio:inicio + lote]))
+        registros = [PokedexDB(**dados) for _, dados in resultados if dados]
+        resumo["falhas"].extend(id for id, dados in resultados if not dados)
+
+        with sessao() as db:
+            db.add_all(registros)
+            db.commit()
+        resumo["ingeridos"] += len(registros)
+        logging.info(f"Pokédex: {resumo['ingeridos']} ingeridos, {len(resumo['falhas'])} falhas.")
+
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingere a PokeAPI no espelho local da Pokédex.")
+    parser.add_argument("--inicio", type=int, default=1)
+    parser.add_argument("--fim", type=int, default=TOTAL_POKEMONS)
+    parser.add_argument("--lote", type=int, default=100, help="registros por transação")
+    parser.add_argument("--concorrencia", type=int, default=int(os.getenv("UPSTREAM_CONCURRENCY", 20)))
+    parser.add_argument("--fixtures", help="diretório com respostas gravadas (execução offline)")
+    parser.add_argument("--gravar", help="diretório onde gravar as respostas da PokeAPI")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        cliente = FixtureClient(args.fixtures)
+    else:
+        cliente = PokeAPIClient(concurrency=args.concorrencia)
+        if args.gravar:
+            cliente = GravadorClient(cliente, args.gravar)
+
+    async def executar():
+        try:
+            return await ingerir(cliente, range(args.inicio, args.fim + 1), lote=args.lote)
+        finally:
+            await cliente.close()
+
+    Base.metadata.create_all(bind=engine)
+    resumo = asyncio.run(executar())
+    print(json.dumps(resumo))
+
+
+if __name__ == "__main__":
+    main()
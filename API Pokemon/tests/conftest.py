@@ -0,0 +1,334 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+import cache
+import main
+import migracoes
+from upstream import PokeAPIClient
+
+
+def pokemon_fake(id):
+    return {
+        "id": id,
+        "name": f"pokemon-{id}",
+        "height": id % 20 + 1,
+        "weight": id * 10,
+        "types": [{"slot": 1, "type": {"name": "normal", "url": ""}}],
+        "sprites": {"front_default": f"front/{id}.png", "back_default": f"back/{id}.png"},
+    }
+
+
+# Servidor HTTP local que substitui a pokeapi.co nos testes
+class PokeAPIStub:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.status_code = None
+        self.chamadas = []
+        self.em_andamento = 0
+        self.max_em_andamento = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def responder(self, path, query):
+        if self.status_code:
+            return self.status_code, {"detail": "erro"}
+        partes = path.strip("/").split("/")
+        if partes == ["pokemon"]:
+            limit = int(query.get("limit", ["20"])[0])
+            offset = int(query.get("offset", ["0"])[0])
+            resultados = [
+                {"name": f"pokemon-{i}", "url": f"{self.url}/pokemon/{i}/"}
+                for i in range(offset + 1, min(offset + limit, 1025) + 1)
+            ]
+            return 200, {"count": 1025, "results": resultados}
+        if len(partes) == 2 and partes[0] == "pokemon" and partes[1].isdigit() and 1 <= int(partes[1]) <= 1025:
+            return 200, pokemon_fake(int(partes[1]))
+        return 404, {"detail": "Not Found"}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                with stub._lock:
+                    stub.chamadas.append(self.path)
+                    stub.em_andamento += 1
+                    stub.max_em_andamento = max(stub.max_em_andamento, stub.em_andamento)
+                try:
+                    if stub.delay:
+                        time.sleep(stub.delay)
+                    status, corpo = stub.responder(url.path, parse_qs(url.query))
+                finally:
+                    with stub._lock:
+                        stub.em_andamento -= 1
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# Redis em memória com o subconjunto de comandos usado pela aplicação
+class RedisFake:
+    def __init__(self):
+        self.dados = {}
+        self.expira = {}
+        self.publicadas = []
+
+    def _vivo(self, chave):
+        if chave in self.expira and self.expira[chave] <= time.monotonic():
+            self.dados.pop(chave, None)
+            self.expira.pop(chave, None)
+        return chave in self.dados
+
+    def get(self, chave):
+        return self.dados[chave] if self._vivo(chave) else None
+
+    def mget(self, chaves):
+        self.mgets = getattr(self, "mgets", 0) + 1
+        return [self.get(chave) for chave in chaves]
+
+    def set(self, chave, valor, ex=None, nx=False):
+        if nx and self._vivo(chave):
+            return None
+        self.dados[chave] = valor
+        self.expira.pop(chave, None)
+        if ex:
+            self.expira[chave] = time.monotonic() + ex
+        return True
+
+    def setex(self, chave, ttl, valor):
+        return self.set(chave, valor, ex=ttl)
+
+    def delete(self, *chaves):
+        return sum(1 for chave in chaves if self.dados.pop(chave, None) is not None)
+
+    def scan_iter(self, match="*", count=None):
+        prefixo = match.rstrip("*")
+        return iter([chave for chave in list(self.dados) if chave.startswith(prefixo) and self._vivo(chave)])
+
+    # Cursor = posição na lista ordenada de chaves
+    def scan(self, cursor=0, match="*", count=10):
+        chaves = sorted(self.scan_iter(match))
+        proximo = cursor + count
+        return (proximo if proximo < len(chaves) else 0), chaves[cursor:proximo]
+
+    # Sorted sets: dicionário membro -> score
+    def zincrby(self, chave, quantidade, membro):
+        zset = self.dados.setdefault(chave, {})
+        zset[membro] = zset.get(membro, 0) + quantidade
+        return zset[membro]
+
+    def zrevrange(self, chave, inicio, fim):
+        membros = sorted(self.dados.get(chave, {}).items(), key=lambda item: -item[1])
+        return [membro.encode() for membro, _ in membros][inicio:None if fim == -1 else fim + 1]
+
+    def zremrangebyrank(self, chave, inicio, fim):
+        membros = sorted(self.dados.get(chave, {}).items(), key=lambda item: item[1])
+        remover = membros[inicio:None if fim == -1 else fim + 1]
+        for membro, _ in remover:
+            del self.dados[chave][membro]
+        return len(remover)
+
+    def memory_usage(self, chave):
+        return len(self.dados[chave]) + 50 if self._vivo(chave) else None
+
+    def pipeline(self, transaction=True):
+        return PipelineFake(self)
+
+    def publish(self, canal, mensagem):
+        self.publicadas.append((canal, mensagem))
+        return 0
+
+    def ttl(self, chave):
+        if not self._vivo(chave):
+            return -2
+        if chave not in self.expira:
+            return -1
+        return int(self.expira[chave] - time.monotonic())
+
+
+# Enfileira os comandos e os executa no RedisFake em execute()
+class PipelineFake:
+    def __init__(self, redis):
+        self.redis = redis
+        self.comandos = []
+
+    def __getattr__(self, nome):
+        return lambda *args, **kwargs: self.comandos.append((nome, args, kwargs))
+
+    def execute(self, raise_on_error=True):
+        self.redis.pipelines = getattr(self.redis, "pipelines", 0) + 1
+        comandos, self.comandos = self.comandos, []
+        return [getattr(self.redis, nome)(*args, **kwargs) for nome, args, kwargs in comandos]
+
+
+# Mesma interface do redis.asyncio: comandos são corrotinas e scan_iter é um iterador assíncrono
+class RedisFakeAsync:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def __getattr__(self, nome):
+        comando = getattr(self.redis, nome)
+
+        async def executar(*args, **kwargs):
+            return comando(*args, **kwargs)
+        return executar
+
+    async def scan_iter(self, match="*", count=None):
+        for chave in self.redis.scan_iter(match, count):
+            yield chave
+
+
+@pytest.fixture(autouse=True)
+def limpar_cache_local():
+    cache.l1.limpar()
+    cache.stats.reset()
+    yield
+
+
+@pytest.fixture
+def redis_fake(monkeypatch):
+    fake = RedisFake()
+    monkeypatch.setattr(main, "redis_client", fake)
+    monkeypatch.setattr(main, "redis_sync", fake)
+    yield fake
+
+
+# redis_client assíncrono (MODO_ASYNC=1) sobre o mesmo RedisFake; o pub/sub e a
+# inspeção continuam no cliente síncrono
+@pytest.fixture
+def redis_fake_async(monkeypatch):
+    fake = RedisFake()
+    monkeypatch.setattr(main, "redis_client", RedisFakeAsync(fake))
+    monkeypatch.setattr(main, "redis_sync", fake)
+    yield fake
+
+
+@pytest.fixture
+def pokeapi_stub(monkeypatch):
+    stub = PokeAPIStub().start()
+    monkeypatch.setattr(main, "pokeapi", PokeAPIClient(base_url=stub.url))
+    yield stub
+    stub.stop()
+
+
+# Banco SQLite em memória isolado por teste, injetado no lugar de main.sessao_db,
+# main.sessao_leitura e main.sessao_db_sync (com MODO_ASYNC=1 as duas
+# primeiras são assíncronas; aqui todas recebem a Session síncrona)
+@pytest.fixture
+def sessao(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    main.Base.metadata.create_all(bind=engine)
+    migracoes.aplicar(engine, main.MIGRACOES)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def sessao_db():
+        db = Sessao()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    for dependencia in (main.sessao_db, main.sessao_leitura, main.sessao_db_sync):
+        monkeypatch.setitem(main.app.dependency_overrides, dependencia, sessao_db)
+    monkeypatch.setattr(main.contadores, "sessoes_escrita", Sessao)
+    yield Sessao
+    main.contadores.aguardar()
+
+
+# AsyncSession real (aiosqlite) sobre um SQLite em arquivo, no lugar de
+# main.sessao_db e main.sessao_leitura. Sem pool: o TestClient abre um event
+# loop por requisição e uma conexão do aiosqlite não passa de um loop a outro.
+@pytest.fixture
+def sessao_async(monkeypatch, tmp_path):
+    url = f"sqlite:///{tmp_path}/async.db"
+    engine = create_engine(url)
+    main.Base.metadata.create_all(bind=engine)
+    migracoes.aplicar(engine, main.MIGRACOES)
+    # a reconciliação dos contadores usa uma sessão síncrona de escrita
+    monkeypatch.setattr(main.contadores, "sessoes_escrita", sessionmaker(bind=engine))
+    engine_async, SessaoAsync = banco.criar_sessao_async(url, poolclass=NullPool)
+
+    async def sessao_db():
+        async with SessaoAsync() as db:
+            yield db
+
+    for dependencia in (main.sessao_db, main.sessao_leitura):
+        monkeypatch.setitem(main.app.dependency_overrides, dependencia, sessao_db)
+    yield SessaoAsync
+    main.contadores.aguardar()
+    asyncio.run(engine_async.dispose())
+    engine.dispose()
+
+
+# SQLite em arquivo com o perfil de banco.criar_engines (WAL, uma única conexão
+# de escrita e pool de leitura), esperando no máximo 2 s pela conexão de escrita
+@pytest.fixture
+def sessao_wal(monkeypatch, tmp_path):
+    monkeypatch.setattr(banco, "SQLITE_OTIMIZADO", True)
+    monkeypatch.setattr(banco, "SQLITE_ESPERA_ESCRITA", 2)
+    escrita, leitura = banco.criar_engines(f"sqlite:///{tmp_path}/wal.db")
+    main.Base.metadata.create_all(bind=escrita)
+    migracoes.aplicar(escrita, main.MIGRACOES)
+
+    def sessoes(engine):
+        Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def sessao_db():
+            db = Sessao()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        return Sessao, sessao_db
+
+    SessaoEscrita, sessao_escrita = sessoes(escrita)
+    _, sessao_leitura = sessoes(leitura)
+    monkeypatch.setitem(main.app.dependency_overrides, main.sessao_db, sessao_escrita)
+    for dependencia in (main.sessao_leitura, main.sessao_db_sync):
+        monkeypatch.setitem(main.app.dependency_overrides, dependencia, sessao_leitura)
+    monkeypatch.setattr(main.contadores, "sessoes_escrita", SessaoEscrita)
+    yield SessaoEscrita
+    main.contadores.aguardar()
+    escrita.dispose()
+    leitura.dispose()
@@ -0,0 +1,81 @@
+import asyncio
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from fastapi.testclient import TestClient
+import aquecimento
+import cache
+import main
+
+client = TestClient(main.app)
+
+
+@pytest.fixture(autouse=True)
+def frequencias(monkeypatch, tmp_path):
+    monkeypatch.setattr(aquecimento, "frequencias", aquecimento.Frequencias(capacidade=4))
+    monkeypatch.setattr(aquecimento, "ARQUIVO", str(tmp_path / "aquecimento.json"))
+    return aquecimento.frequencias
+
+
+def test_frequencias_mantem_as_mais_pedidas(frequencias):
+    for i in range(20):
+        frequencias.registrar(f"rara-{i}")
+        frequencias.registrar("popular")
+        if i % 2:
+            frequencias.registrar("media")
+
+    assert frequencias.mais_frequentes(2) == ["popular", "media"]
+    assert len(frequencias._total) <= 2 * frequencias.capacidade
+
+
+def test_salvar_soma_no_redis_e_grava_arquivo(redis_fake, frequencias):
+    for chave in ["pokemons:1", "pokemons:2", "pokemons:2"]:
+        frequencias.registrar(chave)
+    asyncio.run(aquecimento.salvar(redis_fake))
+    frequencias.registrar("pokemons:1")
+    frequencias.registrar("pokemons:1")
+    asyncio.run(aquecimento.salvar(redis_fake))
+
+    assert redis_fake.get(aquecimento.CHAVE_FREQUENCIAS) == {"pokemons:1": 3, "pokemons:2": 2}
+    assert aquecimento.ler_arquivo() == ["pokemons:1", "pokemons:2"]
+
+
+def test_aquece_as_chaves_mais_pedidas_depois_de_reiniciar_o_redis(pokeapi_stub, redis_fake):
+    for caminho in ["/pokemons/3", "/pokemons/3", "/pokemons/7", "/pokemons?limit=5&offset=0"]:
+        client.get(caminho)
+    asyncio.run(aquecimento.salvar(redis_fake))
+
+    # Redis reiniciado sem persistência: o ranking vem do arquivo
+    redis_fake.dados.clear()
+    cache.l1.limpar()
+    pokeapi_stub.chamadas.clear()
+    resumo = asyncio.run(main.aquecer_cache(por_segundo=1000))
+
+    assert resumo["aquecidas"] == 3 and resumo["falhas"] == 0
+    assert sorted(pokeapi_stub.chamadas) == ["/pokemon/3", "/pokemon/7", "/pokemon?limit=5&offset=0"]
+    assert redis_fake.get("pokemons:3") is not None
+    assert redis_fake.get("pokemons:offset=0&limit=5") is not None
+
+    assert asyncio.run(main.aquecer_cache(por_segundo=1000))["ja_no_cache"] == 3
+
+
+def test_aquecer_limita_vazao_e_concorrencia():
+    em_andamento = maximo = 0
+
+    async def recarregar(chave):
+        nonlocal em_andamento, maximo
+        em_andamento += 1
+        maximo = max(maximo, em_andamento)
+        await asyncio.sleep(0.05)
+        em_andamento -= 1
+        return not chave.startswith("pokemons:page=")
+
+    chaves = [f"pokemons:{i}" for i in range(10)] + ["pokemons:page=1&limit=10"]
+    inicio = time.monotonic()
+    resumo = asyncio.run(aquecimento.aquecer(None, chaves, recarregar, por_segundo=100, concorrencia=2))
+
+    assert time.monotonic() - inicio >= 0.1
+    assert maximo <= 2
+    assert resumo["aquecidas"] == 10 and resumo["ignoradas"] == 1
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx
+from fastapi.testclient import TestClient
+import banco
+import main
+
+
+# Imita a AsyncSession: run_sync entrega a sessão síncrona à função
+class SessaoAsyncFake:
+    def __init__(self, sessao):
+        self.sessao = sessao
+        self.chamadas = 0
+
+    async def run_sync(self, funcao, *args):
+        self.chamadas += 1
+        return funcao(self.sessao, *args)
+
+
+def test_url_async():
+    assert banco.url_async("sqlite:///./data/pokemons.db") == "sqlite+aiosqlite:///./data/pokemons.db"
+    assert banco.url_async("postgresql://u:s@host/db") == "postgresql+asyncpg://u:s@host/db"
+    assert banco.url_async("postgresql+psycopg2://u:s@host/db") == "postgresql+asyncpg://u:s@host/db"
+    assert banco.url_async("postgresql+asyncpg://u:s@host/db") == "postgresql+asyncpg://u:s@host/db"
+
+
+def test_no_banco_com_sessao_sincrona(sessao):
+    with sessao() as db:
+        assert asyncio.run(banco.no_banco(db, lambda db, x: db.get_bind().name + x, "!")) == "sqlite!"
+
+
+def test_no_banco_em_thread(sessao):
+    with sessao() as db:
+        thread = asyncio.run(banco.no_banco(db, lambda db: threading.current_thread(), em_thread=True))
+
+    assert thread is not threading.main_thread()
+
+
+def test_no_banco_com_sessao_async(sessao):
+    with sessao() as db:
+        fake = SessaoAsyncFake(db)
+        assert asyncio.run(banco.no_banco(fake, lambda db: db is fake.sessao))
+        assert fake.chamadas == 1
+
+
+def test_sqlite_em_arquivo():
+    assert banco.sqlite_em_arquivo("sqlite:///./data/pokemons.db")
+    assert banco.sqlite_em_arquivo("sqlite+aiosqlite:///./data/pokemons.db")
+    assert not banco.sqlite_em_arquivo("sqlite:///:memory:")
+    assert not banco.sqlite_em_arquivo("sqlite://")
+    assert not banco.sqlite_em_arquivo("postgresql://u:s@host/db")
+
+
+def test_engines_sqlite_com_pragmas(tmp_path):
+    escrita, leitura = banco.criar_engines(f"sqlite:///{tmp_path}/teste.db")
+    assert escrita is not leitura
+    assert escrita.pool.size() == 1
+
+    with leitura.connect() as conn:
+        pragma = lambda nome: conn.exec_driver_sql(f"PRAGMA {nome}").scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1
+        assert pragma("busy_timeout") == banco.PRAGMAS_SQLITE["busy_timeout"]
+        assert pragma("cache_size") == banco.PRAGMAS_SQLITE["cache_size"]
+
+
+def test_engines_em_memoria_compartilham_o_banco():
+    escrita, leitura = banco.criar_engines("sqlite:///:memory:")
+    assert escrita is leitura
+
+
+# No WAL a leitura não espera uma transação de escrita em aberto
+def test_leitura_durante_escrita(tmp_path):
+    escrita, leitura = banco.criar_engines(f"sqlite:///{tmp_path}/teste.db")
+    with escrita.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+
+    with escrita.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+        with leitura.connect() as outra:
+            assert outra.exec_driver_sql("SELECT count(*) FROM t").scalar() == 1
+
+
+def test_no_banco_com_async_session_real(sessao_async):
+    async def rodar():
+        async with sessao_async() as db:
+            def inserir(db):
+                db.add(main.PokemonDB(name="async", weight=1, height=2))
+                db.commit()
+                return db.query(main.PokemonDB).filter_by(name="async").one().id
+
+            id = await banco.no_banco(db, inserir)
+            assert await banco.no_banco(db, lambda db: db.get(main.PokemonDB, id).height) == 2
+
+    asyncio.run(rodar())
+
+
+# Escrita e leitura em /data pelos endpoints com AsyncSession e redis.asyncio
+def test_endpoints_com_async_session(sessao_async, redis_fake_async):
+    client = TestClient(main.app)
+
+    criado = client.post("/pokemons", json={"name": "Assincrono", "weight": 7, "height": 3})
+    pagina = client.get("/data?limit=5")
+
+    assert criado.json() == {"message": "O Pokémon foi adicionado."}
+    assert [p["name"] for p in pagina.json()["pokemons"]] == ["Assincrono"]
+    assert pagina.json()["total"] == 1
+
+
+# Com uma única conexão de escrita, escritas concorrentes fazem fila no pool:
+# a espera não pode travar o event loop (o primeiro handler nunca terminaria
+# de devolver a conexão e os demais estourariam SQLITE_ESPERA_ESCRITA)
+def test_escritas_concorrentes_com_uma_conexao_de_escrita(sessao_wal, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", None)
+
+    async def enviar():
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+            pedidos = [cliente.post("/pokemons", json={"name": f"p{i}", "weight": i, "height": 1}) for i in range(10)]
+            pedidos += [cliente.put(f"/pokemons/{id}", json={"name": f"q{id}", "weight": 100 + id, "height": 2}) for id in (1, 2, 3)]
+            return await asyncio.gather(*pedidos[:10]), await asyncio.gather(*pedidos[10:])
+
+    criados, atualizados = asyncio.run(enviar())
+
+    assert [r.status_code for r in criados + atualizados] == [200] * 13
+    with sessao_wal() as db:
+        assert db.query(main.PokemonDB).count() == 10
+        assert [db.get(main.PokemonDB, id).name for id in (1, 2, 3)] == ["q1", "q2", "q3"]
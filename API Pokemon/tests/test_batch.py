@@ -0,0 +1,96 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+import cache
+import codec
+import upstream
+from main import app
+
+client = TestClient(app)
+
+
+def test_batch_busca_misses_e_grava_com_um_pipeline(pokeapi_stub, redis_fake):
+    resposta = client.get("/pokemons/batch?ids=7,1,4")
+
+    assert resposta.status_code == 200
+    assert [p["name"] for p in resposta.json()["data"]] == ["Pokemon-7", "Pokemon-1", "Pokemon-4"]
+    assert resposta.json()["falhas"] == []
+    assert sorted(pokeapi_stub.chamadas) == ["/pokemon/1", "/pokemon/4", "/pokemon/7"]
+    assert redis_fake.mgets == 1
+    assert redis_fake.pipelines == 1
+    assert codec.decodificar(redis_fake.get("pokemons:4")).valor["name"] == "Pokemon-4"
+
+
+def test_batch_usa_o_cache_e_busca_so_os_misses(pokeapi_stub, redis_fake):
+    redis_fake.setex("pokemons:2", 3600, codec.codificar({"id": 2, "name": "Em cache"}))
+
+    resposta = client.get("/pokemons/batch?ids=2,3")
+
+    assert [p["name"] for p in resposta.json()["data"]] == ["Em cache", "Pokemon-3"]
+    assert pokeapi_stub.chamadas == ["/pokemon/3"]
+    assert cache.stats.snapshot()["pokemons:id"]["l2_hits"] == 1
+
+
+def test_batch_compartilha_o_cache_com_pokemons_id(pokeapi_stub, redis_fake):
+    client.get("/pokemons/5")
+    resposta = client.get("/pokemons/batch?ids=5,5")
+
+    assert [p["name"] for p in resposta.json()["data"]] == ["Pokemon-5", "Pokemon-5"]
+    assert pokeapi_stub.chamadas == ["/pokemon/5"]
+
+
+def test_batch_falhas_ficam_null(pokeapi_stub, redis_fake):
+    pokeapi_stub.status_code = 500
+    redis_fake.setex("pokemons:8", 3600, codec.codificar({"id": 8, "name": "Em cache"}))
+
+    resposta = client.get("/pokemons/batch?ids=8,9,2000")
+
+    assert resposta.json()["data"] == [{"id": 8, "name": "Em cache"}, None, None]
+    assert resposta.json()["falhas"] == [9, 2000]
+    assert redis_fake.get("pokemons:9") is None
+
+
+# Um 404 guardado pelo cache negativo de /pokemons/{id} não conta como
+# encontrado no lote, nem no Redis nem no L1, e não vai de novo à PokeAPI
+def test_batch_404_em_cache_negativo_fica_em_falhas(pokeapi_stub, redis_fake):
+    pokeapi_stub.status_code = 404
+    assert client.get("/pokemons/9").json() == {"message": "Pokémon não encontrado na PokeAPI."}
+    pokeapi_stub.status_code = None
+    pokeapi_stub.chamadas.clear()
+
+    resposta = client.get("/pokemons/batch?ids=9,3")
+    cache.l1.limpar()
+    resposta_l2 = client.get("/pokemons/batch?ids=9")
+
+    assert [p and p["name"] for p in resposta.json()["data"]] == [None, "Pokemon-3"]
+    assert resposta.json()["falhas"] == [9]
+    assert resposta_l2.json() == {"data": [None], "falhas": [9]}
+    assert pokeapi_stub.chamadas == ["/pokemon/3"]
+    assert codec.decodificar(redis_fake.get("pokemons:9")).negativa
+
+
+def test_batch_ids_invalidos():
+    assert client.get("/pokemons/batch?ids=1,a").status_code == 400
+    assert client.get("/pokemons/batch?ids=").status_code == 400
+    assert client.get("/pokemons/batch?ids=" + ",".join(["1"] * 51)).status_code == 400
+
+
+def test_em_paralelo_respeita_o_limite():
+    em_andamento = maximo = 0
+
+    async def tarefa(item):
+        nonlocal em_andamento, maximo
+        em_andamento += 1
+        maximo = max(maximo, em_andamento)
+        await asyncio.sleep(0.01)
+        em_andamento -= 1
+        if item == 3:
+            raise ValueError(item)
+        return item * 10
+
+    resultados = asyncio.run(upstream.em_paralelo(tarefa, range(8), 3))
+
+    assert maximo == 3
+    assert resultados[:3] == [0, 10, 20] and isinstance(resultados[3], ValueError)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import sys
+import time
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+import banco
+import cache
+import main
+from main import app
+
+client = TestClient(app)
+
+
+def test_cache_hit_nao_chama_upstream(pokeapi_stub, redis_fake):
+    primeira = client.get("/pokemons/4")
+    segunda = client.get("/pokemons/4")
+
+    assert primeira.json() == segunda.json()
+    assert pokeapi_stub.chamadas == ["/pokemon/4"]
+    assert "pokemons:4" in redis_fake.dados
+    assert cache.stats.snapshot()["pokemons:id"]["hits"] == 1
+    assert cache.stats.snapshot()["pokemons:id"]["misses"] == 1
+
+
+def test_lista_cacheada_nao_chama_upstream(pokeapi_stub, redis_fake):
+    for _ in range(3):
+        response = client.get("/pokemons?limit=5&offset=0")
+        assert response.status_code == 200
+
+    assert len(pokeapi_stub.chamadas) == 1
+    assert cache.stats.snapshot()["pokemons"]["hit_ratio"] == round(2 / 3, 4)
+
+
+def test_parametros_invalidos_nao_chamam_upstream(pokeapi_stub, redis_fake):
+    response = client.get("/pokemons?limit=0")
+
+    assert response.status_code == 400
+    assert pokeapi_stub.chamadas == []
+
+
+def test_erro_do_upstream_nao_e_cacheado(pokeapi_stub, redis_fake):
+    pokeapi_stub.status_code = 500
+    client.get("/pokemons/9")
+    pokeapi_stub.status_code = None
+    response = client.get("/pokemons/9")
+
+    assert response.json()["name"] == "Pokemon-9"
+    # o 500 é repetido UPSTREAM_TENTATIVAS vezes
+    assert len(pokeapi_stub.chamadas) == main.pokeapi.tentativas + 1
+
+
+def test_cache_stats_endpoint(pokeapi_stub, redis_fake):
+    client.get("/pokemons/1")
+    response = client.get("/cache/stats")
+
+    assert response.status_code == 200
+    assert response.json()["pokemons:id"]["misses"] == 1
+
+
+def test_segundo_hit_vem_do_l1(pokeapi_stub, redis_fake):
+    client.get("/pokemons/6")
+    client.get("/pokemons/6")
+    redis_fake.dados.clear()
+    response = client.get("/pokemons/6")
+
+    assert response.json()["name"] == "Pokemon-6"
+    stats = cache.stats.snapshot()["pokemons:id"]
+    assert stats["l1_hits"] == 2
+    assert stats["l2_hits"] == 0
+    assert len(pokeapi_stub.chamadas) == 1
+
+
+def test_hit_no_redis_popula_l1(pokeapi_stub, redis_fake):
+    client.get("/pokemons/3")
+    cache.l1.limpar()
+    client.get("/pokemons/3")
+    client.get("/pokemons/3")
+
+    stats = cache.stats.snapshot()["pokemons:id"]
+    assert (stats["l1_hits"], stats["l2_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_lru_respeita_tamanho_e_ttl():
+    local = cache.CacheLocal(max_itens=2, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("b") is None
+    assert local.get("a") == 1 and local.get("c") == 3
+
+    local.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert local.get("d") is None
+
+
+def test_l1_segmentado_por_prefixo():
+    l1 = cache.CacheL1(max_itens=10, ttl=60)
+    l1.configurar("x:", max_itens=1, ttl=60)
+    l1.set("x:1", 1)
+    l1.set("x:2", 2)
+    l1.set("y:1", 1)
+    l1.set("y:2", 2)
+
+    assert l1.get("x:1") is None
+    assert l1.get("y:1") == 1
+    assert l1.tamanhos() == {"*": 2, "x:": 1}
+
+
+def test_escrita_invalida_paginas_e_publica(redis_fake):
+    asyncio.run(cache.gravar_cache(redis_fake, "pokemons:page=1:limit=10", cache.TTL(90, 90), {"page": 1}))
+    asyncio.run(cache.gravar_cache(redis_fake, "pokemons:5", cache.TTL(90, 90), {"id": 5}))
+
+    asyncio.run(cache.invalidar_prefixo(redis_fake, "pokemons:page="))
+
+    assert cache.l1.get("pokemons:page=1:limit=10") is None
+    assert redis_fake.get("pokemons:page=1:limit=10") is None
+    assert json.loads(cache.l1.get("pokemons:5").conteudo) == {"id": 5}
+    assert redis_fake.publicadas[0][0] == cache.CANAL_INVALIDACAO
+
+
+def test_l1_ignora_valor_calculado_antes_de_uma_invalidacao():
+    l1 = cache.CacheL1(max_itens=10, ttl=60)
+    versao = l1.versao("pokemons:page=1:limit=10")
+
+    l1.invalidar_prefixo("pokemons:page=")
+    l1.set("pokemons:page=1:limit=10", "antiga", versao=versao)
+    l1.set("pokemons:page=2:limit=10", "nova", versao=l1.versao("pokemons:page=2:limit=10"))
+
+    assert l1.get("pokemons:page=1:limit=10") is None
+    assert l1.get("pokemons:page=2:limit=10") == "nova"
+
+
+# Uma escrita (deste ou de outro worker) entre o início da consulta de /data e
+# a gravação no cache: a página carregada antes dela vai só para a resposta,
+# sem voltar ao L1 nem ao Redis
+def test_escrita_concorrente_nao_deixa_pagina_antiga_no_cache(sessao, redis_fake, monkeypatch):
+    with sessao() as db:
+        db.add(main.PokemonDB(name="mew", weight=40, height=4))
+        db.commit()
+    no_banco = banco.no_banco
+
+    async def consultar_e_escrever(db, funcao, *args, **kwargs):
+        resultado = await no_banco(db, funcao, *args, **kwargs)
+        await cache.invalidar_prefixo(redis_fake, "pokemons:page=")
+        return resultado
+
+    monkeypatch.setattr(banco, "no_banco", consultar_e_escrever)
+    response = client.get("/data")
+
+    assert [p["name"] for p in response.json()["pokemons"]] == ["mew"]
+    assert cache.l1.get("pokemons:page=1:limit=10") is None
+    assert not [chave for chave in redis_fake.dados if chave.startswith("pokemons:page=")]
+
+
+def test_mensagem_de_outro_worker_invalida_l1():
+    cache.l1.set("pokemons:page=2:limit=10", {"page": 2})
+    mensagem = {"data": json.dumps({"origem": "outro", "prefixo": "pokemons:page="})}
+
+    cache._receber_invalidacao(mensagem)
+
+    assert cache.l1.get("pokemons:page=2:limit=10") is None
+
+
+def test_cache_com_redis_async(pokeapi_stub, redis_fake_async):
+    primeira = client.get("/pokemons/4")
+    cache.l1.limpar()
+    segunda = client.get("/pokemons/4")
+
+    assert primeira.json() == segunda.json()
+    assert pokeapi_stub.chamadas == ["/pokemon/4"]
+    assert cache.stats.snapshot()["pokemons:id"]["l2_hits"] == 1
+
+
+def test_invalidacao_com_redis_async(redis_fake_async):
+    redis_fake_async.setex("pokemons:page=1:limit=10", 90, "{}")
+    redis_fake_async.setex("pokemons:5", 90, "{}")
+
+    asyncio.run(cache.invalidar_prefixo(main.redis_client, "pokemons:page="))
+
+    assert list(redis_fake_async.dados) == ["pokemons:5"]
+    assert redis_fake_async.publicadas[0][0] == cache.CANAL_INVALIDACAO
@@ -0,0 +1,82 @@
+import json
+import sys
+import os
+import time
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+import cache
+import codec
+from main import app
+
+client = TestClient(app)
+
+VALOR = {"id": 25, "name": "Pikachu", "types": ["electric"], "sprites": {"front_default": "x" * 2000}}
+
+
+@pytest.mark.parametrize("nome_codec", ["json", "msgpack"])
+@pytest.mark.parametrize("compressao", ["nenhuma", "zlib", "zstd"])
+def test_ida_e_volta(nome_codec, compressao):
+    if nome_codec == "msgpack" and codec.msgpack is None:
+        pytest.skip("msgpack não instalado")
+    if compressao == "zstd" and codec.zstd is None:
+        pytest.skip("zstd não instalado")
+
+    dados = codec.codificar(VALOR, criado_em=123.0, codec=nome_codec, compressao=compressao)
+
+    assert dados[0] == codec.MARCADOR
+    assert dados[2] == codec.CODECS[nome_codec]
+    assert codec.decodificar(dados) == (VALOR, 123.0, False)
+
+
+def test_comprime_so_acima_do_limite():
+    pequeno = codec.codificar({"id": 1}, compressao="zlib", comprimir_acima=1024)
+    grande = codec.codificar(VALOR, compressao="zlib", comprimir_acima=1024)
+
+    assert pequeno[3] == codec.COMPRESSOES["nenhuma"]
+    assert grande[3] == codec.COMPRESSOES["zlib"]
+    assert len(grande) < len(json.dumps(VALOR))
+
+
+def test_le_entrada_antiga_sem_cabecalho():
+    assert codec.decodificar(json.dumps(VALOR)) == (VALOR, None, False)
+    assert codec.decodificar(json.dumps(VALOR).encode()) == (VALOR, None, False)
+
+
+def test_marca_entrada_negativa():
+    dados = codec.codificar({"message": "não encontrado"}, criado_em=1.0, negativa=True)
+
+    assert dados[2] == codec.CODECS[codec.CODEC] | codec.NEGATIVA
+    assert codec.decodificar(dados) == ({"message": "não encontrado"}, 1.0, True)
+    assert codec.para_json(dados).negativa
+
+
+def test_versao_desconhecida_e_erro():
+    dados = bytearray(codec.codificar(VALOR))
+    dados[1] = 99
+
+    with pytest.raises(ValueError):
+        codec.decodificar(bytes(dados))
+
+
+def test_cache_le_envelope_antigo(pokeapi_stub, redis_fake):
+    redis_fake.setex("pokemons:30", 900, json.dumps({"criado_em": time.time(), "valor": {"id": 30, "name": "Antigo"}}))
+
+    assert client.get("/pokemons/30").json()["name"] == "Antigo"
+    assert pokeapi_stub.chamadas == []
+
+
+def test_troca_de_codec_sem_esvaziar_o_redis(pokeapi_stub, redis_fake, monkeypatch):
+    monkeypatch.setattr(codec, "CODEC", "json")
+    client.get("/pokemons/31")
+
+    monkeypatch.setattr(codec, "CODEC", "msgpack" if codec.msgpack else "json")
+    monkeypatch.setattr(codec, "COMPRESSAO", "zlib")
+    monkeypatch.setattr(codec, "COMPRIMIR_ACIMA", 0)
+    client.get("/pokemons/32")
+
+    cache.l1.limpar()
+    assert client.get("/pokemons/31").json()["name"] == "Pokemon-31"
+    assert client.get("/pokemons/32").json()["name"] == "Pokemon-32"
+    assert pokeapi_stub.chamadas == ["/pokemon/31", "/pokemon/32"]
+    assert redis_fake.get("pokemons:32")[3] == codec.COMPRESSOES["zlib"]
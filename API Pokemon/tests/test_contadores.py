@@ -0,0 +1,75 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+
+import contadores
+import main
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def banco(sessao, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", None)
+    with sessao() as db:
+        db.add_all(main.PokemonDB(name=f"p{i}", weight=i, height=i) for i in range(1, 6))
+        db.commit()
+    return sessao
+
+
+def contador_salvo(sessao):
+    main.contadores.aguardar()
+    with sessao() as db:
+        linha = db.execute(main.contadores.tabela.select()).first()
+        return linha and linha.total
+
+
+def test_total_vem_do_contador_mantido(banco):
+    assert client.get("/data").json()["total"] == 5
+
+    client.post("/pokemons", json={"name": "novo", "weight": 1, "height": 1})
+    assert contador_salvo(banco) == 6
+    assert client.get("/data").json()["total"] == 6
+
+    client.delete("/pokemons/1")
+    assert contador_salvo(banco) == 5
+    assert client.get("/data").json()["total"] == 5
+
+
+def test_contador_e_reconciliado_periodicamente(banco, monkeypatch):
+    client.get("/data")
+    main.contadores.aguardar()
+    with banco() as db:
+        db.add(main.PokemonDB(name="fora da api", weight=1, height=1))
+        db.commit()
+
+    assert client.get("/data?limit=3").json()["total"] == 5
+
+    monkeypatch.setattr(contadores, "RECONCILIAR_SEGUNDOS", 0)
+    assert client.get("/data?limit=4").json()["total"] == 6
+    assert contador_salvo(banco) == 6
+
+
+# A leitura só conta a tabela: o contador é gravado pela sessão de escrita,
+# fora da requisição
+def test_leitura_nao_grava_o_contador(banco, monkeypatch):
+    monkeypatch.setattr(main.contadores, "sessoes_escrita", None)
+
+    assert client.get("/data").json()["total"] == 5
+    assert contador_salvo(banco) is None
+
+    gravacoes = []
+    monkeypatch.setattr(main.contadores, "sessoes_escrita", lambda: gravacoes.append(1) or banco())
+    client.get("/data?limit=2")
+
+    assert contador_salvo(banco) == 5
+    assert gravacoes == [1]
+
+
+def test_cliente_pode_dispensar_o_total(banco):
+    resposta = client.get("/data?incluir_total=false")
+
+    assert resposta.json()["total"] is None
+    assert len(resposta.json()["pokemons"]) == 5
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+
+import exportacao
+import main
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def banco(sessao, monkeypatch):
+    monkeypatch.setattr(exportacao, "TAMANHO_BLOCO", 7)
+    with sessao() as db:
+        db.add_all(main.PokemonDB(name=f"p{i}", weight=i, height=i) for i in range(1, 31))
+        db.commit()
+
+
+def test_exportacao_ndjson(banco):
+    resposta = client.get("/data/exportar", headers={"Accept-Encoding": "identity"})
+    linhas = [json.loads(linha) for linha in resposta.text.splitlines()]
+
+    assert resposta.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in resposta.headers
+    assert [linha["id"] for linha in linhas] == list(range(1, 31))
+    assert linhas[0] == {"id": 1, "name": "p1", "weight": 1, "height": 1}
+
+
+def test_exportacao_csv(banco):
+    resposta = client.get("/data/exportar?formato=csv", headers={"Accept-Encoding": "identity"})
+    linhas = list(csv.reader(io.StringIO(resposta.text)))
+
+    assert linhas[0] == ["id", "name", "weight", "height"]
+    assert len(linhas) == 31
+    assert 'filename="pokemons.csv"' in resposta.headers["content-disposition"]
+
+
+def test_exportacao_gzip(banco):
+    resposta = client.get("/data/exportar", headers={"Accept-Encoding": "gzip"})
+
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert len(resposta.text.splitlines()) == 30
+
+
+def test_formato_invalido(banco):
+    assert client.get("/data/exportar?formato=xml").status_code == 400
+
+
+def test_aceita_gzip_respeita_q_zero():
+    class Req:
+        def __init__(self, valor):
+            self.headers = {"accept-encoding": valor}
+
+    assert exportacao.aceita_gzip(Req("br, gzip;q=0.8"))
+    assert not exportacao.aceita_gzip(Req("gzip;q=0"))
+    assert not exportacao.aceita_gzip(Req("identity"))
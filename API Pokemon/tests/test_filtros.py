@@ -0,0 +1,73 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+
+import filtros
+import main
+
+client = TestClient(main.app)
+
+POKEMONS = [("pikachu", 60, 4), ("pichu", 20, 3), ("raichu", 300, 8), ("pidgey", 18, 3), ("Flabébé", 1, 1)]
+
+
+@pytest.fixture
+def banco(sessao, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", None)
+    with sessao() as db:
+        db.add_all(main.PokemonDB(name=name, weight=weight, height=height) for name, weight, height in POKEMONS)
+        db.commit()
+    return sessao
+
+
+def nomes(resposta):
+    return [pokemon["name"] for pokemon in resposta.get("pokemons", [])]
+
+
+def test_filtro_por_prefixo(banco):
+    resposta = client.get("/data?name=pi").json()
+
+    assert nomes(resposta) == ["pikachu", "pichu", "pidgey"]
+    assert resposta["total"] == 3
+
+
+def test_busca_textual_por_palavra_e_prefixo(banco):
+    assert nomes(client.get("/data?q=chu").json()) == []
+    assert nomes(client.get("/data?q=raic").json()) == ["raichu"]
+    # sem acento e sem diferenciar maiúsculas
+    assert nomes(client.get("/data?q=flabebe").json()) == ["Flabébé"]
+
+
+def test_busca_acompanha_escritas(banco):
+    client.post("/pokemons", json={"name": "pikipek", "weight": 12, "height": 3})
+    client.request("DELETE", "/pokemons/lote", json=[1])
+
+    assert nomes(client.get("/data?q=pik").json()) == ["pikipek"]
+
+
+def test_ordenacao(banco):
+    assert nomes(client.get("/data?ordenar=-weight&limit=2").json()) == ["raichu", "pikachu"]
+    assert nomes(client.get("/data?name=pi&ordenar=height").json()) == ["pichu", "pidgey", "pikachu"]
+    assert client.get("/data?ordenar=senha").status_code == 400
+
+
+def test_cursor_so_com_ordenacao_padrao(banco):
+    cursor = client.get("/data?limit=2").json()["next_cursor"]
+
+    assert client.get(f"/data?cursor={cursor}&ordenar=-weight").status_code == 400
+    assert nomes(client.get(f"/data?cursor={cursor}&limit=2&name=pi").json()) == ["pidgey"]
+
+
+def test_filtros_entram_na_chave_do_cache(banco, redis_fake):
+    client.get("/data?name=pi")
+    client.get("/data?name=ra")
+
+    assert {chave for chave in redis_fake.dados if chave.startswith("pokemons:page=")} == {
+        "pokemons:page=1:limit=10:name=pi",
+        "pokemons:page=1:limit=10:name=ra",
+    }
+
+
+def test_chave_escapa_os_valores():
+    assert filtros.chave(":", name="a:b", ordenar=None) == ":name=a%3Ab"
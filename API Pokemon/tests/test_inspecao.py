@@ -0,0 +1,85 @@
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+import inspecao
+from main import app
+
+client = TestClient(app)
+
+
+def popular(redis_fake):
+    for i in range(25):
+        redis_fake.setex(f"pokemons:page={i}:limit=20", 90, json.dumps({"valor": i}))
+    for i in range(5):
+        redis_fake.setex(f"pokemons:{i}", 90, json.dumps({"valor": {"id": i}}))
+    redis_fake.set("outra:chave", "x")
+
+
+def test_prefixo_da_chave():
+    assert inspecao.prefixo_da_chave("pokemons:page=1:limit=20") == "pokemons:page="
+    assert inspecao.prefixo_da_chave("pokemons:offset=0&limit=20") == "pokemons:offset="
+    assert inspecao.prefixo_da_chave("pokemons:25") == "pokemons:"
+    assert inspecao.prefixo_da_chave("livros:v3:page=1&limit=10") == "livros:v3:page="
+
+
+def test_cache_paginado_por_cursor(redis_fake):
+    popular(redis_fake)
+    vistas, cursor, paginas = [], 0, 0
+    while True:
+        resposta = client.get(f"/cache?cursor={cursor}&count=10").json()
+        vistas += [item["chave"] for item in resposta["chaves"]]
+        cursor, paginas = resposta["cursor"], paginas + 1
+        if cursor == 0:
+            break
+
+    assert paginas == 3
+    assert len(vistas) == len(set(vistas)) == 30
+    assert "outra:chave" not in vistas
+    # GET, TTL e MEMORY USAGE de cada página num único pipeline
+    assert redis_fake.pipelines == 3
+
+
+def test_cache_item_traz_valor_ttl_e_memoria(redis_fake):
+    popular(redis_fake)
+    item = client.get("/cache?count=100").json()["chaves"][0]
+
+    assert item["chave"] == "pokemons:0"
+    assert item["valor"] == {"valor": {"id": 0}}
+    assert 0 < item["ttl"] <= 90
+    assert item["memoria"] > 0
+
+
+def test_cache_sem_valores(redis_fake):
+    popular(redis_fake)
+    item = client.get("/cache?valores=false").json()["chaves"][0]
+
+    assert "valor" not in item
+    assert item["ttl"] > 0
+
+
+def test_memoria_por_prefixo(redis_fake):
+    popular(redis_fake)
+    resposta = client.get("/cache/memoria").json()
+
+    assert resposta["chaves"] == 30
+    assert not resposta["amostrado"]
+    assert resposta["memoria_por_prefixo"]["pokemons:page="]["chaves"] == 25
+    assert resposta["memoria_por_prefixo"]["pokemons:"]["chaves"] == 5
+    assert resposta["memoria_por_prefixo"]["pokemons:"]["bytes"] > 0
+
+
+def test_memoria_por_prefixo_respeita_limite(redis_fake):
+    popular(redis_fake)
+    resposta = client.get("/cache/memoria?limite=10").json()
+
+    assert resposta["chaves"] == 10
+    assert resposta["amostrado"]
+
+
+def test_cache_sem_redis(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "redis_sync", None)
+
+    assert client.get("/cache").json() == {"message": "Redis não disponível"}
@@ -0,0 +1,62 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+
+import main
+import keyset
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def banco(sessao, monkeypatch):
+    with sessao() as db:
+        db.add_all(main.PokemonDB(name=f"p{i}", weight=i, height=i) for i in range(1, 26))
+        db.commit()
+    monkeypatch.setattr(main, "redis_client", None)
+
+
+def ids(resposta):
+    return [p["id"] for p in resposta.json()["pokemons"]]
+
+
+def test_cursor_percorre_todas_as_paginas(banco):
+    resposta = client.get("/data?limit=10")
+    vistos = ids(resposta)
+    while resposta.json()["next_cursor"]:
+        resposta = client.get(f"/data?limit=10&cursor={resposta.json()['next_cursor']}")
+        vistos += ids(resposta)
+
+    assert vistos == list(range(1, 26))
+
+
+def test_cursor_anterior_volta_uma_pagina(banco):
+    segunda = client.get("/data?page=2&limit=10")
+    terceira = client.get(f"/data?limit=10&cursor={segunda.json()['next_cursor']}")
+    volta = client.get(f"/data?limit=10&cursor={terceira.json()['prev_cursor']}")
+
+    assert ids(terceira) == list(range(21, 26))
+    assert ids(volta) == list(range(11, 21))
+    assert volta.json()["prev_cursor"] is not None
+
+
+def test_primeira_pagina_nao_tem_cursor_anterior(banco):
+    resposta = client.get("/data?limit=10")
+
+    assert resposta.json()["prev_cursor"] is None
+    assert resposta.json()["page"] == 1
+
+
+def test_cursor_invalido(banco):
+    resposta = client.get("/data?cursor=nao-e-um-cursor")
+
+    assert resposta.status_code == 400
+
+
+def test_cursor_e_opaco_e_reversivel():
+    cursor = keyset.codificar_cursor(42, "n")
+
+    assert "42" not in cursor
+    assert keyset.decodificar_cursor(cursor) == (42, "n")
@@ -0,0 +1,108 @@
+import json
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+
+import lote
+import main
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def banco(sessao, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", None)
+    with sessao() as db:
+        db.add(main.PokemonDB(name="bulbasaur", weight=69, height=7))
+        db.commit()
+    return sessao
+
+
+def nomes(sessao):
+    with sessao() as db:
+        return sorted(p.name for p in db.query(main.PokemonDB))
+
+
+def test_criacao_em_lote_com_resultados_por_item(banco):
+    itens = [
+        {"name": "ivysaur", "weight": 130, "height": 10},
+        {"name": "bulbasaur", "weight": 69, "height": 7},
+        {"name": "ivysaur", "weight": 130, "height": 10},
+        {"name": "venusaur", "weight": "pesado", "height": 20},
+        {"name": "charmander", "weight": 85, "height": 6},
+    ]
+
+    resposta = client.post("/pokemons/lote", json=itens).json()
+
+    assert [r["status"] for r in resposta["resultados"]] == ["criado", "duplicado", "duplicado_no_lote", "invalido", "criado"]
+    assert resposta["resumo"] == {"criado": 2, "duplicado": 1, "duplicado_no_lote": 1, "invalido": 1}
+    assert nomes(banco) == ["bulbasaur", "charmander", "ivysaur"]
+    assert client.get("/data").json()["total"] == 3
+
+
+def test_criacao_em_lote_ndjson(banco):
+    corpo = "\n".join(json.dumps({"name": f"p{i}", "weight": i, "height": i}) for i in range(50)) + "\n{quebrado\n"
+
+    resposta = client.post("/pokemons/lote", content=corpo, headers={"Content-Type": "application/x-ndjson"}).json()
+
+    assert resposta["resumo"] == {"criado": 50, "invalido": 1}
+    assert resposta["resultados"][-1]["indice"] == 50
+
+
+def test_upsert_atualiza_existentes(banco):
+    itens = [{"name": "bulbasaur", "weight": 69, "height": 99}]
+
+    resposta = client.post("/pokemons/lote?atualizar_existentes=true", json=itens).json()
+
+    assert resposta["resultados"][0]["status"] == "atualizado"
+    with banco() as db:
+        assert db.query(main.PokemonDB).filter_by(name="bulbasaur").one().height == 99
+
+
+def test_atualizacao_e_remocao_em_lote(banco):
+    criados = client.post("/pokemons/lote", json=[{"name": "a", "weight": 1, "height": 1}, {"name": "b", "weight": 2, "height": 2}]).json()
+    ids = [r["id"] for r in criados["resultados"]]
+
+    atualizacao = client.put("/pokemons/lote", json=[{"id": ids[0], "name": "a2", "weight": 1, "height": 1}, {"id": 999, "name": "x", "weight": 1, "height": 1}]).json()
+    remocao = client.request("DELETE", "/pokemons/lote", json=[ids[1], 999]).json()
+
+    assert atualizacao["resumo"] == {"atualizado": 1, "nao_encontrado": 1}
+    assert remocao["resumo"] == {"removido": 1, "nao_encontrado": 1}
+    assert nomes(banco) == ["a2", "bulbasaur"]
+    assert client.get("/data").json()["total"] == 2
+
+
+def test_atualizacao_que_colide_com_outro_registro(banco):
+    with banco() as db:
+        db.add(main.PokemonDB(name="ivysaur", weight=130, height=10))
+        db.commit()
+        id = db.query(main.PokemonDB.id).filter_by(name="ivysaur").scalar()
+
+    unitaria = client.put(f"/pokemons/{id}", json={"name": "bulbasaur", "weight": 69, "height": 1})
+    em_lote = client.put("/pokemons/lote", json=[
+        {"id": id, "name": "bulbasaur", "weight": 69, "height": 1},
+        {"id": 1, "name": "bulbasaur", "weight": 69, "height": 8},
+    ]).json()
+
+    assert unitaria.status_code == 400
+    assert unitaria.json()["detail"] == "Esse pokémon já existe no banco de dados."
+    # só o item que colide fica de fora; o resto do lote é gravado
+    assert [r["status"] for r in em_lote["resultados"]] == ["duplicado", "atualizado"]
+    with banco() as db:
+        assert sorted((p.name, p.weight, p.height) for p in db.query(main.PokemonDB)) == [("bulbasaur", 69, 8), ("ivysaur", 130, 10)]
+
+
+def test_lote_acima_do_limite(banco, monkeypatch):
+    monkeypatch.setattr(lote, "LOTE_MAX_ITENS", 2)
+
+    resposta = client.post("/pokemons/lote", json=[{"name": "a", "weight": 1, "height": 1}] * 3)
+
+    assert resposta.status_code == 413
+
+
+def test_corpo_que_nao_e_array(banco):
+    resposta = client.post("/pokemons/lote", json={"name": "a", "weight": 1, "height": 1})
+
+    assert resposta.status_code == 400
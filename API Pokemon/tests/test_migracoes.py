@@ -0,0 +1,100 @@
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+import migracoes
+import main
+
+client = TestClient(main.app)
+
+# Schema anterior às migrações: índices de coluna única e sem unicidade em (name, weight)
+SCHEMA_ANTIGO = [
+    "CREATE TABLE pokemons (id INTEGER PRIMARY KEY, name VARCHAR, weight INTEGER, height INTEGER)",
+    "CREATE INDEX ix_pokemons_id ON pokemons (id)",
+    "CREATE INDEX ix_pokemons_name ON pokemons (name)",
+    "CREATE INDEX ix_pokemons_weight ON pokemons (weight)",
+    "CREATE INDEX ix_pokemons_height ON pokemons (height)",
+    "INSERT INTO pokemons (name, weight, height) VALUES ('pikachu', 60, 4), ('mew', 40, 4), (NULL, 10, 1), (NULL, 10, 2)",
+]
+REPETIDOS = "INSERT INTO pokemons (name, weight, height) VALUES ('pikachu', 60, 5), ('pikachu', 60, 6)"
+
+
+def banco_antigo(*extras):
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+    with engine.begin() as conn:
+        for comando in SCHEMA_ANTIGO + list(extras):
+            conn.execute(text(comando))
+    main.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def alturas(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT id, height FROM pokemons ORDER BY id")).all()
+
+
+def test_migracao_troca_indices():
+    engine = banco_antigo()
+
+    assert migracoes.aplicar(engine, main.MIGRACOES) == len(main.MIGRACOES)
+
+    assert migracoes.indices(engine.connect(), "pokemons") == {"ux_pokemons_name_weight"}
+    # NULL no nome não colide no índice único e a linha fica
+    assert alturas(engine) == [(1, 4), (2, 4), (3, 1), (4, 2)]
+    with engine.connect() as conn:
+        assert migracoes.versao_atual(conn) == len(main.MIGRACOES)
+
+
+def test_migracao_para_com_linhas_repetidas_sem_apagar_nada():
+    engine = banco_antigo(REPETIDOS)
+
+    with pytest.raises(migracoes.ChavesRepetidas, match=r"\('pikachu', 60\) x3"):
+        migracoes.aplicar(engine, main.MIGRACOES)
+
+    assert len(alturas(engine)) == 6
+    with engine.connect() as conn:
+        assert migracoes.versao_atual(conn) == 0
+        assert "ux_pokemons_name_weight" not in migracoes.indices(conn, "pokemons")
+
+
+def test_migracao_remove_repetidas_quando_autorizada(monkeypatch, caplog):
+    monkeypatch.setattr(migracoes, "REMOVER_DUPLICADOS", True)
+    engine = banco_antigo(REPETIDOS)
+
+    with caplog.at_level(logging.WARNING):
+        assert migracoes.aplicar(engine, main.MIGRACOES) == len(main.MIGRACOES)
+
+    assert alturas(engine) == [(1, 4), (2, 4), (3, 1), (4, 2)]
+    assert "2 linhas repetidas removidas de pokemons (ids [5, 6])" in caplog.text
+
+
+def test_migracao_e_aplicada_uma_vez():
+    engine = banco_antigo()
+    chamadas = []
+
+    for _ in range(2):
+        migracoes.aplicar(engine, main.MIGRACOES + [lambda conn: chamadas.append(conn)])
+
+    assert len(chamadas) == 1
+
+
+def test_banco_novo_ja_tem_o_schema_final():
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+    main.Base.metadata.create_all(bind=engine)
+
+    migracoes.aplicar(engine, main.MIGRACOES)
+
+    assert {indice["name"] for indice in inspect(engine).get_indexes("pokemons")} == {"ux_pokemons_name_weight"}
+
+
+def test_post_duplicado_e_recusado_pelo_indice_unico(sessao, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", None)
+
+    assert client.post("/pokemons", json={"name": "mew", "weight": 40, "height": 4}).status_code == 200
+    assert client.post("/pokemons", json={"name": "mew", "weight": 40, "height": 9}).status_code == 400
+    assert client.get("/data").json()["total"] == 1
@@ -0,0 +1,94 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+
+import main
+import pokedex
+from upstream import PokeAPIClient
+
+client = TestClient(main.app)
+
+
+def rodar_ingestao(cliente, ids, sessao, lote=10):
+    async def rodar():
+        try:
+            return await pokedex.ingerir(cliente, ids, sessao=sessao, lote=lote)
+        finally:
+            await cliente.close()
+
+    return asyncio.run(rodar())
+
+
+def test_ingestao_concorrente(pokeapi_stub, sessao):
+    resumo = rodar_ingestao(PokeAPIClient(base_url=pokeapi_stub.url, concurrency=5), range(1, 31), sessao)
+
+    assert resumo == {"ingeridos": 30, "ja_existentes": 0, "falhas": []}
+    with sessao() as db:
+        registro = db.get(main.PokedexDB, 25)
+        assert registro.name == "pokemon-25"
+        assert registro.types == ["normal"]
+        assert registro.sprites["front_default"] == "front/25.png"
+
+
+def test_ingestao_e_retomavel(pokeapi_stub, sessao):
+    rodar_ingestao(PokeAPIClient(base_url=pokeapi_stub.url), range(1, 11), sessao)
+    pokeapi_stub.chamadas.clear()
+
+    resumo = rodar_ingestao(PokeAPIClient(base_url=pokeapi_stub.url), range(1, 16), sessao)
+
+    assert resumo["ja_existentes"] == 10
+    assert resumo["ingeridos"] == 5
+    assert sorted(pokeapi_stub.chamadas) == sorted(f"/pokemon/{i}" for i in range(11, 16))
+
+
+def test_ingestao_offline_com_fixtures_gravadas(pokeapi_stub, sessao, tmp_path):
+    gravador = pokedex.GravadorClient(PokeAPIClient(base_url=pokeapi_stub.url), tmp_path)
+    rodar_ingestao(gravador, range(1, 6), sessao)
+    with sessao() as db:
+        db.query(main.PokedexDB).delete()
+        db.commit()
+    pokeapi_stub.chamadas.clear()
+
+    resumo = rodar_ingestao(pokedex.FixtureClient(tmp_path), range(1, 7), sessao)
+
+    assert resumo["ingeridos"] == 5
+    assert resumo["falhas"] == [6]
+    assert pokeapi_stub.chamadas == []
+
+
+def test_modo_espelho_nao_chama_upstream(pokeapi_stub, sessao, monkeypatch):
+    rodar_ingestao(PokeAPIClient(base_url=pokeapi_stub.url), range(1, 21), sessao)
+    pokeapi_stub.chamadas.clear()
+    monkeypatch.setattr(main, "POKEDEX_LOCAL", True)
+
+    detalhe = client.get("/pokemons/7")
+    lista = client.get("/pokemons?limit=5&offset=5")
+
+    assert detalhe.json()["name"] == "Pokemon-7"
+    assert detalhe.json()["types"] == ["normal"]
+    assert [p["name"] for p in lista.json()["data"]] == [f"pokemon-{i}" for i in range(6, 11)]
+    assert pokeapi_stub.chamadas == []
+
+
+def test_modo_espelho_recorre_ao_upstream_se_faltar(pokeapi_stub, sessao, monkeypatch):
+    monkeypatch.setattr(main, "POKEDEX_LOCAL", True)
+
+    response = client.get("/pokemons/300")
+
+    assert response.json()["name"] == "Pokemon-300"
+    assert pokeapi_stub.chamadas == ["/pokemon/300"]
+
+
+def test_modo_espelho_com_buraco_recorre_ao_upstream(pokeapi_stub, sessao, monkeypatch):
+    rodar_ingestao(PokeAPIClient(base_url=pokeapi_stub.url), [1, 2, 4, 5, 6, 7, 8], sessao)
+    pokeapi_stub.chamadas.clear()
+    monkeypatch.setattr(main, "POKEDEX_LOCAL", True)
+
+    com_buraco = client.get("/pokemons?offset=2&limit=2")
+    completa = client.get("/pokemons?offset=3&limit=5")
+
+    assert [p["name"] for p in com_buraco.json()["data"]] == ["pokemon-3", "pokemon-4"]
+    assert [p["name"] for p in completa.json()["data"]] == [f"pokemon-{i}" for i in range(4, 9)]
+    assert pokeapi_stub.chamadas == ["/pokemon?limit=2&offset=2"]
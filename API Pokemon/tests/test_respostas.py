@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+import cache
+import codec
+import respostas
+from main import app
+
+client = TestClient(app)
+
+
+def test_resposta_tem_etag_e_corpo_json(pokeapi_stub, redis_fake):
+    response = client.get("/pokemons/25")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["etag"] == respostas.etag(response.content)
+    assert response.json()["id"] == 25
+
+
+def test_if_none_match_retorna_304(pokeapi_stub, redis_fake):
+    etag = client.get("/pokemons/25").headers["etag"]
+
+    response = client.get("/pokemons/25", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_if_none_match_diferente_retorna_200(pokeapi_stub, redis_fake):
+    response = client.get("/pokemons/25", headers={"If-None-Match": '"outra"'})
+
+    assert response.status_code == 200
+
+
+def test_hit_no_redis_serve_os_bytes_gravados(redis_fake):
+    conteudo = codec.json_bytes({"id": 7, "name": "squirtle"})
+    redis_fake.setex("pokemons:7", 60, codec.codificar(None, serializado=conteudo, codec="json", compressao="nenhuma"))
+
+    response = client.get("/pokemons/7")
+
+    assert response.content == conteudo
+    assert cache.l1.get("pokemons:7").conteudo == conteudo
+
+
+def test_etag_confere_lista_fraca_e_curinga():
+    etag = respostas.etag(b"{}")
+
+    def confere(cabecalho):
+        request = type("Request", (), {"headers": {"if-none-match": cabecalho}})()
+        return respostas.etag_confere(request, etag)
+
+    assert confere(f'"a", W/{etag}')
+    assert confere("*")
+    assert not confere('"a", "b"')
+    assert not confere("")
+
+
+def test_gzip_acima_do_limite(pokeapi_stub, redis_fake, monkeypatch):
+    monkeypatch.setattr(respostas, "COMPRIMIR_ACIMA", 10)
+
+    response = client.get("/pokemons/25", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].endswith('-gzip"')
+    assert response.json()["id"] == 25
+    # a ETag da versão comprimida também vale no If-None-Match
+    assert client.get("/pokemons/25", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_sem_compressao_abaixo_do_limite_ou_com_q_zero(pokeapi_stub, redis_fake, monkeypatch):
+    monkeypatch.setattr(respostas, "COMPRIMIR_ACIMA", 10**6)
+    assert "content-encoding" not in client.get("/pokemons/25", headers={"Accept-Encoding": "gzip"}).headers
+
+    monkeypatch.setattr(respostas, "COMPRIMIR_ACIMA", 10)
+    assert "content-encoding" not in client.get("/pokemons/25", headers={"Accept-Encoding": "gzip;q=0, identity"}).headers
+
+
+def test_versao_comprimida_e_reaproveitada():
+    corpo = respostas.corpo(b"[" + b"1," * 1000 + b"1]")
+
+    assert corpo.comprimido("gzip") is corpo.comprimido("gzip")
+
+
+def test_last_modified_e_if_modified_since(pokeapi_stub, redis_fake):
+    response = client.get("/pokemons/25")
+    ultima = response.headers["last-modified"]
+
+    assert client.get("/pokemons/25", headers={"If-Modified-Since": ultima}).status_code == 304
+    assert client.get("/pokemons/25", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
+    # If-None-Match tem precedência sobre If-Modified-Since
+    assert client.get("/pokemons/25", headers={"If-Modified-Since": ultima, "If-None-Match": '"outra"'}).status_code == 200
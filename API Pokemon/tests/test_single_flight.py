@@ -0,0 +1,63 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx
+import cache
+from main import app
+
+
+def requisicoes_concorrentes(caminhos):
+    async def rodar():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get(caminho) for caminho in caminhos))
+
+    return asyncio.run(rodar())
+
+
+def test_misses_concorrentes_compartilham_uma_busca(pokeapi_stub, redis_fake):
+    pokeapi_stub.delay = 0.2
+
+    respostas = requisicoes_concorrentes(["/pokemons/25"] * 20)
+
+    assert all(r.json()["name"] == "Pokemon-25" for r in respostas)
+    assert pokeapi_stub.chamadas == ["/pokemon/25"]
+
+
+def test_chaves_diferentes_nao_sao_agrupadas(pokeapi_stub, redis_fake):
+    pokeapi_stub.delay = 0.1
+
+    requisicoes_concorrentes(["/pokemons/1", "/pokemons/2", "/pokemons/1"])
+
+    assert sorted(pokeapi_stub.chamadas) == ["/pokemon/1", "/pokemon/2"]
+
+
+def test_lock_distribuido_aguarda_outro_worker(pokeapi_stub, redis_fake, monkeypatch):
+    monkeypatch.setattr(cache, "LOCK_DISTRIBUIDO", True)
+    redis_fake.set("lock:pokemons:7", "outro-worker", ex=10)
+
+    async def outro_worker_grava():
+        await asyncio.sleep(0.1)
+        redis_fake.setex("pokemons:7", 90, cache._envelope({"id": 7, "name": "De outro worker"}))
+
+    async def rodar():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resposta, _ = await asyncio.gather(client.get("/pokemons/7"), outro_worker_grava())
+            return resposta
+
+    resposta = asyncio.run(rodar())
+
+    assert resposta.json()["name"] == "De outro worker"
+    assert pokeapi_stub.chamadas == []
+
+
+def test_lock_distribuido_e_liberado_apos_busca(pokeapi_stub, redis_fake, monkeypatch):
+    monkeypatch.setattr(cache, "LOCK_DISTRIBUIDO", True)
+
+    requisicoes_concorrentes(["/pokemons/8"] * 5)
+
+    assert pokeapi_stub.chamadas == ["/pokemon/8"]
+    assert redis_fake.get("lock:pokemons:8") is None
+    assert redis_fake.get("pokemons:8") is not None
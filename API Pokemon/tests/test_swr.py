@@ -0,0 +1,67 @@
+import asyncio
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx
+import cache
+import codec
+from main import app
+
+
+def gravar_entrada(redis_fake, chave, valor, idade):
+    redis_fake.setex(chave, 3600, codec.codificar(valor, criado_em=time.time() - idade))
+
+
+def requisitar_e_aguardar(caminho):
+    async def rodar():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resposta = await client.get(caminho)
+            await asyncio.gather(*cache.revalidacoes)
+            return resposta
+
+    return asyncio.run(rodar())
+
+
+def test_valor_stale_e_servido_e_revalidado(pokeapi_stub, redis_fake):
+    gravar_entrada(redis_fake, "pokemons:10", {"id": 10, "name": "Velho"}, idade=200)
+
+    resposta = requisitar_e_aguardar("/pokemons/10")
+
+    assert resposta.json()["name"] == "Velho"
+    assert pokeapi_stub.chamadas == ["/pokemon/10"]
+    assert codec.decodificar(redis_fake.get("pokemons:10")).valor["name"] == "Pokemon-10"
+    assert cache.stats.snapshot()["pokemons:id"]["stale"] == 1
+
+
+def test_valor_fresco_nao_revalida(pokeapi_stub, redis_fake):
+    gravar_entrada(redis_fake, "pokemons:11", {"id": 11, "name": "Recente"}, idade=5)
+
+    resposta = requisitar_e_aguardar("/pokemons/11")
+
+    assert resposta.json()["name"] == "Recente"
+    assert pokeapi_stub.chamadas == []
+
+
+def test_revalidacao_com_erro_mantem_valor_antigo(pokeapi_stub, redis_fake):
+    pokeapi_stub.status_code = 500
+    gravar_entrada(redis_fake, "pokemons:12", {"id": 12, "name": "Velho"}, idade=200)
+
+    resposta = requisitar_e_aguardar("/pokemons/12")
+
+    assert resposta.json()["name"] == "Velho"
+    assert codec.decodificar(redis_fake.get("pokemons:12")).valor["name"] == "Velho"
+
+
+def test_apos_hard_ttl_espera_upstream(pokeapi_stub, redis_fake):
+    resposta = requisitar_e_aguardar("/pokemons/13")
+
+    assert resposta.json()["name"] == "Pokemon-13"
+    assert redis_fake.ttl("pokemons:13") > 90
+
+
+def test_ttl_configurado_por_ambiente(monkeypatch):
+    monkeypatch.setenv("CACHE_TTL_TESTE_SOFT", "5")
+
+    assert cache.ttl_configurado("teste", soft=30, hard=60) == cache.TTL(soft=5, hard=60)
@@ -0,0 +1,173 @@
+import asyncio
+import time
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+from upstream import Disjuntor, PokeAPIClient, UpstreamError
+
+client = TestClient(app)
+
+
+def test_get_pokemons_id_usa_stub(pokeapi_stub):
+    response = client.get("/pokemons/25")
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "Pokemon-25"
+    assert response.json()["types"] == ["normal"]
+    assert pokeapi_stub.chamadas == ["/pokemon/25"]
+
+
+def test_get_pokemons_usa_stub(pokeapi_stub):
+    response = client.get("/pokemons?limit=5&offset=10")
+
+    assert response.status_code == 200
+    assert [p["name"] for p in response.json()["data"]] == [f"pokemon-{i}" for i in range(11, 16)]
+
+
+def test_requisicoes_concorrentes_nao_bloqueiam(pokeapi_stub):
+    pokeapi_stub.delay = 0.2
+    pokeapi = PokeAPIClient(base_url=pokeapi_stub.url, concurrency=50)
+
+    async def rodar():
+        inicio = time.perf_counter()
+        respostas = await asyncio.gather(*(pokeapi.get(f"/pokemon/{i}") for i in range(1, 41)))
+        await pokeapi.close()
+        return time.perf_counter() - inicio, respostas
+
+    duracao, respostas = asyncio.run(rodar())
+
+    assert all(r.status_code == 200 for r in respostas)
+    assert duracao < 40 * 0.2 / 4
+
+
+def test_limite_de_concorrencia(pokeapi_stub):
+    pokeapi_stub.delay = 0.05
+    pokeapi = PokeAPIClient(base_url=pokeapi_stub.url, concurrency=3)
+
+    async def rodar():
+        await asyncio.gather(*(pokeapi.get(f"/pokemon/{i}") for i in range(1, 16)))
+        await pokeapi.close()
+
+    asyncio.run(rodar())
+
+    assert len(pokeapi_stub.chamadas) == 15
+    assert pokeapi_stub.max_em_andamento <= 3
+
+
+def test_timeout_vira_upstream_error(pokeapi_stub):
+    pokeapi_stub.delay = 0.5
+    pokeapi = PokeAPIClient(base_url=pokeapi_stub.url, timeout=0.1)
+
+    async def rodar():
+        try:
+            await pokeapi.get("/pokemon/1")
+        finally:
+            await pokeapi.close()
+
+    with pytest.raises(UpstreamError) as erro:
+        asyncio.run(rodar())
+    assert erro.value.status_code == 504
+
+
+def test_endpoint_timeout_retorna_504(pokeapi_stub, monkeypatch):
+    import main
+    pokeapi_stub.delay = 0.5
+    monkeypatch.setattr(main, "pokeapi", PokeAPIClient(base_url=pokeapi_stub.url, timeout=0.1))
+
+    response = client.get("/pokemons/7")
+
+    assert response.status_code == 504
+
+
+def rodar_e_fechar(pokeapi, corrotina):
+    async def rodar():
+        try:
+            return await corrotina
+        finally:
+            await pokeapi.close()
+
+    return asyncio.run(rodar())
+
+
+def test_5xx_e_repetido_e_o_sucesso_e_devolvido(pokeapi_stub):
+    pokeapi = PokeAPIClient(base_url=pokeapi_stub.url, tentativas=3, backoff_base=0.001)
+    original = pokeapi_stub.responder
+    pokeapi_stub.responder = lambda path, query: (503, {}) if len(pokeapi_stub.chamadas) < 3 else original(path, query)
+
+    resposta = rodar_e_fechar(pokeapi, pokeapi.get("/pokemon/1"))
+
+    assert resposta.status_code == 200
+    assert len(pokeapi_stub.chamadas) == 3
+    assert pokeapi.disjuntor.snapshot()["novas_tentativas"] == 2
+
+
+def test_404_nao_e_repetido(pokeapi_stub):
+    pokeapi = PokeAPIClient(base_url=pokeapi_stub.url, tentativas=3)
+
+    resposta = rodar_e_fechar(pokeapi, pokeapi.get("/pokemon/9999"))
+
+    assert resposta.status_code == 404
+    assert len(pokeapi_stub.chamadas) == 1
+    assert pokeapi.disjuntor.estado == "fechado"
+
+
+def test_disjuntor_abre_e_falha_rapido(pokeapi_stub):
+    pokeapi_stub.status_code = 500
+    pokeapi = PokeAPIClient(base_url=pokeapi_stub.url, tentativas=1, disjuntor=Disjuntor(falhas=3, espera=60))
+
+    async def rodar():
+        for _ in range(3):
+            await pokeapi.get("/pokemon/1")
+        inicio = time.perf_counter()
+        with pytest.raises(UpstreamError) as erro:
+            await pokeapi.get("/pokemon/1")
+        return erro.value, time.perf_counter() - inicio
+
+    erro, duracao = rodar_e_fechar(pokeapi, rodar())
+
+    assert erro.status_code == 503 and duracao < 0.05
+    assert len(pokeapi_stub.chamadas) == 3
+    assert pokeapi.disjuntor.snapshot()["estado"] == "aberto"
+    assert pokeapi.disjuntor.snapshot()["rejeitadas"] == 1
+
+
+def test_disjuntor_meio_aberto_fecha_com_sucesso(pokeapi_stub):
+    disjuntor = Disjuntor(falhas=1, espera=0.05)
+    pokeapi = PokeAPIClient(base_url=pokeapi_stub.url, tentativas=1, disjuntor=disjuntor)
+
+    async def rodar():
+        pokeapi_stub.status_code = 500
+        await pokeapi.get("/pokemon/1")
+        assert disjuntor.estado == "aberto"
+        await asyncio.sleep(0.06)
+        pokeapi_stub.status_code = None
+        return await pokeapi.get("/pokemon/1")
+
+    assert rodar_e_fechar(pokeapi, rodar()).status_code == 200
+    assert disjuntor.estado == "fechado"
+    assert disjuntor.snapshot()["aberturas"] == 1
+
+
+def test_404_e_cacheado_por_pouco_tempo(pokeapi_stub, redis_fake, monkeypatch):
+    import main
+    original = pokeapi_stub.responder
+    pokeapi_stub.responder = lambda path, query: (404, {}) if path == "/pokemon/20" else original(path, query)
+
+    client.get("/pokemons/20")
+    response = client.get("/pokemons/20")
+
+    assert response.json() == {"message": "Pokémon não encontrado na PokeAPI."}
+    assert pokeapi_stub.chamadas == ["/pokemon/20"]
+    assert 0 < redis_fake.ttl("pokemons:20") <= main.TTL_NEGATIVO.hard
+
+
+def test_upstream_stats(pokeapi_stub):
+    client.get("/pokemons/21")
+    response = client.get("/upstream/stats")
+
+    assert response.status_code == 200
+    assert response.json()["estado"] == "fechado"
+    assert response.json()["sucessos"] == 1
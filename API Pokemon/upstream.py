@@ -0,0 +1,226 @@
+# Cliente assíncrono compartilhado para as chamadas à PokeAPI
+#
+# Falhas transitórias (timeout, erro de conexão, 429 e 5xx) são repetidas até
+# UPSTREAM_TENTATIVAS vezes, com backoff exponencial e jitter ("full jitter":
+# espera aleatória entre 0 e o teto da tentativa), para os workers não
+# repetirem em sincronia. Um disjuntor (circuit breaker) conta as falhas
+# seguidas: passando de UPSTREAM_DISJUNTOR_FALHAS, ele abre e as chamadas
+# falham na hora (503) por UPSTREAM_DISJUNTOR_ESPERA segundos, em vez de
+# acumular requisições esperando um upstream fora do ar. Depois disso uma
+# chamada de teste passa (meio aberto): sucesso fecha o disjuntor, falha o
+# reabre.
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter
+
+import httpx
+
+POKEAPI_URL = os.getenv("POKEAPI_URL") or "https://pokeapi.co/api/v2"
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", 5))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 2))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", 100))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", 20))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", 30))
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", 50))
+UPSTREAM_TENTATIVAS = int(os.getenv("UPSTREAM_TENTATIVAS", 3))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", 0.1))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", 2))
+UPSTREAM_DISJUNTOR_FALHAS = int(os.getenv("UPSTREAM_DISJUNTOR_FALHAS", 5))
+UPSTREAM_DISJUNTOR_ESPERA = float(os.getenv("UPSTREAM_DISJUNTOR_ESPERA", 30))
+
+# Respostas que valem nova tentativa e contam como falha do upstream
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+
+# Timeout (segundos) de um endpoint em UPSTREAM_TIMEOUT_<NOME>; None (o padrão
+# do cliente) se não estiver definido
+def timeout_configurado(nome: str) -> float | None:
+    valor = os.getenv(f"UPSTREAM_TIMEOUT_{nome.upper()}")
+    return float(valor) if valor else None
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class Disjuntor:
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(self, falhas: int = UPSTREAM_DISJUNTOR_FALHAS, espera: float = UPSTREAM_DISJUNTOR_ESPERA):
+        self.limite_falhas = falhas
+        self.espera = espera
+        self.estado = self.FECHADO
+        self.falhas_seguidas = 0
+        self.aberto_em = None
+        self._testando = False
+        self.contadores = Counter()
+
+    # Se a chamada pode seguir. No meio aberto, só uma de cada vez (a de teste).
+    def permitir(self) -> bool:
+        if self.estado == self.ABERTO:
+            if time.monotonic() - self.aberto_em < self.espera:
+                self.contadores["rejeitadas"] += 1
+                return False
+            self.estado = self.MEIO_ABERTO
+        if self.estado == self.MEIO_ABERTO:
+            if self._testando:
+                self.contadores["rejeitadas"] += 1
+                return False
+            self._testando = True
+        return True
+
+    def sucesso(self):
+        self.contadores["sucessos"] += 1
+        self.falhas_seguidas = 0
+        self._testando = False
+        if self.estado != self.FECHADO:
+            logging.info("Disjuntor da PokeAPI fechado.")
+            self.estado = self.FECHADO
+
+    def falha(self):
+        self.contadores["falhas"] += 1
+        self.falhas_seguidas += 1
+        self._testando = False
+        if self.estado == self.MEIO_ABERTO or (self.estado == self.FECHADO and self.falhas_seguidas >= self.limite_falhas):
+            logging.warning(f"Disjuntor da PokeAPI aberto por {self.espera}s ({self.falhas_seguidas} falhas seguidas).")
+            self.contadores["aberturas"] += 1
+            self.estado = self.ABERTO
+            self.aberto_em = time.monotonic()
+
+    # Chamada cancelada no meio: não conta como sucesso nem falha
+    def liberar(self):
+        self._testando = False
+
+    def snapshot(self):
+        return {
+            "estado": self.estado,
+            "falhas_seguidas": self.falhas_seguidas,
+            "aberto_ha": round(time.monotonic() - self.aberto_em, 1) if self.estado != self.FECHADO and self.aberto_em else None,
+            **{nome: self.contadores[nome] for nome in ("sucessos", "falhas", "rejeitadas", "aberturas", "novas_tentativas")},
+        }
+
+
+class PokeAPIClient:
+    def __init__(
+        self,
+        base_url: str = POKEAPI_URL,
+        timeout: float = UPSTREAM_TIMEOUT,
+        connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT,
+        max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive: int = UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry: float = UPSTREAM_KEEPALIVE_EXPIRY,
+        concurrency: int = UPSTREAM_CONCURRENCY,
+        tentativas: int = UPSTREAM_TENTATIVAS,
+        backoff_base: float = UPSTREAM_BACKOFF_BASE,
+        backoff_max: float = UPSTREAM_BACKOFF_MAX,
+        disjuntor: Disjuntor = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.tentativas = max(tentativas, 1)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.disjuntor = disjuntor or Disjuntor()
+        self._connect_timeout = connect_timeout
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client = None
+        self._semaforo = None
+        self._loop = None
+
+    def _abrir(self):
+        # O pool fica preso ao event loop em que foi criado; se o loop mudar
+        # (ex.: TestClient sem context manager), um novo pool é aberto.
+        self._loop = asyncio.get_running_loop()
+        self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self._timeout, limits=self._limits)
+        self._semaforo = asyncio.Semaphore(self.concurrency)
+
+    async def start(self):
+        if self._client is None or self._loop is not asyncio.get_running_loop():
+            self._abrir()
+
+    async def close(self):
+        if self._client is not None:
+            try:
+                await self._client.aclose()
+            except RuntimeError as e:
+                logging.warning(f"Erro ao fechar cliente da PokeAPI: {e}")
+        self._client = None
+        self._semaforo = None
+        self._loop = None
+
+    async def _tentar(self, path: str, params: dict | None, timeout: float | None) -> httpx.Response:
+        timeout = self._timeout if timeout is None else httpx.Timeout(timeout, connect=min(timeout, self._connect_timeout))
+        async with self._semaforo:
+            try:
+                return await self._client.get(path, params=params, timeout=timeout)
+            except httpx.TimeoutException as e:
+                logging.warning(f"Tempo esgotado ao chamar a PokeAPI ({path}): {e!r}")
+                raise UpstreamError(504, "Tempo de resposta da PokeAPI esgotado.") from e
+            except httpx.HTTPError as e:
+                logging.warning(f"Falha ao chamar a PokeAPI ({path}): {e!r}")
+                raise UpstreamError(502, "Falha ao comunicar com a PokeAPI.") from e
+
+    def _espera(self, tentativa: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** tentativa))
+
+    # `timeout`: limite desta chamada (segundos), no lugar do padrão do cliente.
+    # Depois da última tentativa, uma resposta transitória é devolvida como
+    # veio e um erro de rede vira UpstreamError.
+    async def get(self, path: str, params: dict | None = None, timeout: float | None = None) -> httpx.Response:
+        await self.start()
+        for tentativa in range(self.tentativas):
+            if tentativa:
+                self.disjuntor.contadores["novas_tentativas"] += 1
+                await asyncio.sleep(self._espera(tentativa - 1))
+            if not self.disjuntor.permitir():
+                raise UpstreamError(503, "PokeAPI indisponível no momento, tente novamente em instantes.")
+
+            resposta = erro = None
+            try:
+                resposta = await self._tentar(path, params, timeout)
+            except UpstreamError as e:
+                erro = e
+            except BaseException:
+                self.disjuntor.liberar()
+                raise
+
+            if resposta is not None and resposta.status_code not in STATUS_TRANSITORIOS:
+                self.disjuntor.sucesso()
+                return resposta
+            self.disjuntor.falha()
+
+        if resposta is not None:
+            return resposta
+        raise erro
+
+    async def get_json(self, path: str, params: dict | None = None, timeout: float | None = None):
+        resposta = await self.get(path, params=params, timeout=timeout)
+        if resposta.status_code != 200:
+            return resposta.status_code, None
+        return resposta.status_code, resposta.json()
+
+
+# Aplica `funcao` (corrotina) a cada item com no máximo `limite` execuções
+# simultâneas. Retorna os resultados na ordem dos itens; exceções voltam como
+# resultado, sem cancelar os demais.
+async def em_paralelo(funcao, itens, limite: int):
+    semaforo = asyncio.Semaphore(limite)
+
+    async def executar(item):
+        async with semaforo:
+            return await funcao(item)
+
+    return await asyncio.gather(*(executar(item) for item in itens), return_exceptions=True)
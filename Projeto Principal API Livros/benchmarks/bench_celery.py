@@ -0,0 +1,114 @@
+# Latência das tarefas curtas e vazão total do Celery com a topologia antiga
+# (uma fila só, prefetch padrão, ack na entrega) vs. a de celery_app.py (filas
+# "rapidas" e "pesadas", prefetch 1, acks_late)
+#
+# Não precisa de Redis: usa o broker e o backend em memória do kombu, com
+# workers "solo" em threads. Cada topologia roda num processo próprio, porque
+# o broker em memória é global no processo. As tarefas têm os nomes das reais
+# (tasks.calcular_soma e tasks.calcular_fatorial), mas só dormem.
+#
+# Uso: python benchmarks/bench_celery.py [--longas 20] [--curtas 200] [--duracao-longa 0.1] [--workers 2]
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+
+import celery_app
+
+# O transporte em memória consulta as filas a cada polling_interval segundos
+TRANSPORTE = {"polling_interval": 0.005}
+
+
+def criar_app(atual: bool, duracao_longa: float, fim: dict):
+    app = Celery("bench", broker="memory://", backend="cache+memory://")
+    if atual:
+        conf = celery_app.configuracao()
+        conf["broker_transport_options"] = {**conf["broker_transport_options"], **TRANSPORTE}
+    else:
+        conf = dict(task_serializer="json", result_serializer="json", accept_content=["json"], broker_transport_options=TRANSPORTE)
+    app.conf.update(conf)
+
+    @app.task(name="tasks.calcular_soma")
+    def soma(chave, a, b):
+        fim[chave] = time.perf_counter()
+        return a + b
+
+    @app.task(name="tasks.calcular_fatorial")
+    def fatorial(chave, a):
+        time.sleep(duracao_longa)
+        fim[chave] = time.perf_counter()
+        return a
+
+    return app, soma, fatorial
+
+
+# Depois de cada tarefa longa vão curtas // longas tarefas curtas, como um
+# fatorial no meio de várias somas
+def rodar(atual: bool, args) -> dict:
+    fim, envio = {}, {}
+    app, soma, fatorial = criar_app(atual, args.duracao_longa, fim)
+    if atual:
+        # metade dos workers em cada fila (pelo menos um)
+        rapidas = max(1, args.workers // 2)
+        filas = [[celery_app.FILA_RAPIDA]] * rapidas + [[celery_app.FILA_PESADA]] * max(1, args.workers - rapidas)
+    else:
+        filas = [None] * args.workers
+
+    with contextlib.ExitStack() as pilha:
+        for fila in filas:
+            opcoes = {"queues": fila} if fila else {}
+            pilha.enter_context(start_worker(app, pool="solo", perform_ping_check=False, loglevel="WARNING", **opcoes))
+        inicio = time.perf_counter()
+        por_longa = max(1, args.curtas // max(1, args.longas))
+        for i in range(args.longas):
+            envio[f"l{i}"] = time.perf_counter()
+            fatorial.delay(f"l{i}", i)
+            for j in range(por_longa):
+                envio[f"c{i}-{j}"] = time.perf_counter()
+                soma.delay(f"c{i}-{j}", i, j)
+        while len(fim) < len(envio) and time.perf_counter() - inicio < args.limite:
+            time.sleep(0.01)
+        total = time.perf_counter() - inicio
+
+    curtas = sorted(fim[chave] - envio[chave] for chave in fim if chave.startswith("c"))
+    longas = sorted(fim[chave] - envio[chave] for chave in fim if chave.startswith("l"))
+    return {
+        "concluidas": len(fim),
+        "enviadas": len(envio),
+        "segundos": total,
+        "curta_p50": curtas[len(curtas) // 2] if curtas else 0,
+        "curta_p95": curtas[int(len(curtas) * 0.95)] if curtas else 0,
+        "longa_p50": longas[len(longas) // 2] if longas else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--longas", type=int, default=20)
+    parser.add_argument("--curtas", type=int, default=200)
+    parser.add_argument("--duracao-longa", type=float, default=0.1, help="segundos de cada tarefa longa")
+    parser.add_argument("--workers", type=int, default=2, help="workers no total, divididos entre as filas na topologia atual")
+    parser.add_argument("--limite", type=float, default=120, help="segundos máximos de espera por rodada")
+    args = parser.parse_args()
+
+    print(f"{'topologia':<10} {'concluidas':>11} {'segundos':>9} {'tarefas/s':>10} {'curta p50':>10} {'curta p95':>10} {'longa p50':>10}")
+    contexto = multiprocessing.get_context("spawn")
+    for atual in (False, True):
+        with contexto.Pool(1) as processo:
+            r = processo.apply(rodar, (atual, args))
+        print(
+            f"{'atual' if atual else 'antiga':<10} {r['concluidas']:>5}/{r['enviadas']:<5} {r['segundos']:>9.2f} "
+            f"{r['concluidas'] / r['segundos']:>10.0f} {r['curta_p50'] * 1000:>8.1f}ms {r['curta_p95'] * 1000:>8.1f}ms "
+            f"{r['longa_p50'] * 1000:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
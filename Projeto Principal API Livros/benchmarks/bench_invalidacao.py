@@ -0,0 +1,71 @@
+# Latência da invalidação do cache de livros com muitas páginas em cache:
+# SCAN + um DELETE por chave (esquema antigo) vs. incremento da geração,
+# e a limpeza explícita em lotes (SCAN + UNLINK em pipeline).
+#
+# Precisa de um Redis real (REDIS_HOST/REDIS_PORT). Usa o banco REDIS_DB
+# (padrão 15), que é esvaziado a cada rodada.
+#
+# Uso: python benchmarks/bench_invalidacao.py [--chaves 100000]
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis
+
+import cache
+
+
+def popular(redis_client, prefixo, total):
+    pipe = redis_client.pipeline(transaction=False)
+    for i in range(total):
+        pipe.setex(f"{prefixo}page={i}&limit=10", 600, "[]")
+        if i % 10000 == 9999:
+            pipe.execute()
+    pipe.execute()
+
+
+def medir(descricao, funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    print(f"{descricao}: {(time.perf_counter() - inicio) * 1000:.2f} ms ({resultado})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chaves", type=int, default=100000)
+    args = parser.parse_args()
+
+    redis_client = redis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        db=int(os.getenv("REDIS_DB", 15)),
+        decode_responses=True,
+    )
+
+    redis_client.flushdb()
+    popular(redis_client, "livros:", args.chaves)
+
+    def scan_e_delete():
+        removidas = 0
+        for chave in redis_client.scan_iter("livros:page=*"):
+            removidas += redis_client.delete(chave)
+        return f"{removidas} chaves"
+
+    medir(f"SCAN + DELETE por chave ({args.chaves} chaves)", scan_e_delete)
+
+    redis_client.flushdb()
+    popular(redis_client, "livros:v0:", args.chaves)
+    medir(f"INCR da geração ({args.chaves} chaves)", lambda: f"geração {redis_client.incr('livros:geracao')}")
+    medir(
+        "Limpeza da geração antiga (SCAN + UNLINK em pipeline)",
+        lambda: f"{cache.remover_chaves(redis_client, 'livros:v*', manter='livros:v1:')} chaves",
+    )
+
+    redis_client.flushdb()
+
+
+if __name__ == "__main__":
+    main()
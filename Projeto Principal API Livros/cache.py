@@ -0,0 +1,159 @@
+# Cache local (L1) em memória na frente do Redis (L2) para as páginas de livros
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+L1_TAMANHO = int(os.getenv("CACHE_L1_TAMANHO", 256))
+L1_TTL = float(os.getenv("CACHE_L1_TTL", 5))
+CANAL_INVALIDACAO = os.getenv("CACHE_CANAL_INVALIDACAO", "cache:invalidar")
+
+
+# LRU com expiração por TTL; protegido por lock porque a invalidação
+# chega pela thread do pub/sub. `versao` conta as invalidações: um valor
+# calculado antes de uma delas não deve mais entrar no cache.
+class CacheLocal:
+    def __init__(self, max_itens: int = L1_TAMANHO, ttl: float = L1_TTL):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.versao = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave: str):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    # Com `versao` (lida antes de calcular o valor), não grava se houve uma
+    # invalidação desde então
+    def set(self, chave: str, valor, ttl: float = None, versao: int = None):
+        if self.max_itens <= 0 or self.ttl <= 0:
+            return
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        with self._lock:
+            if versao is not None and versao != self.versao:
+                return
+            self._itens[chave] = (time.monotonic() + ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar_prefixo(self, prefixo: str):
+        with self._lock:
+            self.versao += 1
+            for chave in [c for c in self._itens if c.startswith(prefixo)]:
+                del self._itens[chave]
+
+    def __len__(self):
+        return len(self._itens)
+
+
+l1 = CacheLocal()
+
+_lock_stats = threading.Lock()
+_contadores = defaultdict(int)
+
+
+def registrar(evento: str):
+    with _lock_stats:
+        _contadores[evento] += 1
+
+
+def snapshot():
+    with _lock_stats:
+        l1_hits, l2_hits, misses = _contadores["l1_hits"], _contadores["l2_hits"], _contadores["misses"]
+    total = l1_hits + l2_hits + misses
+    return {
+        "l1_hits": l1_hits,
+        "l2_hits": l2_hits,
+        "misses": misses,
+        "l1_hit_ratio": round(l1_hits / total, 4) if total else 0.0,
+        "l2_hit_ratio": round(l2_hits / (total - l1_hits), 4) if total - l1_hits else 0.0,
+        "l1_itens": len(l1),
+    }
+
+
+# Identifica este worker nas mensagens de invalidação
+ORIGEM = uuid.uuid4().hex
+_assinatura = None
+
+
+def _receber_invalidacao(mensagem):
+    try:
+        dados = json.loads(mensagem["data"])
+    except Exception:
+        logging.warning(f"Mensagem de invalidação inválida: {mensagem!r}")
+        return
+    if dados.get("origem") != ORIGEM and "prefixo" in dados:
+        l1.invalidar_prefixo(dados["prefixo"])
+
+
+def iniciar_invalidacao(redis_client):
+    global _assinatura
+    if _assinatura is not None:
+        return
+    try:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{CANAL_INVALIDACAO: _receber_invalidacao})
+        _assinatura = pubsub.run_in_thread(sleep_time=1, daemon=True)
+    except Exception as e:
+        logging.warning(f"Falha ao assinar canal de invalidação: {e}")
+
+
+def parar_invalidacao():
+    global _assinatura
+    if _assinatura is not None:
+        _assinatura.stop()
+        _assinatura = None
+
+
+# Aceita tanto o cliente Redis síncrono quanto o redis.asyncio (MODO_ASYNC=1)
+async def aguardar(resultado):
+    return await resultado if inspect.isawaitable(resultado) else resultado
+
+
+# Invalida o L1 deste worker e avisa os demais pelo pub/sub
+async def publicar_invalidacao(redis_client, prefixo: str):
+    l1.invalidar_prefixo(prefixo)
+    try:
+        await aguardar(redis_client.publish(CANAL_INVALIDACAO, json.dumps({"origem": ORIGEM, "prefixo": prefixo})))
+    except Exception as e:
+        logging.warning(f"Falha ao publicar invalidação: {e}")
+
+
+# Remove as chaves que casam com `padrao` (exceto as que começam com `manter`)
+# em lotes: SCAN com COUNT e um UNLINK por lote num pipeline, em vez de um
+# DELETE (e um round-trip) por chave
+def remover_chaves(redis_client, padrao: str, manter: str = None, lote: int = 1000) -> int:
+    removidas = 0
+    chaves = []
+    for chave in redis_client.scan_iter(match=padrao, count=lote):
+        if isinstance(chave, bytes):
+            chave = chave.decode()
+        if manter and chave.startswith(manter):
+            continue
+        chaves.append(chave)
+        if len(chaves) >= lote:
+            removidas += _unlink(redis_client, chaves)
+            chaves = []
+    if chaves:
+        removidas += _unlink(redis_client, chaves)
+    return removidas
+
+
+def _unlink(redis_client, chaves):
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.unlink(*chaves)
+    return sum(pipe.execute())
@@ -0,0 +1,140 @@
+# Motor das tarefas de /calcular/*.
+#
+# O id da tarefa é derivado do nome e dos argumentos, então pedidos iguais
+# caem no mesmo resultado do backend: se ele já existe (ou a tarefa está na
+# fila ou rodando), o POST só devolve o id, sem enfileirar outra vez.
+#
+# Resultados pequenos continuam indo inteiros no backend. Os grandes (fatorial
+# de números altos) vão para uma chave própria, endereçada pela entrada e
+# comprimida em gzip; o backend guarda só um resumo (quantidade de dígitos,
+# começo, fim, SHA-256) e o número completo sai em partes por
+# GET /tasks/{task_id}/resultado.
+import decimal
+import hashlib
+import json
+import os
+import zlib
+
+from celery.backends.redis import RedisBackend
+
+# Maior n aceito em /calcular/fatorial (10^6! tem ~5,5 milhões de dígitos)
+FATORIAL_MAX = int(os.getenv("CALCULO_FATORIAL_MAX", 1_000_000))
+# Acima disso (em dígitos) o resultado vira resumo + download; o json do Python
+# não serializa inteiros com mais de 4300 dígitos
+DIGITOS_INLINE = min(int(os.getenv("CALCULO_DIGITOS_INLINE", 1000)), 4300)
+# Bytes lidos do Redis por vez no download
+TAMANHO_PARTE = int(os.getenv("CALCULO_TAMANHO_PARTE", 64 * 1024))
+# Dígitos do começo e do fim mostrados no resumo
+DIGITOS_RESUMO = 40
+
+# Estados em que o resultado já existe ou ainda vai existir
+ESTADOS_ATIVOS = ("SUCCESS", "STARTED", "RETRY", "RECEIVED")
+
+
+def id_tarefa(nome: str, *args) -> str:
+    conteudo = json.dumps([nome, *args], separators=(",", ":"))
+    return f"{nome.rsplit('.', 1)[-1]}-{hashlib.sha256(conteudo.encode()).hexdigest()[:32]}"
+
+
+# A marca de "na fila" só existe com o backend Redis; nos outros, um pedido
+# igual a uma tarefa ainda na fila é enfileirado de novo
+def redis_resultados(app):
+    return app.backend.client if isinstance(app.backend, RedisBackend) else None
+
+
+# Enfileira `tarefa` com `args`, a menos que um pedido igual já tenha
+# resultado, esteja rodando ou na fila. Retorna (task_id, já_existia).
+def enviar(tarefa, *args) -> tuple:
+    if tarefa.ignore_result:
+        return tarefa.apply_async(args).id, False
+
+    app = tarefa.app
+    task_id = id_tarefa(tarefa.name, *args)
+    resultado = app.AsyncResult(task_id)
+    estado = resultado.state
+    if estado in ESTADOS_ATIVOS:
+        return task_id, True
+
+    # Na fila a tarefa ainda é PENDING, igual a uma desconhecida: a marca
+    # (SET NX com a validade dos resultados) separa os dois casos
+    redis_client = redis_resultados(app)
+    marca = f"calculo:enviada:{task_id}"
+    if estado in ("FAILURE", "REVOKED"):
+        resultado.forget()
+        if redis_client is not None:
+            redis_client.delete(marca)
+    if redis_client is not None and not redis_client.set(marca, 1, nx=True, ex=app.conf.result_expires):
+        return task_id, True
+
+    tarefa.apply_async(args, task_id=task_id)
+    return task_id, False
+
+
+# n! como Decimal, multiplicando em árvore: o libmpdec multiplica números
+# grandes por NTT e converte para texto em tempo linear, enquanto str() de um
+# int do Python é quadrático (10^6! leva minutos, contra poucos segundos aqui)
+def fatorial_decimal(n: int) -> decimal.Decimal:
+    contexto = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX)
+
+    def produto(inicio, fim):
+        if fim - inicio < 32:
+            parcial = 1
+            for i in range(inicio, fim + 1):
+                parcial *= i
+            return decimal.Decimal(parcial)
+        meio = (inicio + fim) // 2
+        return contexto.multiply(produto(inicio, meio), produto(meio + 1, fim))
+
+    return produto(2, n) if n > 1 else decimal.Decimal(1)
+
+
+def chave_fatorial(n: int) -> str:
+    return f"calculo:fatorial:{n}"
+
+
+# Calcula n! e devolve o inteiro ou, se for grande, grava os dígitos em
+# `redis_client` e devolve o resumo. Sem o Redis de resultados (redis_client
+# None) não há onde guardar o número completo: fica só o resumo, sem "chave"
+def fatorial(n: int, redis_client, expira: int):
+    digitos = format(fatorial_decimal(n), "f")
+    if len(digitos) <= DIGITOS_INLINE:
+        return int(digitos)
+
+    resumo = {
+        "digitos": len(digitos),
+        "inicio": digitos[:DIGITOS_RESUMO],
+        "fim": digitos[-DIGITOS_RESUMO:],
+        "zeros_finais": len(digitos) - len(digitos.rstrip("0")),
+        "sha256": hashlib.sha256(digitos.encode()).hexdigest(),
+    }
+    if redis_client is None:
+        return resumo
+
+    chave = chave_fatorial(n)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    redis_client.set(chave, compressor.compress(digitos.encode()) + compressor.flush(), ex=expira)
+    return {**resumo, "chave": chave}
+
+
+# Resumo de um resultado grande (com ou sem o número completo no Redis)
+def resumido(resultado) -> bool:
+    return isinstance(resultado, dict) and "sha256" in resultado
+
+
+def grande(resultado) -> bool:
+    return resumido(resultado) and "chave" in resultado
+
+
+# Lê o valor gzip de `chave` em partes (GETRANGE); com `descomprimir`,
+# devolve o texto puro
+def ler_em_partes(redis_client, chave: str, descomprimir: bool = True):
+    descompressor = zlib.decompressobj(31) if descomprimir else None
+    inicio = 0
+    while True:
+        parte = redis_client.getrange(chave, inicio, inicio + TAMANHO_PARTE - 1)
+        if not parte:
+            break
+        inicio += len(parte)
+        yield descompressor.decompress(parte) if descompressor else parte
+    if descompressor:
+        yield descompressor.flush()
@@ -1,16 +1,52 @@
+import os
+
 from celery import Celery
+from kombu import Queue
+
+# Broker, resultados e cache de páginas (REDIS_DB, padrão 0) em bancos
+# separados do Redis; para instâncias separadas, basta trocar o host nas URLs
+BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/1")
+RESULTADOS_URL = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/2")
+# Tempo (segundos) que o resultado de uma tarefa fica disponível em /tasks/{id}
+RESULTADOS_EXPIRAM = int(os.getenv("CELERY_RESULT_EXPIRES", 3600))
+
+# Filas por tipo de tarefa: as curtas não esperam atrás das longas
+FILA_RAPIDA = os.getenv("CELERY_FILA_RAPIDA", "rapidas")
+FILA_PESADA = os.getenv("CELERY_FILA_PESADA", "pesadas")
+ROTAS = {
+    "tasks.calcular_soma": {"queue": FILA_RAPIDA},
+    "tasks.calcular_fatorial": {"queue": FILA_PESADA},
+}
+
+# Com tarefas longas, cada processo reserva só a que vai executar (prefetch 1)
+# e a confirma ao terminar (acks_late): se o worker cair, ela volta para a fila
+PREFETCH = int(os.getenv("CELERY_PREFETCH", 1))
+ACKS_TARDIO = os.getenv("CELERY_ACKS_TARDIO", "1").lower() in ("1", "true", "sim")
+# Uma tarefa não confirmada nesse tempo (segundos) é reentregue pelo Redis;
+# precisa ser maior que a tarefa mais longa
+VISIBILIDADE = int(os.getenv("CELERY_VISIBILIDADE", 3600))
+
+# Tarefas "dispare e esqueça", sem gravar resultado (nomes separados por vírgula)
+SEM_RESULTADO = [nome.strip() for nome in os.getenv("CELERY_SEM_RESULTADO", "").split(",") if nome.strip()]
+
+
+def configuracao() -> dict:
+    return dict(
+        task_track_started=True,
+        result_expires=RESULTADOS_EXPIRAM,
+        task_serializer="json",
+        result_serializer="json",
+        accept_content=["json"],
+        task_queues=[Queue(FILA_RAPIDA), Queue(FILA_PESADA)],
+        task_default_queue=FILA_RAPIDA,
+        task_routes=ROTAS,
+        worker_prefetch_multiplier=PREFETCH,
+        task_acks_late=ACKS_TARDIO,
+        task_reject_on_worker_lost=ACKS_TARDIO,
+        broker_transport_options={"visibility_timeout": VISIBILIDADE},
+        task_annotations={nome: {"ignore_result": True} for nome in SEM_RESULTADO},
+    )
+
 
-celery_app = Celery(
-    "tarefas_livros",
-    broker= "redis://redis:6379/0",
-    backend= "redis://redis:6379/0"
-)
-
-celery_app.conf.update(
-    task_track_started = True,
-    result_expires = 3600,
-    result_persistent = True,
-    task_serializer = "json",
-    result_serializer = "json",
-    accept_content = ["json"]
-)
\ No newline at end of file
+celery_app = Celery("tarefas_livros", broker=BROKER_URL, backend=RESULTADOS_URL)
+celery_app.conf.update(configuracao())
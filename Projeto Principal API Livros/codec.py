@@ -0,0 +1,155 @@
+# Codec das entradas do cache: serialização (JSON ou msgpack) e compressão
+# opcional (zlib ou zstd) acima de um tamanho mínimo.
+#
+# Cada entrada começa com um cabeçalho fixo: marcador, versão do formato,
+# codec, compressão e o instante de criação. Como a leitura decodifica pelo
+# cabeçalho (e ainda aceita o JSON puro antigo, sem cabeçalho), trocar
+# CACHE_CODEC/CACHE_COMPRESSAO não exige esvaziar o Redis: entradas antigas
+# continuam legíveis até expirarem.
+#
+# orjson, msgpack e zstd são opcionais; sem eles o codec cai para o json da
+# biblioteca padrão e sem compressão.
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import NamedTuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        try:
+            import zstandard as zstd
+        except ImportError:
+            zstd = None
+
+# 0xC1 nunca aparece no início de um JSON, de um msgpack válido nem de UTF-8
+MARCADOR = 0xC1
+VERSAO_FORMATO = 1
+CABECALHO = struct.Struct("!BBBBd")
+
+CODECS = {"json": 1, "msgpack": 2}
+COMPRESSOES = {"nenhuma": 0, "zlib": 1, "zstd": 2}
+
+
+class Entrada(NamedTuple):
+    valor: object
+    # None nas entradas antigas, gravadas sem cabeçalho
+    criado_em: float | None
+
+
+def _disponivel(codec: str, compressao: str):
+    if codec not in CODECS or (codec == "msgpack" and msgpack is None):
+        logging.warning(f"Codec de cache '{codec}' indisponível, usando json.")
+        codec = "json"
+    if compressao not in COMPRESSOES or (compressao == "zstd" and zstd is None):
+        logging.warning(f"Compressão de cache '{compressao}' indisponível, usando zlib.")
+        compressao = "zlib"
+    return codec, compressao
+
+
+CODEC, COMPRESSAO = _disponivel(os.getenv("CACHE_CODEC", "json"), os.getenv("CACHE_COMPRESSAO", "nenhuma"))
+# Payloads menores que isto (bytes) não são comprimidos
+COMPRIMIR_ACIMA = int(os.getenv("CACHE_COMPRIMIR_ACIMA", 1024))
+
+
+def json_bytes(valor) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(valor)
+    return json.dumps(valor, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _json_loads(dados):
+    return orjson.loads(dados) if orjson is not None else json.loads(dados)
+
+
+def _serializar(valor, codec: str) -> bytes:
+    return msgpack.packb(valor) if codec == "msgpack" else json_bytes(valor)
+
+
+def _desserializar(dados: bytes, codec: int):
+    if codec == CODECS["msgpack"]:
+        return msgpack.unpackb(dados)
+    return _json_loads(dados)
+
+
+def _comprimir(dados: bytes, compressao: str) -> bytes:
+    if compressao == "zstd":
+        return zstd.compress(dados)
+    return zlib.compress(dados, 6)
+
+
+def _descomprimir(dados: bytes, compressao: int) -> bytes:
+    if compressao == COMPRESSOES["zstd"]:
+        return zstd.decompress(dados)
+    if compressao == COMPRESSOES["zlib"]:
+        return zlib.decompress(dados)
+    return dados
+
+
+# `serializado`: o JSON do valor, se já existir (evita serializar de novo com o codec json)
+def codificar(valor, criado_em: float = None, codec: str = None, compressao: str = None, comprimir_acima: int = None, serializado: bytes = None) -> bytes:
+    codec = codec or CODEC
+    compressao = compressao or COMPRESSAO
+    comprimir_acima = COMPRIMIR_ACIMA if comprimir_acima is None else comprimir_acima
+
+    dados = serializado if serializado is not None and codec == "json" else _serializar(valor, codec)
+    if compressao != "nenhuma" and len(dados) >= comprimir_acima:
+        dados = _comprimir(dados, compressao)
+    else:
+        compressao = "nenhuma"
+
+    cabecalho = CABECALHO.pack(
+        MARCADOR, VERSAO_FORMATO, CODECS[codec], COMPRESSOES[compressao], time.time() if criado_em is None else criado_em
+    )
+    return cabecalho + dados
+
+
+def _ler_cabecalho(dados: bytes):
+    if len(dados) < CABECALHO.size or dados[0] != MARCADOR:
+        return None
+    marcador, versao, codec, compressao, criado_em = CABECALHO.unpack_from(dados)
+    if versao != VERSAO_FORMATO:
+        raise ValueError(f"Versão de formato do cache desconhecida: {versao}")
+    return codec, compressao, criado_em
+
+
+# Aceita bytes ou str (clientes com decode_responses=True e entradas antigas)
+def decodificar(dados) -> Entrada:
+    if isinstance(dados, str):
+        dados = dados.encode()
+    cabecalho = _ler_cabecalho(dados)
+    if cabecalho is None:
+        return Entrada(_json_loads(dados), None)
+    codec, compressao, criado_em = cabecalho
+    return Entrada(_desserializar(_descomprimir(dados[CABECALHO.size:], compressao), codec), criado_em)
+
+
+# Como decodificar(), mas devolve o valor já como JSON em bytes. Com o codec
+# json o payload é devolvido como está, sem desserializar.
+def para_json(dados) -> Entrada:
+    if isinstance(dados, str):
+        dados = dados.encode()
+    cabecalho = _ler_cabecalho(dados)
+    if cabecalho is None:
+        return Entrada(dados, None)
+    codec, compressao, criado_em = cabecalho
+    payload = _descomprimir(dados[CABECALHO.size:], compressao)
+    if codec == CODECS["json"]:
+        return Entrada(payload, criado_em)
+    return Entrada(json_bytes(_desserializar(payload, codec)), criado_em)
@@ -0,0 +1,68 @@
+# Exportação da tabela inteira em streaming (NDJSON ou CSV). As linhas são
+# lidas em blocos com yield_per (cursor do lado do servidor no PostgreSQL),
+# então a memória usada não depende do tamanho da tabela.
+import csv
+import io
+import json
+import os
+import zlib
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+TAMANHO_BLOCO = int(os.getenv("EXPORTACAO_TAMANHO_BLOCO", 1000))
+FORMATOS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def aceita_gzip(request: Request) -> bool:
+    for codificacao in request.headers.get("accept-encoding", "").split(","):
+        nome, _, parametros = codificacao.strip().partition(";")
+        if nome.strip().lower() in ("gzip", "*"):
+            return parametros.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _ndjson(colunas, linhas):
+    return "".join(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n" for linha in linhas).encode()
+
+
+def _csv(colunas, linhas):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(linhas)
+    return buffer.getvalue().encode()
+
+
+# A sessão é aberta dentro do gerador porque o streaming continua depois que
+# o handler (e sua sessão) terminou
+def _blocos(engine, modelo, colunas, formato):
+    with Session(bind=engine) as db:
+        consulta = select(*(getattr(modelo, coluna) for coluna in colunas)).order_by(modelo.id)
+        resultado = db.execute(consulta.execution_options(yield_per=TAMANHO_BLOCO))
+        if formato == "csv":
+            yield _csv(colunas, [colunas])
+        for parte in resultado.partitions():
+            yield _ndjson(colunas, parte) if formato == "ndjson" else _csv(colunas, parte)
+
+
+def _gzip(blocos):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+def exportar(request: Request, db: Session, modelo, colunas: list, formato: str, nome: str):
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido. Use um de: {', '.join(FORMATOS)}.")
+
+    blocos = _blocos(db.get_bind(), modelo, colunas, formato)
+    extensao = "ndjson" if formato == "ndjson" else "csv"
+    headers = {"Content-Disposition": f'attachment; filename="{nome}.{extensao}"', "Vary": "Accept-Encoding"}
+    if aceita_gzip(request):
+        blocos = _gzip(blocos)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(blocos, media_type=FORMATOS[formato], headers=headers)
@@ -0,0 +1,55 @@
+# Paginação por cursor (keyset) sobre a chave primária: cada página é um
+# "WHERE id > :ultimo ORDER BY id LIMIT :limit", com custo independente da
+# profundidade, ao contrário de OFFSET.
+import base64
+import json
+
+from fastapi import HTTPException
+
+
+def codificar_cursor(id: int, direcao: str) -> str:
+    bruto = json.dumps({"id": id, "d": direcao}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str):
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        id, direcao = int(dados["id"]), dados["d"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    if direcao not in ("n", "p"):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    return id, direcao
+
+
+# Retorna (itens, next_cursor, prev_cursor) da página que começa no cursor
+def paginar_por_cursor(query, coluna, cursor: str, limit: int):
+    id, direcao = decodificar_cursor(cursor)
+    if direcao == "n":
+        itens = query.filter(coluna > id).order_by(coluna).limit(limit + 1).all()
+        tem_mais = len(itens) > limit
+        itens = itens[:limit]
+        if not itens:
+            return itens, None, None
+        proximo = codificar_cursor(getattr(itens[-1], coluna.key), "n") if tem_mais else None
+        anterior = codificar_cursor(getattr(itens[0], coluna.key), "p")
+    else:
+        itens = query.filter(coluna < id).order_by(coluna.desc()).limit(limit + 1).all()
+        tem_mais = len(itens) > limit
+        itens = list(reversed(itens[:limit]))
+        if not itens:
+            return itens, None, None
+        proximo = codificar_cursor(getattr(itens[-1], coluna.key), "n")
+        anterior = codificar_cursor(getattr(itens[0], coluna.key), "p") if tem_mais else None
+    return itens, proximo, anterior
+
+
+# Cursores para uma página obtida por page/limit, para o cliente poder
+# continuar a navegação por keyset a partir dela
+def cursores_da_pagina(itens, coluna, page: int, limit: int):
+    if not itens:
+        return None, None
+    proximo = codificar_cursor(getattr(itens[-1], coluna.key), "n") if len(itens) == limit else None
+    anterior = codificar_cursor(getattr(itens[0], coluna.key), "p") if page > 1 else None
+    return proximo, anterior
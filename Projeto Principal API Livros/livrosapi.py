@@ -1,18 +1,33 @@
 # livrosapi.py
 
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials, HTTPBearer
 from fastapi import BackgroundTasks
 from tasks import calcular_soma, calcular_fatorial
 from pydantic import BaseModel
-import secrets
+import time
 import os
 import dotenv
 import redis
-import json
+import redis.asyncio
+import autenticacao
+import banco
+import cache
+import calculos
+import codec
+import keyset
+import filtros
+import lote
+import migracoes
+import exportacao
+import inspecao
+import respostas
+from contadores import Contadores
 from celery_app import celery_app
 from celery.result import AsyncResult
-from sqlalchemy import create_engine, Column, Integer, String
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import Column, Index, Integer, String
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
@@ -30,15 +45,40 @@ app = FastAPI(
 )
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# `engine` é o de escrita; com SQLite em arquivo as leituras usam um pool separado (ver banco.py)
+engine, engine_leitura = banco.criar_engines(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessaoLeitura = sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura)
 Base = declarative_base()
+# O contador é reconciliado pela sessão de escrita, nunca pela de leitura
+contadores = Contadores(Base.metadata, SessionLocal)
 
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
-
-security = HTTPBasic()
+# Banco do Redis com o cache de páginas (o Celery usa outros, ver celery_app.py)
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+# Respostas em bytes: as páginas no cache são binárias (ver codec.py)
+redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+# O cliente síncrono continua atendendo o pub/sub e os endpoints de debug
+redis_sync = redis_client
+
+# Com MODO_ASYNC=1 os endpoints usam redis.asyncio (pool compartilhado) e
+# AsyncSession, sobrepondo I/O de banco e cache num mesmo worker
+if banco.MODO_ASYNC:
+    redis_client = redis.asyncio.Redis(connection_pool=redis.asyncio.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        max_connections=int(os.getenv("REDIS_MAX_CONEXOES", 50)),
+    ))
+# TTL (segundos) das páginas de livros no cache
+CACHE_TTL_LIVROS = int(os.getenv("CACHE_TTL_LIVROS", 100))
+
+# Sem auto_error: a dependência aceita Basic ou Bearer e responde o 401
+security = HTTPBasic(auto_error=False)
+bearer = HTTPBearer(auto_error=False)
+# Credenciais lidas uma vez, na inicialização
+autenticador = autenticacao.Autenticador.do_ambiente("MEU_USUARIO", "MINHA_SENHA")
 
 # Dicionário principal
 livros = {}
@@ -46,9 +86,16 @@ livros = {}
 # Classes Livro e LivroDB
 class LivroDB(Base):
     __tablename__ = "Livros"
-    id = Column(Integer, primary_key=True, index=True)
-    nome_livro = Column(String, index=True) 
-    autor_livro = Column(String, index=True)
+    # (nome_livro, autor_livro) é a chave de duplicidade: o índice único
+    # garante a unicidade nas inserções e também atende buscas por nome_livro
+    __table_args__ = (
+        Index("ux_livros_nome_autor", "nome_livro", "autor_livro", unique=True),
+        # filtro ?autor= de GET /livros
+        Index("ix_livros_autor", "autor_livro"),
+    )
+    id = Column(Integer, primary_key=True)
+    nome_livro = Column(String)
+    autor_livro = Column(String)
     ano_livro = Column(Integer)
 
 class Livro(BaseModel):
@@ -56,7 +103,25 @@ class Livro(BaseModel):
     autor_livro: str
     ano_livro: int
 
+class LivroComId(Livro):
+    id: int
+
+# Migrações do schema de bancos já existentes (ver migracoes.py); a posição na
+# lista é a versão. Não remova nem reordene: só acrescente no fim.
+def indices_por_chave_de_duplicidade(conn):
+    # os índices de coluna única não atendiam nenhuma consulta e só pesavam nas escritas
+    migracoes.remover_indices(conn, "Livros", ["ix_Livros_id", "ix_Livros_nome_livro", "ix_Livros_autor_livro"])
+    if migracoes.criar_indice_unico(conn, LivroDB.__table__, "ux_livros_nome_autor"):
+        contadores.invalidar(conn, LivroDB)
+
+def filtros_e_busca(conn):
+    migracoes.criar_indice(conn, LivroDB.__table__, "ix_livros_autor")
+    filtros.criar_indice_busca(conn, LivroDB.__table__, ["nome_livro", "autor_livro"])
+
+MIGRACOES = [indices_por_chave_de_duplicidade, filtros_e_busca]
+
 Base.metadata.create_all(bind=engine)
+migracoes.aplicar(engine, MIGRACOES)
 
 def sessao_db():
     db = SessionLocal()
@@ -65,127 +130,362 @@ def sessao_db():
     finally:
         db.close()
 
-# Autenticação básica
-def autenticar_usuario(credentials: HTTPBasicCredentials = Depends(security)):
-    MEU_USUARIO = os.getenv("MEU_USUARIO")
-    MINHA_SENHA = os.getenv("MINHA_SENHA")
-    is_username_correct = secrets.compare_digest(credentials.username, MEU_USUARIO)
-    is_password_correct = secrets.compare_digest(credentials.password, MINHA_SENHA)
+# Sessão dos endpoints que só leem
+def sessao_leitura():
+    db = SessaoLeitura()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# A exportação em streaming continua com a sessão síncrona
+sessao_db_sync = sessao_leitura
+
+if banco.MODO_ASYNC:
+    engine_async, SessaoAsync = banco.criar_sessao_async(DATABASE_URL)
+
+    async def sessao_db():
+        async with SessaoAsync() as db:
+            yield db
+
+    sessao_leitura = sessao_db
+
+# Autenticação básica (usuário e senha) ou por token (Authorization: Bearer)
+def autenticar_usuario(credentials: HTTPBasicCredentials = Depends(security), token: HTTPAuthorizationCredentials = Depends(bearer)):
+    usuario = autenticador.autenticar(credentials, token)
+    if usuario is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Usuário ou senha incorretos.",
+            headers={"WWW-Authenticate": "Basic"}
+        )
+    return usuario
 
-    if not (is_username_correct and is_password_correct):
+# Troca usuário e senha por um token: a senha é verificada uma vez por sessão
+@app.post("/token")
+def emitir_token(credentials: HTTPBasicCredentials = Depends(security)):
+    usuario = autenticador.autenticar(credentials)
+    if usuario is None:
         raise HTTPException(
             status_code=401,
             detail="Usuário ou senha incorretos.",
             headers={"WWW-Authenticate": "Basic"}
         )
+    return {"access_token": autenticador.emitir_token(usuario), "token_type": "bearer", "expires_in": autenticador.token_ttl}
+
+# Invalidação do cache local (L1) entre workers via pub/sub
+@app.on_event("startup")
+def startup_invalidacao():
+    cache.iniciar_invalidacao(redis_sync)
+
+@app.on_event("shutdown")
+def shutdown_invalidacao():
+    cache.parar_invalidacao()
+
+@app.on_event("shutdown")
+async def shutdown_modo_async():
+    if banco.MODO_ASYNC:
+        await engine_async.dispose()
+        await redis_client.aclose()
 
 # Métodos para salvar e deletar livros no Redis
-async def salvar_livros_redis(page: int, limit: int, livros: list):
-    cache_key = f"livros:page={page}&limit={limit}"
-    redis_client.setex(cache_key, 100, json.dumps(livros))
+# `filtro`: trecho de filtros.chave() com os filtros da consulta. A chave
+# continua começando por "livros:page=", então a invalidação cobre as páginas filtradas.
+def chave_livros(page: int, limit: int, cursor: str = None, incluir_total: bool = True, filtro: str = ""):
+    if cursor:
+        cache_key = f"livros:page=cursor={cursor}&limit={limit}"
+    else:
+        cache_key = f"livros:page={page}&limit={limit}"
+    return (cache_key if incluir_total else cache_key + "&sem_total") + filtro
+
+# As páginas no Redis ficam sob a geração atual ("livros:v<geracao>:page=...").
+# Uma escrita só incrementa a geração: as páginas antigas ficam inalcançáveis e
+# expiram pelo TTL, sem percorrer o keyspace. O L1 usa a chave sem geração e é
+# invalidado pelo pub/sub; uma página calculada antes de uma invalidação não
+# entra nele (ver CacheLocal.versao).
+CHAVE_GERACAO_LIVROS = "livros:geracao"
+
+async def geracao_livros():
+    return int(await cache.aguardar(redis_client.get(CHAVE_GERACAO_LIVROS)) or 0)
+
+def chave_redis_livros(cache_key: str, geracao: int):
+    return f"livros:v{geracao}:{cache_key.removeprefix('livros:')}"
+
+async def salvar_livros_redis(page: int, limit: int, livros: list, cursor: str = None, incluir_total: bool = True, geracao: int = None, filtro: str = "", versao_l1: int = None):
+    cache_key = chave_livros(page, limit, cursor, incluir_total, filtro)
+    if geracao is None:
+        versao_l1 = cache.l1.versao
+        geracao = await geracao_livros()
+    # O JSON é gerado uma vez e reaproveitado no L1, no Redis e na resposta
+    agora = time.time()
+    corpo = respostas.corpo(codec.json_bytes(livros), agora)
+    cache.l1.set(cache_key, corpo, CACHE_TTL_LIVROS, versao=versao_l1)
+    await cache.aguardar(redis_client.setex(chave_redis_livros(cache_key, geracao), CACHE_TTL_LIVROS, codec.codificar(livros, agora, serializado=corpo.conteudo)))
+    return corpo
 
 async def deletar_livros_redis():
-    for chave in redis_client.scan_iter("livros:page=*"):
-        redis_client.delete(chave)
+    await cache.aguardar(redis_client.incr(CHAVE_GERACAO_LIVROS))
+    await cache.publicar_invalidacao(redis_client, "livros:page=")
+
+# Campos aceitos em ?ordenar= ("-" na frente para ordem decrescente)
+CAMPOS_ORDENACAO = {"nome": LivroDB.nome_livro, "autor": LivroDB.autor_livro, "ano": LivroDB.ano_livro}
 
 # GET - Buscar dados dos livros
+# Filtros: autor (exato), nome (prefixo), ano, q (busca textual em nome e autor) e ordenar
 @app.get("/livros")
-async def get_livros(page: int = 1, limit: int = 10, db: Session = Depends(sessao_db), credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
+async def get_livros(request: Request, page: int = 1, limit: int = 10, cursor: str = None, incluir_total: bool = True, autor: str = None, nome: str = None, ano: int = None, q: str = None, ordenar: str = None, db: Session = Depends(sessao_leitura), credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
     if page < 1 or limit < 1:
         raise HTTPException(status_code=400, detail="Page ou limit com valores inválidos!")
+    ordem = filtros.ordenacao(ordenar, CAMPOS_ORDENACAO, LivroDB.id)
+    if cursor and ordem:
+        raise HTTPException(status_code=400, detail="A paginação por cursor só aceita a ordenação padrão (id)!")
     
-    cache_key = f"livros:page={page}&limit={limit}"
-    cached = redis_client.get(cache_key)  
+    filtro = filtros.chave("&", autor=autor, nome=nome, ano=ano, q=q, ordenar=ordenar)
+    cache_key = chave_livros(page, limit, cursor, incluir_total, filtro)
+    cached = cache.l1.get(cache_key)
+    if cached is not None:
+        cache.registrar("l1_hits")
+        return respostas.responder(request, cached)
+
+    # A geração é lida antes do banco: se uma escrita acontecer no meio, esta
+    # página é gravada na geração antiga e nunca é lida do Redis; a escrita
+    # também invalida o L1, e aí a versão lida aqui impede a gravação nele
+    versao_l1 = cache.l1.versao
+    geracao = await geracao_livros()
+    cached = await cache.aguardar(redis_client.get(chave_redis_livros(cache_key, geracao)))
 
     if cached:
-        return json.loads(cached)
-
-    db_livros = db.query(LivroDB).offset((page - 1) * limit).limit(limit).all()
-
-    if not db_livros:
+        cache.registrar("l2_hits")
+        corpo = respostas.corpo(*codec.para_json(cached))
+        cache.l1.set(cache_key, corpo, CACHE_TTL_LIVROS, versao=versao_l1)
+        return respostas.responder(request, corpo)
+
+    cache.registrar("misses")
+
+    def consultar(db):
+        query = db.query(LivroDB)
+        if autor:
+            query = query.filter(LivroDB.autor_livro == autor)
+        if nome:
+            query = query.filter(filtros.prefixo(LivroDB.nome_livro, nome))
+        if ano is not None:
+            query = query.filter(LivroDB.ano_livro == ano)
+        if q:
+            query = filtros.buscar(query, LivroDB, ["nome_livro", "autor_livro"], q)
+
+        if cursor:
+            db_livros, next_cursor, prev_cursor = keyset.paginar_por_cursor(query, LivroDB.id, cursor, limit)
+        else:
+            db_livros = query.order_by(*(ordem or [LivroDB.id])).offset((page - 1) * limit).limit(limit).all()
+            # com outra ordenação os cursores (por id) não valem
+            next_cursor, prev_cursor = (None, None) if ordem else keyset.cursores_da_pagina(db_livros, LivroDB.id, page, limit)
+
+        if not db_livros:
+            return None
+
+        # O contador mantido só vale para a tabela inteira; com filtro, conta a consulta
+        if not incluir_total:
+            total_livros = None
+        elif autor or nome or ano is not None or q:
+            total_livros = query.count()
+        else:
+            total_livros = contadores.total(db, LivroDB)
+
+        return {
+            "page": None if cursor else page,
+            "limit": limit,
+            "total": total_livros,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "livros": [{"id": livro.id, "nome_livro": livro.nome_livro, "autor_livro": livro.autor_livro, "ano_livro": livro.ano_livro} for livro in db_livros]
+        }
+
+    resposta = await banco.no_banco(db, consultar)
+    if resposta is None:
         return {"message": "Não existe nenhum livro."}
 
-    total_livros = db.query(LivroDB).count()
+    corpo = await salvar_livros_redis(page, limit, resposta, cursor, incluir_total, geracao, filtro, versao_l1)
+    
+    return respostas.responder(request, corpo)
 
-    resposta = {
-        "page": page,
-        "limit": limit,
-        "total": total_livros,
-        "livros": [{"id": livro.id, "nome_livro": livro.nome_livro, "autor_livro": livro.autor_livro, "ano_livro": livro.ano_livro} for livro in db_livros]
-    }
+# Exporta todos os livros em streaming (NDJSON ou CSV, com gzip se o cliente aceitar)
+@app.get("/livros/exportar")
+def exportar_livros(request: Request, formato: str = "ndjson", db: Session = Depends(sessao_db_sync), credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
+    return exportacao.exportar(request, db, LivroDB, ["id", "nome_livro", "autor_livro", "ano_livro"], formato, "livros")
 
-    await salvar_livros_redis(page, limit, resposta)
-    
-    return resposta
+# Estatísticas do cache por nível (L1 em memória, L2 Redis)
+@app.get("/debug/cache")
+def ver_cache_stats():
+    return cache.snapshot()
 
-# Debug Redis
+# Debug Redis: SCAN paginado (passe o `cursor` retornado; 0 quando acabou),
+# com GET/TTL/MEMORY USAGE de cada página num pipeline
 @app.get("/debug/redis")
-def ver_livros_redis():
-    chaves = redis_client.keys("livros:*")
-    livros = []
+def ver_livros_redis(cursor: int = 0, count: int = inspecao.PAGINA_PADRAO, valores: bool = True):
+    return inspecao.inspecionar(redis_sync, "livros:*", cursor, count, valores)
 
-    for chave in chaves:
-        valor = redis_client.get(chave)
-        ttl = redis_client.ttl(chave)
-        livros.append({"chave": chave, "valor": json.loads(valor), "ttl": ttl})
+# Memória usada pelo cache, agrupada por prefixo de chave
+@app.get("/debug/redis/memoria")
+def ver_memoria_redis(limite: int = inspecao.AMOSTRA_MAX):
+    return inspecao.memoria_por_prefixo(redis_sync, "livros:*", limite)
 
-    return livros
+# Limpeza explícita das páginas de gerações antigas (em lotes, com pipeline)
+@app.delete("/debug/redis")
+def limpar_livros_redis(credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
+    geracao = int(redis_sync.get(CHAVE_GERACAO_LIVROS) or 0)
+    removidas = cache.remover_chaves(redis_sync, "livros:v*", manter=f"livros:v{geracao}:")
+    return {"geracao": geracao, "removidas": removidas}
 
 # POST - Adicionar novos livros
 @app.post("/livros")
 async def post_livros(livro: Livro, db: Session = Depends(sessao_db), credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
-    db_livro = db.query(LivroDB).filter(LivroDB.nome_livro == livro.nome_livro, LivroDB.autor_livro == livro.autor_livro).first()
-    if db_livro:
-        raise HTTPException(status_code=400, detail="Esse livro já existe no banco de dados!!!")
-    
-    novo_livro = LivroDB(nome_livro=livro.nome_livro, autor_livro=livro.autor_livro, ano_livro=livro.ano_livro)
-    db.add(novo_livro)
-    db.commit()
-    db.refresh(novo_livro)
+    def inserir(db):
+        novo_livro = LivroDB(nome_livro=livro.nome_livro, autor_livro=livro.autor_livro, ano_livro=livro.ano_livro)
+        db.add(novo_livro)
+        # Sem consulta prévia: o índice único de (nome_livro, autor_livro) recusa o duplicado
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Esse livro já existe no banco de dados!!!")
+        contadores.ajustar(db, LivroDB, +1)
+        db.commit()
+
+    await banco.no_banco(db, inserir, em_thread=True)
 
     await deletar_livros_redis()
 
     raise HTTPException(status_code=201, detail="Livro criado com sucesso!") 
 
-# Tarefas Celery
+# Tarefas Celery (pedidos iguais reaproveitam a mesma tarefa, ver calculos.py)
 @app.post("/calcular/soma")
 def somar(a: int, b:int):
-    tarefa = calcular_soma.delay(a, b)
+    task_id, existente = calculos.enviar(calcular_soma, a, b)
     return {
-        "task_id": tarefa.id,
-        "message": "Tarefa de soma enviada para execução!"
+        "task_id": task_id,
+        "existente": existente,
+        "message": "Tarefa de soma já calculada ou em andamento!" if existente else "Tarefa de soma enviada para execução!"
     }
 
 @app.post("/calcular/fatorial")
 def fatorial(a: int):
-    tarefa = calcular_fatorial.delay(a)
+    if not 0 <= a <= calculos.FATORIAL_MAX:
+        raise HTTPException(status_code=400, detail=f"O valor deve estar entre 0 e {calculos.FATORIAL_MAX}.")
+    task_id, existente = calculos.enviar(calcular_fatorial, a)
     return {
-        "task_id": tarefa.id,
-        "message": "Tarefa fatorial enviada para execução!"
+        "task_id": task_id,
+        "existente": existente,
+        "message": "Tarefa fatorial já calculada ou em andamento!" if existente else "Tarefa fatorial enviada para execução!"
     }
 
 # Endpoint para consultar status/resultados de tasks
 @app.get("/tasks/{task_id}")
 def get_task_result(task_id: str):
     result = AsyncResult(task_id, app=celery_app)
+    resultado = result.result if result.ready() else None
+    # Resultado grande: só o resumo, com o link para o número completo
+    if calculos.grande(resultado):
+        resultado = {**resultado, "download": f"/tasks/{task_id}/resultado"}
+        del resultado["chave"]
     return {
         "task_id": task_id,
         "status": result.status,
-        "result": result.result if result.ready() else None
+        "result": resultado
     }
 
+# Resultado completo em texto puro; os grandes saem em partes direto do Redis
+# (já em gzip, se o cliente aceitar)
+@app.get("/tasks/{task_id}/resultado")
+def get_task_resultado(task_id: str, request: Request):
+    result = AsyncResult(task_id, app=celery_app)
+    if not result.successful():
+        raise HTTPException(status_code=404, detail="Resultado não disponível.")
+    if calculos.resumido(result.result) and not calculos.grande(result.result):
+        raise HTTPException(status_code=404, detail="Número completo não guardado: o backend de resultados não é o Redis.")
+    if not calculos.grande(result.result):
+        return PlainTextResponse(str(result.result))
+
+    redis_resultados = calculos.redis_resultados(celery_app)
+    chave = result.result["chave"]
+    if not redis_resultados.exists(chave):
+        raise HTTPException(status_code=404, detail="Resultado expirado.")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{task_id}.txt"',
+        "ETag": f'"{result.result["sha256"]}"',
+        "Vary": "Accept-Encoding",
+    }
+    gzip = exportacao.aceita_gzip(request)
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(calculos.ler_em_partes(redis_resultados, chave, descomprimir=not gzip), media_type="text/plain", headers=headers)
+
+# Lote - Criar, atualizar e deletar vários livros de uma vez (array JSON ou NDJSON)
+@app.post("/livros/lote")
+async def post_livros_lote(request: Request, atualizar_existentes: bool = False, db: Session = Depends(sessao_db), credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
+    validos, resultados = await lote.ler_lote(request, Livro)
+    itens = [(indice, livro.model_dump()) for indice, livro in validos]
+
+    def gravar(db):
+        gravados = lote.criar_em_lote(db, LivroDB, [LivroDB.nome_livro, LivroDB.autor_livro], itens, atualizar_existentes, contadores)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+
+    await deletar_livros_redis()
+
+    return lote.resumir(resultados)
+
+@app.put("/livros/lote")
+async def put_livros_lote(request: Request, db: Session = Depends(sessao_db), credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
+    validos, resultados = await lote.ler_lote(request, LivroComId)
+    itens = [(indice, livro.id, livro.model_dump(exclude={"id"})) for indice, livro in validos]
+
+    def gravar(db):
+        gravados = lote.atualizar_em_lote(db, LivroDB, LivroDB.id, itens)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+
+    await deletar_livros_redis()
+
+    return lote.resumir(resultados)
+
+@app.delete("/livros/lote")
+async def delete_livros_lote(request: Request, db: Session = Depends(sessao_db), credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
+    validos, resultados = await lote.ler_lote(request, int)
+
+    def gravar(db):
+        gravados = lote.remover_em_lote(db, LivroDB, LivroDB.id, validos, contadores)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+
+    await deletar_livros_redis()
+
+    return lote.resumir(resultados)
+
 # PUT - Atualizar livros
 @app.put("/livros/{id_livro}")
 async def put_livros(id_livro: int, livro: Livro, db: Session = Depends(sessao_db), credentials: HTTPBasicCredentials = Depends(autenticar_usuario)):
-    db_livro = db.query(LivroDB).filter(LivroDB.id == id_livro).first()
-    if not db_livro:
-        raise HTTPException(status_code=404, detail="Esse livro não foi encontrado no banco de dados.")
-    
-    db_livro.nome_livro = livro.nome_livro
-    db_livro.autor_livro = livro.autor_livro
-    db_livro.ano_livro = livro.ano_livro
-    db.commit()
-    db.refresh(db_livro)
+    def atualizar(db):
+        db_livro = db.query(LivroDB).filter(LivroDB.id == id_livro).first()
+        if not db_livro:
+            raise HTTPException(status_code=404, detail="Esse livro não foi encontrado no banco de dados.")
+        
+        db_livro.nome_livro = livro.nome_livro
+        db_livro.autor_livro = livro.autor_livro
+        db_livro.ano_livro = livro.ano_livro
+        # (nome_livro, autor_livro) de outro livro: o índice único recusa
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Esse livro já existe no banco de dados!!!")
+
+    await banco.no_banco(db, atualizar, em_thread=True)
 
     await deletar_livros_redis()
 
@@ -194,13 +494,17 @@ async def put_livros(id_livro: int, livro: Livro, db: Session = Depends(sessao_d
 # DELETE - Deletar livros
 @app.delete("/livros/{id_livro}")
 async def delete_livro(id_livro: int, db: Session = Depends(sessao_db), HTTPBasicCredentials = Depends(autenticar_usuario)):
-    db_livro = db.query(LivroDB).filter(LivroDB.id == id_livro).first()
+    def remover(db):
+        db_livro = db.query(LivroDB).filter(LivroDB.id == id_livro).first()
 
-    if not db_livro:
-        raise HTTPException(status_code=404, detail="Este livro não foi encontrado no seu banco de dados.")
-    
-    db.delete(db_livro)
-    db.commit()
+        if not db_livro:
+            raise HTTPException(status_code=404, detail="Este livro não foi encontrado no seu banco de dados.")
+        
+        db.delete(db_livro)
+        contadores.ajustar(db, LivroDB, -1)
+        db.commit()
+
+    await banco.no_banco(db, remover, em_thread=True)
 
     await deletar_livros_redis()
 
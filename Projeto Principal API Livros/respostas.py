@@ -0,0 +1,131 @@
+# Respostas JSON a partir de bytes já serializados (sem passar pelo
+# jsonable_encoder), com GET condicional (ETag/If-None-Match e
+# Last-Modified/If-Modified-Since -> 304) e compressão negociada pelo
+# Accept-Encoding (brotli, se instalado, ou gzip) acima de um tamanho mínimo.
+#
+# As versões comprimidas ficam guardadas no próprio Corpo, que é o que o L1
+# armazena: um cliente que repete a requisição não custa nova compressão.
+import email.utils
+import gzip
+import hashlib
+import os
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Corpos menores que isto (bytes) vão sem compressão
+COMPRIMIR_ACIMA = int(os.getenv("RESPOSTA_COMPRIMIR_ACIMA", 1024))
+NIVEL_GZIP = int(os.getenv("RESPOSTA_NIVEL_GZIP", 6))
+NIVEL_BROTLI = int(os.getenv("RESPOSTA_NIVEL_BROTLI", 5))
+
+
+class Corpo:
+    __slots__ = ("conteudo", "etag", "modificado_em", "_comprimidos")
+
+    def __init__(self, conteudo: bytes, etag: str, modificado_em: float = None):
+        self.conteudo = conteudo
+        self.etag = etag
+        self.modificado_em = modificado_em
+        self._comprimidos = {}
+
+    def comprimido(self, codificacao: str) -> bytes:
+        dados = self._comprimidos.get(codificacao)
+        if dados is None:
+            dados = self._comprimidos[codificacao] = _comprimir(self.conteudo, codificacao)
+        return dados
+
+
+def etag(conteudo: bytes) -> str:
+    return '"' + hashlib.blake2b(conteudo, digest_size=8).hexdigest() + '"'
+
+
+# `modificado_em`: instante (epoch) em que o conteúdo foi gerado, para o Last-Modified
+def corpo(conteudo: bytes, modificado_em: float = None) -> Corpo:
+    return Corpo(conteudo, etag(conteudo), modificado_em)
+
+
+def _comprimir(dados: bytes, codificacao: str) -> bytes:
+    if codificacao == "br":
+        return brotli.compress(dados, quality=NIVEL_BROTLI)
+    return gzip.compress(dados, NIVEL_GZIP, mtime=0)
+
+
+def _qualidade(parametros: str) -> float:
+    for parametro in parametros.split(";"):
+        nome, _, valor = parametro.strip().partition("=")
+        if nome.strip().lower() == "q":
+            try:
+                return float(valor)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+# Escolhe a codificação pelo Accept-Encoding (maior q; no empate, brotli).
+# None quando o cliente não aceita nenhuma das disponíveis.
+def codificacao_aceita(request: Request):
+    disponiveis = ["br", "gzip"] if brotli is not None else ["gzip"]
+    qualidades = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        nome, _, parametros = item.strip().partition(";")
+        qualidades[nome.strip().lower()] = _qualidade(parametros)
+
+    escolhida, maior = None, 0.0
+    for codificacao in disponiveis:
+        q = qualidades.get(codificacao, qualidades.get("*", 0.0))
+        if q > maior:
+            escolhida, maior = codificacao, q
+    return escolhida
+
+
+# A versão comprimida tem ETag própria ("...-gzip"); na comparação vale a base
+def _etag_base(valor: str) -> str:
+    valor = valor.removeprefix("W/")
+    for sufixo in ('-gzip"', '-br"'):
+        if valor.endswith(sufixo):
+            return valor[:-len(sufixo)] + '"'
+    return valor
+
+
+# If-None-Match pode trazer várias ETags, fracas (W/"...") ou "*"
+def etag_confere(request: Request, valor: str) -> bool:
+    cabecalho = request.headers.get("if-none-match")
+    if not cabecalho:
+        return False
+    for item in cabecalho.split(","):
+        item = item.strip()
+        if item == "*" or _etag_base(item) == valor:
+            return True
+    return False
+
+
+def nao_modificado(request: Request, corpo: Corpo) -> bool:
+    # Com If-None-Match o If-Modified-Since é ignorado (RFC 9110)
+    if "if-none-match" in request.headers:
+        return etag_confere(request, corpo.etag)
+    desde = request.headers.get("if-modified-since")
+    if not desde or corpo.modificado_em is None:
+        return False
+    try:
+        return int(corpo.modificado_em) <= email.utils.parsedate_to_datetime(desde).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def responder(request: Request, corpo: Corpo) -> Response:
+    codificacao = codificacao_aceita(request) if len(corpo.conteudo) >= COMPRIMIR_ACIMA else None
+    etag_resposta = corpo.etag[:-1] + "-" + codificacao + '"' if codificacao else corpo.etag
+    headers = {"ETag": etag_resposta, "Vary": "Accept-Encoding"}
+    if corpo.modificado_em is not None:
+        headers["Last-Modified"] = email.utils.formatdate(corpo.modificado_em, usegmt=True)
+    if nao_modificado(request, corpo):
+        return Response(status_code=304, headers=headers)
+
+    if codificacao:
+        headers["Content-Encoding"] = codificacao
+        return Response(content=corpo.comprimido(codificacao), media_type="application/json", headers=headers)
+    return Response(content=corpo.conteudo, media_type="application/json", headers=headers)
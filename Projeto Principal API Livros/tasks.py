@@ -1,6 +1,6 @@
 from celery_app import celery_app
 import time
-import math
+import calculos
 
 @celery_app.task(bind=True)
 def calcular_soma(self, a: int, b: int):
@@ -10,8 +10,9 @@ def calcular_soma(self, a: int, b: int):
 
 @celery_app.task(bind=True)
 def calcular_fatorial(self, a: int):
-    if a < 0:
+    if not 0 <= a <= calculos.FATORIAL_MAX:
         return "Valor inválido"
     time.sleep(3)
-    return math.factorial(a)
+    # Resultados grandes ficam no Redis do backend, ao lado do resumo
+    return calculos.fatorial(a, calculos.redis_resultados(self.app), self.app.conf.result_expires)
 
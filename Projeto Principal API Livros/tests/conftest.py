@@ -0,0 +1,165 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# livrosapi cria o schema e lê as credenciais na importação
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/livros.db")
+os.environ.setdefault("MEU_USUARIO", "usuario")
+os.environ.setdefault("MINHA_SENHA", "senha")
+os.environ.setdefault("AUTH_SEGREDO", "segredo-dos-testes")
+
+import banco
+import cache
+import livrosapi
+import migracoes
+
+AUTH = (os.environ["MEU_USUARIO"], os.environ["MINHA_SENHA"])
+
+
+# Redis em memória com o subconjunto de comandos usado pela aplicação
+class RedisFake:
+    def __init__(self):
+        self.dados = {}
+        self.expira = {}
+        self.publicadas = []
+
+    def _vivo(self, chave):
+        if chave in self.expira and self.expira[chave] <= time.monotonic():
+            self.dados.pop(chave, None)
+            self.expira.pop(chave, None)
+        return chave in self.dados
+
+    def get(self, chave):
+        return self.dados[chave] if self._vivo(chave) else None
+
+    def set(self, chave, valor, ex=None, nx=False):
+        if nx and self._vivo(chave):
+            return None
+        self.dados[chave] = valor if isinstance(valor, bytes) else str(valor).encode()
+        self.expira.pop(chave, None)
+        if ex:
+            self.expira[chave] = time.monotonic() + ex
+        return True
+
+    def setex(self, chave, ttl, valor):
+        return self.set(chave, valor, ex=ttl)
+
+    def incr(self, chave):
+        valor = int(self.get(chave) or 0) + 1
+        self.dados[chave] = str(valor).encode()
+        return valor
+
+    def exists(self, *chaves):
+        return sum(1 for chave in chaves if self._vivo(chave))
+
+    def getrange(self, chave, inicio, fim):
+        return (self.get(chave) or b"")[inicio:fim + 1]
+
+    def delete(self, *chaves):
+        return sum(1 for chave in chaves if self.dados.pop(chave, None) is not None)
+
+    def unlink(self, *chaves):
+        return self.delete(*chaves)
+
+    def scan_iter(self, match="*", count=None):
+        prefixo = match.rstrip("*")
+        return iter([chave for chave in list(self.dados) if chave.startswith(prefixo) and self._vivo(chave)])
+
+    def pipeline(self, transaction=True):
+        return PipelineFake(self)
+
+    def publish(self, canal, mensagem):
+        self.publicadas.append((canal, mensagem))
+        return 0
+
+
+# Enfileira os comandos e os executa no RedisFake em execute()
+class PipelineFake:
+    def __init__(self, redis):
+        self.redis = redis
+        self.comandos = []
+
+    def __getattr__(self, nome):
+        return lambda *args, **kwargs: self.comandos.append((nome, args, kwargs))
+
+    def execute(self, raise_on_error=True):
+        comandos, self.comandos = self.comandos, []
+        return [getattr(self.redis, nome)(*args, **kwargs) for nome, args, kwargs in comandos]
+
+
+@pytest.fixture(autouse=True)
+def limpar_cache_local():
+    cache.l1.invalidar_prefixo("")
+    yield
+
+
+@pytest.fixture
+def redis_fake(monkeypatch):
+    fake = RedisFake()
+    monkeypatch.setattr(livrosapi, "redis_client", fake)
+    monkeypatch.setattr(livrosapi, "redis_sync", fake)
+    yield fake
+
+
+# Banco SQLite em memória isolado por teste, injetado no lugar das sessões de livrosapi
+@pytest.fixture
+def sessao(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    livrosapi.Base.metadata.create_all(bind=engine)
+    migracoes.aplicar(engine, livrosapi.MIGRACOES)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def sessao_db():
+        db = Sessao()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    for dependencia in (livrosapi.sessao_db, livrosapi.sessao_leitura, livrosapi.sessao_db_sync):
+        monkeypatch.setitem(livrosapi.app.dependency_overrides, dependencia, sessao_db)
+    monkeypatch.setattr(livrosapi.contadores, "sessoes_escrita", Sessao)
+    yield Sessao
+    livrosapi.contadores.aguardar()
+
+
+# SQLite em arquivo com o perfil de banco.criar_engines (WAL, uma única conexão
+# de escrita e pool de leitura), esperando no máximo 2 s pela conexão de escrita
+@pytest.fixture
+def sessao_wal(monkeypatch, tmp_path):
+    monkeypatch.setattr(banco, "SQLITE_OTIMIZADO", True)
+    monkeypatch.setattr(banco, "SQLITE_ESPERA_ESCRITA", 2)
+    escrita, leitura = banco.criar_engines(f"sqlite:///{tmp_path}/wal.db")
+    livrosapi.Base.metadata.create_all(bind=escrita)
+    migracoes.aplicar(escrita, livrosapi.MIGRACOES)
+
+    def sessoes(engine):
+        Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def sessao_db():
+            db = Sessao()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        return Sessao, sessao_db
+
+    SessaoEscrita, sessao_escrita = sessoes(escrita)
+    _, sessao_leitura = sessoes(leitura)
+    monkeypatch.setitem(livrosapi.app.dependency_overrides, livrosapi.sessao_db, sessao_escrita)
+    for dependencia in (livrosapi.sessao_leitura, livrosapi.sessao_db_sync):
+        monkeypatch.setitem(livrosapi.app.dependency_overrides, dependencia, sessao_leitura)
+    monkeypatch.setattr(livrosapi.contadores, "sessoes_escrita", SessaoEscrita)
+    yield SessaoEscrita
+    livrosapi.contadores.aguardar()
+    escrita.dispose()
+    leitura.dispose()
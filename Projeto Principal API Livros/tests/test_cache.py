@@ -0,0 +1,88 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+
+import banco
+import cache
+import livrosapi
+from conftest import AUTH
+
+client = TestClient(livrosapi.app)
+
+
+def criar_livro(nome, autor="Autor", ano=2000):
+    return client.post("/livros", json={"nome_livro": nome, "autor_livro": autor, "ano_livro": ano}, auth=AUTH)
+
+
+def nomes(response):
+    return [livro["nome_livro"] for livro in response.json()["livros"]]
+
+
+def paginas(redis_fake):
+    return sorted(chave for chave in redis_fake.dados if chave.startswith("livros:v"))
+
+
+def test_escrita_incrementa_a_geracao(redis_fake, sessao):
+    criar_livro("A")
+    client.get("/livros", auth=AUTH)
+    assert paginas(redis_fake) == ["livros:v1:page=1&limit=10"]
+
+    criar_livro("B")
+
+    assert redis_fake.get(livrosapi.CHAVE_GERACAO_LIVROS) == b"2"
+
+
+def test_paginas_da_geracao_antiga_nao_sao_servidas(redis_fake, sessao):
+    criar_livro("A")
+    assert nomes(client.get("/livros", auth=AUTH)) == ["A"]
+
+    criar_livro("B")
+    response = client.get("/livros", auth=AUTH)
+
+    assert nomes(response) == ["A", "B"]
+    # a página antiga continua no Redis até expirar, mas fora do caminho de leitura
+    assert paginas(redis_fake) == ["livros:v1:page=1&limit=10", "livros:v2:page=1&limit=10"]
+
+
+def test_limpeza_mantem_so_a_geracao_atual(redis_fake, sessao):
+    for nome in ("A", "B", "C"):
+        criar_livro(nome)
+        client.get("/livros", auth=AUTH)
+        client.get("/livros?limit=2", auth=AUTH)
+
+    response = client.delete("/debug/redis", auth=AUTH)
+
+    assert response.json() == {"geracao": 3, "removidas": 4}
+    assert paginas(redis_fake) == ["livros:v3:page=1&limit=10", "livros:v3:page=1&limit=2"]
+    assert redis_fake.get(livrosapi.CHAVE_GERACAO_LIVROS) == b"3"
+
+
+def test_l1_ignora_valor_calculado_antes_de_uma_invalidacao():
+    l1 = cache.CacheLocal()
+    versao = l1.versao
+
+    l1.invalidar_prefixo("livros:")
+    l1.set("livros:page=1&limit=10", "antiga", versao=versao)
+    l1.set("livros:page=2&limit=10", "nova", versao=l1.versao)
+
+    assert l1.get("livros:page=1&limit=10") is None
+    assert l1.get("livros:page=2&limit=10") == "nova"
+
+
+# Uma escrita (de outro worker) entre a leitura da geração e o fim da consulta
+# não deixa a página antiga no L1
+def test_escrita_concorrente_nao_deixa_pagina_antiga_no_l1(redis_fake, sessao, monkeypatch):
+    criar_livro("A")
+    no_banco = banco.no_banco
+
+    async def consultar_e_escrever(db, funcao):
+        resultado = await no_banco(db, funcao)
+        await livrosapi.deletar_livros_redis()
+        return resultado
+
+    monkeypatch.setattr(banco, "no_banco", consultar_e_escrever)
+    response = client.get("/livros", auth=AUTH)
+
+    assert nomes(response) == ["A"]
+    assert cache.l1.get("livros:page=1&limit=10") is None
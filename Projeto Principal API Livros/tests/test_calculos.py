@@ -0,0 +1,247 @@
+import gzip
+import hashlib
+import math
+import os
+import sys
+import time
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from fastapi.testclient import TestClient
+
+import calculos
+import livrosapi
+from conftest import RedisFake
+
+client = TestClient(livrosapi.app)
+
+
+# AsyncResult com estado fixo; forget() volta para PENDING, como no backend
+class ResultadoStub:
+    def __init__(self, estado, resultado=None):
+        self.state = self.status = estado
+        self.result = resultado
+        self.esquecido = False
+
+    def forget(self):
+        self.esquecido = True
+        self.state = self.status = "PENDING"
+
+    def ready(self):
+        return self.state in ("SUCCESS", "FAILURE", "REVOKED")
+
+    def successful(self):
+        return self.state == "SUCCESS"
+
+
+# Tarefa e app do Celery sem broker: apply_async só anota o envio
+class TarefaStub:
+    name = "tasks.calcular_soma"
+
+    def __init__(self, estado="PENDING", ignore_result=False):
+        self.ignore_result = ignore_result
+        self.resultado = ResultadoStub(estado)
+        self.app = SimpleNamespace(AsyncResult=lambda task_id: self.resultado, conf=SimpleNamespace(result_expires=60))
+        self.enviadas = []
+
+    def apply_async(self, args, task_id=None):
+        self.enviadas.append((tuple(args), task_id))
+        return SimpleNamespace(id=task_id or "id-aleatorio")
+
+
+@pytest.fixture
+def redis_resultados(monkeypatch):
+    fake = RedisFake()
+    monkeypatch.setattr(calculos, "redis_resultados", lambda app: fake)
+    return fake
+
+
+def marca(task_id):
+    return f"calculo:enviada:{task_id}"
+
+
+def test_id_da_tarefa_depende_do_nome_e_dos_argumentos():
+    assert calculos.id_tarefa("tasks.calcular_soma", 1, 2) == calculos.id_tarefa("tasks.calcular_soma", 1, 2)
+    assert calculos.id_tarefa("tasks.calcular_soma", 1, 2) != calculos.id_tarefa("tasks.calcular_soma", 2, 1)
+    assert calculos.id_tarefa("tasks.calcular_soma", 1, 2).startswith("calcular_soma-")
+
+
+@pytest.mark.parametrize("estado", ["SUCCESS", "STARTED"])
+def test_resultado_existente_ou_rodando_nao_enfileira(redis_resultados, estado):
+    tarefa = TarefaStub(estado)
+
+    task_id, existente = calculos.enviar(tarefa, 1, 2)
+
+    assert (task_id, existente) == (calculos.id_tarefa(tarefa.name, 1, 2), True)
+    assert tarefa.enviadas == []
+    assert redis_resultados.get(marca(task_id)) is None
+
+
+def test_pedido_igual_na_fila_nao_enfileira_de_novo(redis_resultados):
+    tarefa = TarefaStub("PENDING")
+
+    primeiro = calculos.enviar(tarefa, 1, 2)
+    segundo = calculos.enviar(tarefa, 1, 2)
+
+    task_id = primeiro[0]
+    assert primeiro == (task_id, False)
+    assert segundo == (task_id, True)
+    assert tarefa.enviadas == [((1, 2), task_id)]
+    assert redis_resultados.get(marca(task_id)) == b"1"
+    assert 0 < redis_resultados.expira[marca(task_id)] - time.monotonic() <= 60
+
+
+@pytest.mark.parametrize("estado", ["FAILURE", "REVOKED"])
+def test_falha_ou_revogada_e_esquecida_e_enviada_de_novo(redis_resultados, estado):
+    tarefa = TarefaStub(estado)
+    task_id = calculos.id_tarefa(tarefa.name, 1, 2)
+    # marca deixada pelo envio que falhou
+    redis_resultados.set(marca(task_id), 1, ex=60)
+
+    assert calculos.enviar(tarefa, 1, 2) == (task_id, False)
+    assert tarefa.resultado.esquecido
+    assert tarefa.enviadas == [((1, 2), task_id)]
+    assert redis_resultados.get(marca(task_id)) == b"1"
+
+
+def test_sem_backend_redis_enfileira_sempre(monkeypatch):
+    monkeypatch.setattr(calculos, "redis_resultados", lambda app: None)
+    tarefa = TarefaStub("PENDING")
+
+    calculos.enviar(tarefa, 1, 2)
+    calculos.enviar(tarefa, 1, 2)
+
+    assert len(tarefa.enviadas) == 2
+
+
+def test_tarefa_sem_resultado_usa_id_aleatorio(redis_resultados):
+    tarefa = TarefaStub(ignore_result=True)
+
+    assert calculos.enviar(tarefa, 1, 2) == ("id-aleatorio", False)
+    assert tarefa.enviadas == [((1, 2), None)]
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 31, 32, 33, 64, 100, 1000, 3000])
+def test_fatorial_decimal_confere_com_math_factorial(n):
+    assert int(calculos.fatorial_decimal(n)) == math.factorial(n)
+
+
+def test_fatorial_pequeno_volta_inteiro():
+    redis = RedisFake()
+
+    assert calculos.fatorial(20, redis, 60) == math.factorial(20)
+    assert redis.dados == {}
+
+
+def test_fatorial_grande_grava_gzip_e_devolve_resumo(monkeypatch):
+    monkeypatch.setattr(calculos, "DIGITOS_INLINE", 10)
+    monkeypatch.setattr(calculos, "DIGITOS_RESUMO", 5)
+    redis = RedisFake()
+    digitos = str(math.factorial(30))
+
+    resumo = calculos.fatorial(30, redis, 60)
+
+    assert resumo == {
+        "digitos": len(digitos),
+        "inicio": digitos[:5],
+        "fim": digitos[-5:],
+        "zeros_finais": 7,
+        "sha256": hashlib.sha256(digitos.encode()).hexdigest(),
+        "chave": "calculo:fatorial:30",
+    }
+    assert calculos.grande(resumo)
+    assert gzip.decompress(redis.get("calculo:fatorial:30")).decode() == digitos
+    assert "calculo:fatorial:30" in redis.expira
+
+
+# Backend de resultados que não é o Redis: só o resumo, sem chave para download
+def test_fatorial_grande_sem_redis_devolve_so_o_resumo(monkeypatch):
+    monkeypatch.setattr(calculos, "DIGITOS_INLINE", 10)
+    digitos = str(math.factorial(30))
+
+    resumo = calculos.fatorial(30, None, 60)
+
+    assert resumo["digitos"] == len(digitos)
+    assert resumo["sha256"] == hashlib.sha256(digitos.encode()).hexdigest()
+    assert "chave" not in resumo
+    assert calculos.resumido(resumo) and not calculos.grande(resumo)
+
+
+@pytest.mark.parametrize("tamanho", [1, 7, 64 * 1024])
+def test_ler_em_partes(monkeypatch, tamanho):
+    monkeypatch.setattr(calculos, "TAMANHO_PARTE", tamanho)
+    monkeypatch.setattr(calculos, "DIGITOS_INLINE", 10)
+    redis = RedisFake()
+    calculos.fatorial(200, redis, 60)
+    armazenado = redis.get("calculo:fatorial:200")
+
+    assert b"".join(calculos.ler_em_partes(redis, "calculo:fatorial:200")).decode() == str(math.factorial(200))
+    assert b"".join(calculos.ler_em_partes(redis, "calculo:fatorial:200", descomprimir=False)) == armazenado
+    assert b"".join(calculos.ler_em_partes(redis, "calculo:inexistente")) == b""
+
+
+# Resultado do backend simulado: GET /tasks/{id} e /tasks/{id}/resultado leem
+# o estado por AsyncResult e o número grande do Redis de resultados
+@pytest.fixture
+def resultado_da_tarefa(monkeypatch, redis_resultados):
+    resultados = {}
+    monkeypatch.setattr(livrosapi, "AsyncResult", lambda task_id, app: resultados.get(task_id, ResultadoStub("PENDING")))
+    return resultados
+
+
+def test_download_do_resultado_pequeno(resultado_da_tarefa):
+    resultado_da_tarefa["t1"] = ResultadoStub("SUCCESS", 120)
+
+    response = client.get("/tasks/t1/resultado")
+
+    assert response.status_code == 200
+    assert response.text == "120"
+
+
+def test_download_do_resultado_grande(monkeypatch, resultado_da_tarefa, redis_resultados):
+    monkeypatch.setattr(calculos, "DIGITOS_INLINE", 10)
+    monkeypatch.setattr(calculos, "TAMANHO_PARTE", 16)
+    resumo = calculos.fatorial(300, redis_resultados, 60)
+    resultado_da_tarefa["t1"] = ResultadoStub("SUCCESS", resumo)
+
+    status = client.get("/tasks/t1").json()
+    com_gzip = client.get("/tasks/t1/resultado", headers={"Accept-Encoding": "gzip"})
+    sem_gzip = client.get("/tasks/t1/resultado", headers={"Accept-Encoding": "identity"})
+
+    assert status["result"]["download"] == "/tasks/t1/resultado"
+    assert "chave" not in status["result"]
+    assert com_gzip.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in sem_gzip.headers
+    for response in (com_gzip, sem_gzip):
+        assert response.text == str(math.factorial(300))
+        assert response.headers["etag"] == f'"{resumo["sha256"]}"'
+
+
+def test_download_indisponivel(monkeypatch, resultado_da_tarefa, redis_resultados):
+    monkeypatch.setattr(calculos, "DIGITOS_INLINE", 10)
+    resultado_da_tarefa["rodando"] = ResultadoStub("STARTED")
+    resultado_da_tarefa["expirado"] = ResultadoStub("SUCCESS", calculos.fatorial(30, redis_resultados, 60))
+    redis_resultados.delete("calculo:fatorial:30")
+
+    assert client.get("/tasks/rodando/resultado").status_code == 404
+    assert client.get("/tasks/desconhecida/resultado").status_code == 404
+    response = client.get("/tasks/expirado/resultado")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Resultado expirado."
+
+
+def test_resumo_sem_redis_nao_tem_download(monkeypatch, resultado_da_tarefa):
+    monkeypatch.setattr(calculos, "DIGITOS_INLINE", 10)
+    resultado_da_tarefa["t1"] = ResultadoStub("SUCCESS", calculos.fatorial(30, None, 60))
+
+    status = client.get("/tasks/t1").json()
+    response = client.get("/tasks/t1/resultado")
+
+    assert status["result"]["digitos"] == 33
+    assert "download" not in status["result"]
+    assert response.status_code == 404
+
+
+def test_fatorial_fora_do_limite_e_recusado():
+    assert client.post(f"/calcular/fatorial?a={calculos.FATORIAL_MAX + 1}").status_code == 400
+    assert client.post("/calcular/fatorial?a=-1").status_code == 400
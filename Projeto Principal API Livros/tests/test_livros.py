@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx
+from fastapi.testclient import TestClient
+
+import livrosapi
+from conftest import AUTH
+
+client = TestClient(livrosapi.app)
+
+
+def criar(sessao, *livros):
+    with sessao() as db:
+        for nome, autor in livros:
+            db.add(livrosapi.LivroDB(nome_livro=nome, autor_livro=autor, ano_livro=2000))
+        db.commit()
+
+
+def livros(sessao):
+    with sessao() as db:
+        return sorted((livro.id, livro.nome_livro, livro.autor_livro, livro.ano_livro) for livro in db.query(livrosapi.LivroDB))
+
+
+def test_atualizacao_que_colide_com_outro_livro(redis_fake, sessao):
+    criar(sessao, ("Dom Casmurro", "Machado de Assis"), ("Iracema", "José de Alencar"))
+
+    response = client.put("/livros/2", json={"nome_livro": "Dom Casmurro", "autor_livro": "Machado de Assis", "ano_livro": 1899}, auth=AUTH)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Esse livro já existe no banco de dados!!!"
+    assert livros(sessao)[1] == (2, "Iracema", "José de Alencar", 2000)
+
+
+def test_atualizacao_em_lote_marca_so_o_item_que_colide(redis_fake, sessao):
+    criar(sessao, ("Dom Casmurro", "Machado de Assis"), ("Iracema", "José de Alencar"))
+
+    response = client.put("/livros/lote", json=[
+        {"id": 2, "nome_livro": "Dom Casmurro", "autor_livro": "Machado de Assis", "ano_livro": 1899},
+        {"id": 1, "nome_livro": "Dom Casmurro", "autor_livro": "Machado de Assis", "ano_livro": 1899},
+        {"id": 9, "nome_livro": "Helena", "autor_livro": "Machado de Assis", "ano_livro": 1876},
+    ], auth=AUTH).json()
+
+    assert [r["status"] for r in response["resultados"]] == ["duplicado", "atualizado", "nao_encontrado"]
+    assert livros(sessao) == [(1, "Dom Casmurro", "Machado de Assis", 1899), (2, "Iracema", "José de Alencar", 2000)]
+
+
+# Com uma única conexão de escrita, escritas concorrentes fazem fila no pool
+# sem travar o event loop
+def test_escritas_concorrentes_com_uma_conexao_de_escrita(redis_fake, sessao_wal):
+    async def enviar():
+        transporte = httpx.ASGITransport(app=livrosapi.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste", auth=AUTH) as cliente:
+            criados = await asyncio.gather(*(cliente.post("/livros", json={"nome_livro": f"L{i}", "autor_livro": "A", "ano_livro": 2000}) for i in range(6)))
+            atualizados = await asyncio.gather(*(cliente.put(f"/livros/{id}", json={"nome_livro": f"M{id}", "autor_livro": "A", "ano_livro": 2001}) for id in (1, 2, 3)))
+            return criados, atualizados
+
+    criados, atualizados = asyncio.run(enviar())
+
+    assert [r.status_code for r in criados] == [201] * 6
+    assert [r.status_code for r in atualizados] == [200] * 3
+    # a ordem de inserção entre os POSTs concorrentes varia
+    assert [nome for _, nome, _, _ in livros(sessao_wal)][:3] == ["M1", "M2", "M3"]
+    assert len(livros(sessao_wal)) == 6
@@ -1,12 +1,24 @@
 # Importação da aplicação para criar APIs "FastAPI" , Pydantic e security para implementar configurações de autenticação de usuários
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials, HTTPBearer
 from pydantic import BaseModel
 from typing import Optional
 import os
+import json
+import time
+import autenticacao
+import banco
+import keyset
+import lote
+import migracoes
+import exportacao
+import filtros
+import respostas
+from contadores import Contadores
 
 # Importação do banco de dados SQLalchemy
-from sqlalchemy import create_engine, Column, Integer, String, Boolean
+from sqlalchemy import Column, Float, Index, Integer, String, Boolean, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
@@ -19,22 +31,46 @@ app = FastAPI(
         "name": "Eduardo Drago",
         "email": "eduardondrago05@gmail.com"
     })
-security = HTTPBasic()
+# Sem auto_error: a dependência aceita Basic ou Bearer e responde o 401
+security = HTTPBasic(auto_error=False)
+bearer = HTTPBearer(auto_error=False)
+# Credenciais lidas uma vez, na inicialização
+autenticador = autenticacao.Autenticador.do_ambiente("login", "senha")
 # Inicialização da lista principal
 
 # Inicialização do Banco de Dados
 database_url = os.getenv("database_url")
-engine = create_engine(database_url, connect_args={"check_same_thread": False})
+# `engine` é o de escrita; com SQLite em arquivo as leituras usam um pool separado (ver banco.py)
+engine, engine_leitura = banco.criar_engines(database_url, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessaoLeitura = sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura)
 Base = declarative_base()
+# O contador é reconciliado pela sessão de escrita, nunca pela de leitura
+contadores = Contadores(Base.metadata, SessionLocal)
 
 # Criação da tabela do banco de dados
 class TarefaDB(Base):
     __tablename__ = "Tarefas"
-    id = Column(Integer, primary_key=True, index=True)
-    nome = Column(String, index=True)
-    descricao = Column(String, index=True)
-    concluida = Column(Boolean, index=True)
+    # (nome, descricao) é a chave de duplicidade; com nome na frente, o mesmo
+    # índice único atende as buscas por nome de /concluir e /deletar
+    __table_args__ = (Index("ux_tarefas_nome_descricao", "nome", "descricao", unique=True),)
+    id = Column(Integer, primary_key=True)
+    nome = Column(String)
+    descricao = Column(String)
+    concluida = Column(Boolean)
+
+# Instante da última escrita em Tarefas: é o Last-Modified de GET /tarefas
+class UltimaEscritaDB(Base):
+    __tablename__ = "ultima_escrita"
+    tabela = Column(String, primary_key=True)
+    modificado_em = Column(Float, nullable=False)
+
+# Deve ser chamado antes do commit da escrita, na mesma sessão
+def marcar_escrita(db):
+    db.execute(update(UltimaEscritaDB).where(UltimaEscritaDB.tabela == TarefaDB.__tablename__).values(modificado_em=time.time()))
+
+def ultima_escrita(db):
+    return db.execute(select(UltimaEscritaDB.modificado_em).where(UltimaEscritaDB.tabela == TarefaDB.__tablename__)).scalar()
 
 # Criação da classe tarefa que é o modelo de como a informação das tarefas é guardada
 class Tarefa(BaseModel):
@@ -42,7 +78,32 @@ class Tarefa(BaseModel):
     descricao: str
     concluida: Optional[bool] = False
 
+# Modelo usado para concluir tarefas em lote, identificadas pelo nome
+class ConclusaoTarefa(BaseModel):
+    nome: str
+    concluida: bool = True
+
+# Migrações do schema de bancos já existentes (ver migracoes.py); a posição na
+# lista é a versão. Não remova nem reordene: só acrescente no fim.
+def indices_por_chave_de_duplicidade(conn):
+    # nome fica coberto pelo índice único; descricao e concluida não atendiam
+    # nenhuma consulta e só pesavam nas escritas
+    migracoes.remover_indices(conn, "Tarefas", ["ix_Tarefas_id", "ix_Tarefas_nome", "ix_Tarefas_descricao", "ix_Tarefas_concluida"])
+    if migracoes.criar_indice_unico(conn, TarefaDB.__table__, "ux_tarefas_nome_descricao"):
+        contadores.invalidar(conn, TarefaDB)
+
+def busca_textual(conn):
+    filtros.criar_indice_busca(conn, TarefaDB.__table__, ["nome", "descricao"])
+
+# A linha de Tarefas já existe antes da primeira escrita: as escritas só fazem UPDATE
+def registro_da_ultima_escrita(conn):
+    if ultima_escrita(conn) is None:
+        conn.execute(insert(UltimaEscritaDB).values(tabela=TarefaDB.__tablename__, modificado_em=time.time()))
+
+MIGRACOES = [indices_por_chave_de_duplicidade, busca_textual, registro_da_ultima_escrita]
+
 Base.metadata.create_all(bind=engine)
+migracoes.aplicar(engine, MIGRACOES)
 
 def sessao_db():
     db = SessionLocal()
@@ -51,57 +112,196 @@ def sessao_db():
     finally:
         db.close()
 
-# Função que usa HTTPBasicCredentials para autenticação do usuário
-def autenticar_usuario(credentials: HTTPBasicCredentials = Depends(security)):
-    login = os.getenv("login")
-    senha = os.getenv("senha")
-    if credentials.username != login or credentials.password != senha:
-        raise HTTPException(status_code=401, detail="Acesso negado.")
-    return credentials.username
+# Sessão dos endpoints que só leem
+def sessao_leitura():
+    db = SessaoLeitura()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Com MODO_ASYNC=1 os endpoints recebem uma AsyncSession e o banco não ocupa
+# threads do threadpool; no modo síncrono as consultas continuam no threadpool.
+# A exportação em streaming continua com a sessão síncrona.
+sessao_db_sync = sessao_leitura
+
+if banco.MODO_ASYNC:
+    engine_async, SessaoAsync = banco.criar_sessao_async(database_url)
+
+    async def sessao_db():
+        async with SessaoAsync() as db:
+            yield db
+
+    sessao_leitura = sessao_db
+
+    @app.on_event("shutdown")
+    async def shutdown_banco_async():
+        await engine_async.dispose()
+
+# Autenticação por usuário e senha (HTTP Basic) ou por token (Authorization: Bearer)
+def autenticar_usuario(credentials: HTTPBasicCredentials = Depends(security), token: HTTPAuthorizationCredentials = Depends(bearer)):
+    usuario = autenticador.autenticar(credentials, token)
+    if usuario is None:
+        raise HTTPException(status_code=401, detail="Acesso negado.", headers={"WWW-Authenticate": "Basic"})
+    return usuario
+
+# Troca usuário e senha por um token: a senha é verificada uma vez por sessão
+@app.post("/token")
+def emitir_token(credentials: HTTPBasicCredentials = Depends(security)):
+    usuario = autenticador.autenticar(credentials)
+    if usuario is None:
+        raise HTTPException(status_code=401, detail="Acesso negado.", headers={"WWW-Authenticate": "Basic"})
+    return {"access_token": autenticador.emitir_token(usuario), "token_type": "bearer", "expires_in": autenticador.token_ttl}
+
+# Campos aceitos em ?ordenar= ("-" na frente para ordem decrescente)
+CAMPOS_ORDENACAO = {"nome": TarefaDB.nome}
 
 # Endpoint que acessa todas as tarefas
+# Filtros: concluida, nome (prefixo), q (busca textual em nome e descrição) e ordenar
 @app.get("/tarefas")
-def get_tarefas(page: int = 1, limit: int = 10, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
+async def get_tarefas(request: Request, page: int = 1, limit: int = 10, cursor: Optional[str] = None, incluir_total: bool = True, concluida: Optional[bool] = None, nome: Optional[str] = None, q: Optional[str] = None, ordenar: Optional[str] = None, db: Session = Depends(sessao_leitura), credentials: HTTPBasic = Depends(autenticar_usuario)):
     if page < 1 or limit < 1:
         raise HTTPException(status_code=400, detail="Página ou limite com valores inválidos.")
-    tarefa_db = db.query(TarefaDB).offset((page - 1) * limit).limit(limit).all()
-    if not tarefa_db:
-        return {"message": "Não existe nenhuma tarefa."}
+    ordem = filtros.ordenacao(ordenar, CAMPOS_ORDENACAO, TarefaDB.id)
+    if cursor and ordem:
+        raise HTTPException(status_code=400, detail="A paginação por cursor só aceita a ordenação padrão (id).")
+
+    def consultar(db):
+        query = db.query(TarefaDB)
+        if concluida is not None:
+            query = query.filter(TarefaDB.concluida == concluida)
+        if nome:
+            query = query.filter(filtros.prefixo(TarefaDB.nome, nome))
+        if q:
+            query = filtros.buscar(query, TarefaDB, ["nome", "descricao"], q)
+
+        # Com cursor, a página é lida por keyset (id > último), sem OFFSET
+        if cursor:
+            tarefa_db, next_cursor, prev_cursor = keyset.paginar_por_cursor(query, TarefaDB.id, cursor, limit)
+        else:
+            tarefa_db = query.order_by(*(ordem or [TarefaDB.id])).offset((page - 1) * limit).limit(limit).all()
+            # com outra ordenação os cursores (por id) não valem
+            next_cursor, prev_cursor = (None, None) if ordem else keyset.cursores_da_pagina(tarefa_db, TarefaDB.id, page, limit)
+        modificado_em = ultima_escrita(db)
+        if not tarefa_db:
+            return {"message": "Não existe nenhuma tarefa."}, modificado_em
 
-    total_tarefas = db.query(TarefaDB).count()
+        # Total mantido na tabela de contadores (sem COUNT(*) por requisição);
+        # com filtro, o contador não vale e a consulta é contada
+        if not incluir_total:
+            total_tarefas = None
+        elif concluida is not None or nome or q:
+            total_tarefas = query.count()
+        else:
+            total_tarefas = contadores.total(db, TarefaDB)
 
-    return {
-        "Page": page,
-        "Limit": limit,
-        "Total": total_tarefas,
-        "Tarefas": [{"Id": tarefa.id, "Nome": tarefa.nome, "Descrição": tarefa.descricao, "Concluída": tarefa.concluida} for tarefa in tarefa_db]
-    } 
+        return {
+            "Page": None if cursor else page,
+            "Limit": limit,
+            "Total": total_tarefas,
+            "Next_cursor": next_cursor,
+            "Prev_cursor": prev_cursor,
+            "Tarefas": [{"Id": tarefa.id, "Nome": tarefa.nome, "Descrição": tarefa.descricao, "Concluída": tarefa.concluida} for tarefa in tarefa_db]
+        }, modificado_em
+
+    resposta, modificado_em = await banco.no_banco(db, consultar, em_thread=True)
+    # Sem cache aqui, a ETag vem do conteúdo e o Last-Modified da última
+    # escrita: a página ainda é consultada, mas um cliente que já a tem recebe
+    # 304 sem corpo. O Last-Modified tem resolução de segundos; com uma escrita
+    # no segundo atual ele é omitido, para outra no mesmo segundo não passar
+    # despercebida pelo If-Modified-Since.
+    if modificado_em is not None and time.time() - modificado_em < 1:
+        modificado_em = None
+    conteudo = json.dumps(resposta, ensure_ascii=False, separators=(",", ":")).encode()
+    return respostas.responder(request, respostas.corpo(conteudo, modificado_em))
 
         
+# Exporta todas as tarefas em streaming (NDJSON ou CSV, com gzip se o cliente aceitar)
+@app.get("/tarefas/exportar")
+def exportar_tarefas(request: Request, formato: str = "ndjson", db: Session = Depends(sessao_db_sync), credentials: HTTPBasic = Depends(autenticar_usuario)):
+    return exportacao.exportar(request, db, TarefaDB, ["id", "nome", "descricao", "concluida"], formato, "tarefas")
+
 # Endpoint para adicionar novas tarefas
 @app.post("/adicionar")
-def post_tarefas(tarefa: Tarefa, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
-    tarefa_db = db.query(TarefaDB).filter(TarefaDB.nome == tarefa.nome, TarefaDB.descricao == tarefa.descricao).first()
-    if tarefa_db:
-        raise HTTPException(status_code=400, detail="Essa tarefa já existe.")
-    
-    nova_tarefa = TarefaDB(nome = tarefa.nome, descricao = tarefa.descricao, concluida = tarefa.concluida)
-    db.add(nova_tarefa)
-    db.commit()
-    db.refresh(nova_tarefa)
+async def post_tarefas(tarefa: Tarefa, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
+    def inserir(db):
+        nova_tarefa = TarefaDB(nome = tarefa.nome, descricao = tarefa.descricao, concluida = tarefa.concluida)
+        db.add(nova_tarefa)
+        # Sem consulta prévia: o índice único de (nome, descricao) recusa o duplicado
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Essa tarefa já existe.")
+        contadores.ajustar(db, TarefaDB, +1)
+        marcar_escrita(db)
+        db.commit()
+        db.refresh(nova_tarefa)
+
+    await banco.no_banco(db, inserir, em_thread=True)
 
     return {"message": "Tarefa criada com sucesso!"}
 
+# Endpoints em lote: recebem um array JSON ou NDJSON (Content-Type: application/x-ndjson)
+# e retornam o resultado de cada item
+@app.post("/tarefas/lote")
+async def post_tarefas_lote(request: Request, atualizar_existentes: bool = False, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
+    validos, resultados = await lote.ler_lote(request, Tarefa)
+    itens = [(indice, tarefa.model_dump()) for indice, tarefa in validos]
+
+    def gravar(db):
+        gravados = lote.criar_em_lote(db, TarefaDB, [TarefaDB.nome, TarefaDB.descricao], itens, atualizar_existentes, contadores)
+        marcar_escrita(db)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+
+    return lote.resumir(resultados)
+
+@app.put("/tarefas/lote")
+async def put_tarefas_lote(request: Request, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
+    validos, resultados = await lote.ler_lote(request, ConclusaoTarefa)
+    itens = [(indice, conclusao.nome, {"concluida": conclusao.concluida}) for indice, conclusao in validos]
+
+    def gravar(db):
+        gravados = lote.atualizar_em_lote(db, TarefaDB, TarefaDB.nome, itens)
+        marcar_escrita(db)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+
+    return lote.resumir(resultados)
+
+@app.delete("/tarefas/lote")
+async def delete_tarefas_lote(request: Request, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
+    validos, resultados = await lote.ler_lote(request, str)
+
+    def gravar(db):
+        gravados = lote.remover_em_lote(db, TarefaDB, TarefaDB.nome, validos, contadores)
+        marcar_escrita(db)
+        db.commit()
+        return gravados
+
+    resultados += await banco.no_banco(db, gravar, em_thread=True)
+
+    return lote.resumir(resultados)
+
 # Endpoint que checa e atualiza tarefas já existentes
 @app.put("/concluir/{nome}")
-def put_tarefas(nome: str, concluida: bool = True, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
-    tarefa_db = db.query(TarefaDB).filter(TarefaDB.nome == nome).first()
-    if not tarefa_db:
-        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
-    
-    tarefa_db.concluida = concluida
-    db.commit()
-    db.refresh(tarefa_db)
+async def put_tarefas(nome: str, concluida: bool = True, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
+    def concluir(db):
+        tarefa_db = db.query(TarefaDB).filter(TarefaDB.nome == nome).first()
+        if not tarefa_db:
+            raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+        
+        tarefa_db.concluida = concluida
+        marcar_escrita(db)
+        db.commit()
+        db.refresh(tarefa_db)
+
+    await banco.no_banco(db, concluir, em_thread=True)
 
     return {"message": "A tarefa foi concluida com sucesso!"}
     
@@ -109,14 +309,19 @@ def put_tarefas(nome: str, concluida: bool = True, db: Session = Depends(sessao_
 
 # Endpoint que deleta tarefas já existentes 
 @app.delete("/deletar/{nome}")
-def delete_tarefas(nome: str, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
-    tarefa_db = db.query(TarefaDB).filter(TarefaDB.nome == nome).first()
+async def delete_tarefas(nome: str, db: Session = Depends(sessao_db), credentials: HTTPBasic = Depends(autenticar_usuario)):
+    def remover(db):
+        tarefa_db = db.query(TarefaDB).filter(TarefaDB.nome == nome).first()
 
-    if not tarefa_db:
-        raise HTTPException(status_code=404, detail="Tarefa não encontrada.")
-    
-    db.delete(tarefa_db)
-    db.commit()
+        if not tarefa_db:
+            raise HTTPException(status_code=404, detail="Tarefa não encontrada.")
+        
+        db.delete(tarefa_db)
+        contadores.ajustar(db, TarefaDB, -1)
+        marcar_escrita(db)
+        db.commit()
+
+    await banco.no_banco(db, remover, em_thread=True)
     
     return {"message": "Sua tarefa foi deletada com sucesso!"}
 
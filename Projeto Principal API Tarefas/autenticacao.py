@@ -0,0 +1,145 @@
+# Autenticação com as credenciais carregadas uma vez na inicialização (e não
+# a cada requisição), comparação em tempo constante e senhas guardadas como
+# hash PBKDF2 (gere com `python autenticacao.py <senha>`).
+#
+# Verificar um hash é caro de propósito, então as credenciais já verificadas
+# ficam num cache local limitado, com TTL, indexado por um HMAC das
+# credenciais (a senha em claro nunca é guardada). Clientes que fazem muitas
+# requisições podem trocar usuário e senha por um token assinado (POST /token):
+# o hash é verificado uma vez por sessão e o token só custa um HMAC.
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+ITERACOES = int(os.getenv("AUTH_PBKDF2_ITERACOES", 200_000))
+CACHE_TAMANHO = int(os.getenv("AUTH_CACHE_TAMANHO", 1024))
+CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 300))
+TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", 3600))
+PREFIXO_HASH = "pbkdf2_sha256$"
+
+
+def gerar_hash(senha: str, iteracoes: int = ITERACOES, sal: str = None) -> str:
+    sal = sal or secrets.token_hex(16)
+    chave = hashlib.pbkdf2_hmac("sha256", senha.encode(), sal.encode(), iteracoes)
+    return f"{PREFIXO_HASH}{iteracoes}${sal}${chave.hex()}"
+
+
+# Aceita também a senha em claro (configuração antiga, sem o prefixo do hash)
+def verificar_hash(senha: str, armazenado: str) -> bool:
+    if not armazenado.startswith(PREFIXO_HASH):
+        return hmac.compare_digest(senha.encode(), armazenado.encode())
+    iteracoes, sal, esperado = armazenado[len(PREFIXO_HASH):].split("$")
+    chave = hashlib.pbkdf2_hmac("sha256", senha.encode(), sal.encode(), int(iteracoes))
+    return hmac.compare_digest(chave.hex(), esperado)
+
+
+def _b64(dados: bytes) -> str:
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+
+
+def _de_b64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+class Autenticador:
+    # `usuarios`: usuário -> hash da senha (ou a senha em claro). `segredo`
+    # assina os tokens e as chaves do cache; sem ele, um aleatório por processo.
+    def __init__(self, usuarios: dict, segredo: str = None, cache_tamanho: int = CACHE_TAMANHO, cache_ttl: float = CACHE_TTL, token_ttl: int = TOKEN_TTL):
+        self.usuarios = dict(usuarios)
+        self.token_ttl = token_ttl
+        self.cache_tamanho = cache_tamanho
+        self.cache_ttl = cache_ttl
+        self._segredo = (segredo or secrets.token_hex(32)).encode()
+        self._verificadas = OrderedDict()
+        self._lock = threading.Lock()
+        # Usuários inexistentes também pagam um hash, para o tempo de resposta
+        # não revelar quais usuários existem
+        self._hash_falso = gerar_hash(secrets.token_hex(16))
+
+    @classmethod
+    def do_ambiente(cls, variavel_usuario: str, variavel_senha: str):
+        usuario = os.getenv(variavel_usuario)
+        senha = os.getenv(variavel_senha)
+        segredo = os.getenv("AUTH_SEGREDO")
+        if not segredo:
+            logging.warning("AUTH_SEGREDO não definido: os tokens só valem neste processo.")
+        return cls({usuario: senha} if usuario and senha else {}, segredo)
+
+    def _chave(self, usuario: str, senha: str) -> bytes:
+        return hmac.new(self._segredo, f"{len(usuario)}:{usuario}{senha}".encode(), hashlib.sha256).digest()
+
+    def _em_cache(self, chave: bytes) -> bool:
+        with self._lock:
+            expira_em = self._verificadas.get(chave)
+            if expira_em is None:
+                return False
+            if expira_em <= time.monotonic():
+                del self._verificadas[chave]
+                return False
+            self._verificadas.move_to_end(chave)
+            return True
+
+    def _guardar(self, chave: bytes):
+        if self.cache_tamanho <= 0 or self.cache_ttl <= 0:
+            return
+        with self._lock:
+            self._verificadas[chave] = time.monotonic() + self.cache_ttl
+            self._verificadas.move_to_end(chave)
+            while len(self._verificadas) > self.cache_tamanho:
+                self._verificadas.popitem(last=False)
+
+    def limpar_cache(self):
+        with self._lock:
+            self._verificadas.clear()
+
+    # Só acertos entram no cache: uma senha errada sempre paga o hash
+    def verificar_senha(self, usuario: str, senha: str) -> bool:
+        chave = self._chave(usuario, senha)
+        if self._em_cache(chave):
+            return True
+        armazenado = self.usuarios.get(usuario)
+        valida = verificar_hash(senha, armazenado or self._hash_falso) and armazenado is not None
+        if valida:
+            self._guardar(chave)
+        return valida
+
+    # Token "<usuário>:<expira em>" em base64 + "." + HMAC-SHA256
+    def emitir_token(self, usuario: str) -> str:
+        dados = _b64(f"{usuario}:{int(time.time()) + self.token_ttl}".encode())
+        assinatura = _b64(hmac.new(self._segredo, dados.encode(), hashlib.sha256).digest())
+        return f"{dados}.{assinatura}"
+
+    # Retorna o usuário do token, ou None se for inválido ou tiver expirado
+    def validar_token(self, token: str):
+        dados, _, assinatura = token.partition(".")
+        esperada = _b64(hmac.new(self._segredo, dados.encode(), hashlib.sha256).digest())
+        if not hmac.compare_digest(assinatura.encode(), esperada.encode()):
+            return None
+        try:
+            usuario, _, expira_em = _de_b64(dados).decode().rpartition(":")
+            if int(expira_em) < time.time():
+                return None
+        except ValueError:
+            return None
+        return usuario if usuario in self.usuarios else None
+
+    # Usuário autenticado por Bearer (token) ou Basic (usuário e senha), ou None
+    def autenticar(self, basic=None, bearer=None):
+        if bearer is not None:
+            return self.validar_token(bearer.credentials)
+        if basic is not None and self.verificar_senha(basic.username, basic.password):
+            return basic.username
+        return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Uso: python autenticacao.py <senha>")
+    print(gerar_hash(sys.argv[1]))
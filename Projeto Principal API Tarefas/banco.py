@@ -0,0 +1,103 @@
+# Modo de acesso ao banco: síncrono (padrão) ou assíncrono com MODO_ASYNC=1.
+# No modo assíncrono as dependências entregam uma AsyncSession (driver
+# aiosqlite/asyncpg) e o trabalho no banco roda com run_sync, sem bloquear o
+# event loop; o código das consultas é o mesmo nos dois modos.
+#
+# Com SQLite em arquivo (e SQLITE_OTIMIZADO=1, o padrão), cada conexão abre com
+# WAL, synchronous=NORMAL, mmap, cache maior e busy_timeout, e o acesso é
+# dividido em dois engines: um pool de leitura (no WAL, leitores não esperam o
+# escritor) e um de escrita com uma única conexão, para as escritas do
+# processo esperarem a vez na fila do pool em vez de disputarem o lock do
+# arquivo e falharem com "database is locked". Entre processos (vários
+# workers), quem serializa é o busy_timeout. Por isso as escritas dos handlers
+# assíncronos rodam com no_banco(..., em_thread=True): a espera pela conexão
+# de escrita fica numa thread, e não no event loop.
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+
+MODO_ASYNC = os.getenv("MODO_ASYNC", "0").lower() in ("1", "true", "sim")
+
+SQLITE_OTIMIZADO = os.getenv("SQLITE_OTIMIZADO", "1").lower() in ("1", "true", "sim")
+PRAGMAS_SQLITE = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    # No WAL, NORMAL só arrisca a última transação numa queda de energia (não corrompe o banco)
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+    # negativo = tamanho em KiB (64 MiB por conexão)
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KIB", 64 * 1024)),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "temp_store": "MEMORY",
+}
+SQLITE_POOL_LEITURA = int(os.getenv("SQLITE_POOL_LEITURA", 8))
+# Quanto uma escrita espera pela conexão de escrita antes de falhar (segundos)
+SQLITE_ESPERA_ESCRITA = float(os.getenv("SQLITE_ESPERA_ESCRITA", 30))
+
+DRIVERS_ASYNC = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def url_async(url: str) -> str:
+    esquema, separador, resto = url.partition("://")
+    return DRIVERS_ASYNC.get(esquema, esquema) + separador + resto
+
+
+# SQLite em arquivo (":memory:" não tem WAL e cada conexão seria outro banco)
+def sqlite_em_arquivo(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:") and "mode=memory" not in str(url)
+
+
+def aplicar_pragmas(engine):
+    @event.listens_for(engine, "connect")
+    def _pragmas(conexao, _):
+        cursor = conexao.cursor()
+        for nome, valor in PRAGMAS_SQLITE.items():
+            cursor.execute(f"PRAGMA {nome}={valor}")
+        cursor.close()
+
+
+# Retorna (escrita, leitura). Fora do SQLite em arquivo (ou com
+# SQLITE_OTIMIZADO=0) é o mesmo engine nos dois papéis.
+def criar_engines(url: str, **kwargs):
+    if not (SQLITE_OTIMIZADO and sqlite_em_arquivo(url)):
+        engine = create_engine(url, **kwargs)
+        return engine, engine
+
+    kwargs["connect_args"] = {"check_same_thread": False, **kwargs.get("connect_args", {})}
+    escrita = create_engine(url, poolclass=QueuePool, pool_size=1, max_overflow=0, pool_timeout=SQLITE_ESPERA_ESCRITA, **kwargs)
+    leitura = create_engine(url, poolclass=QueuePool, pool_size=SQLITE_POOL_LEITURA, max_overflow=SQLITE_POOL_LEITURA, **kwargs)
+    aplicar_pragmas(escrita)
+    aplicar_pragmas(leitura)
+    return escrita, leitura
+
+
+# O import fica aqui dentro porque o sqlalchemy.ext.asyncio exige o greenlet,
+# que o modo síncrono não precisa. No modo assíncrono o SQLite recebe os mesmos
+# pragmas, mas num engine só (o busy_timeout serializa as escritas).
+def criar_sessao_async(url: str, **kwargs):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    engine = create_async_engine(url_async(url), **kwargs)
+    if SQLITE_OTIMIZADO and sqlite_em_arquivo(url):
+        aplicar_pragmas(engine.sync_engine)
+    return engine, async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+# Executa funcao(sessao_sincrona, *args). Com AsyncSession, via run_sync (I/O
+# assíncrono por baixo); com Session, na própria thread ou, com `em_thread`,
+# no threadpool (para handlers que antes eram síncronos).
+async def no_banco(db, funcao, *args, em_thread: bool = False):
+    if hasattr(db, "run_sync"):
+        return await db.run_sync(funcao, *args)
+    if em_thread:
+        return await run_in_threadpool(funcao, db, *args)
+    return funcao(db, *args)
+
@@ -0,0 +1,100 @@
+# Contagem de linhas mantida em tabela, para as listagens não rodarem
+# COUNT(*) a cada requisição. Inserções e remoções ajustam o contador na
+# mesma transação. Quando o contador não existe ou está mais velho que
+# CONTADOR_RECONCILIAR_SEGUNDOS, a leitura conta a tabela na própria sessão e
+# agenda a reconciliação (recontagem e gravação do contador) numa sessão de
+# escrita, numa thread à parte: requisições de leitura nunca fazem commit.
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import Column, Float, Integer, String, Table, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+RECONCILIAR_SEGUNDOS = float(os.getenv("CONTADOR_RECONCILIAR_SEGUNDOS", 300))
+
+
+class Contadores:
+    # `sessoes_escrita`: fábrica das sessões de escrita usadas na reconciliação
+    # agendada; sem ela, a leitura só conta a tabela
+    def __init__(self, metadata, sessoes_escrita=None):
+        self.tabela = Table(
+            "contadores",
+            metadata,
+            Column("tabela", String, primary_key=True),
+            Column("total", Integer, nullable=False),
+            Column("reconciliado_em", Float, nullable=False),
+        )
+        self.sessoes_escrita = sessoes_escrita
+        # Uma thread só: as reconciliações também passam pela conexão de escrita
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="contadores")
+        self._agendadas = {}
+        self._lock = threading.Lock()
+
+    # Deve ser chamado antes do commit da escrita, na mesma sessão
+    def ajustar(self, db, modelo, delta: int):
+        db.execute(
+            update(self.tabela)
+            .where(self.tabela.c.tabela == modelo.__tablename__)
+            .values(total=self.tabela.c.total + delta)
+        )
+
+    # Descarta o contador (ex.: depois de uma migração remover linhas); a
+    # próxima leitura reconta a tabela
+    def invalidar(self, conn, modelo):
+        conn.execute(delete(self.tabela).where(self.tabela.c.tabela == modelo.__tablename__))
+
+    # Reconta a tabela e grava o contador; `db` deve ser uma sessão de escrita
+    def reconciliar(self, db, modelo) -> int:
+        total = db.query(func.count()).select_from(modelo).scalar()
+        valores = {"total": total, "reconciliado_em": time.time()}
+        atualizados = db.execute(
+            update(self.tabela).where(self.tabela.c.tabela == modelo.__tablename__).values(**valores)
+        ).rowcount
+        if not atualizados:
+            try:
+                db.execute(insert(self.tabela).values(tabela=modelo.__tablename__, **valores))
+            except IntegrityError:
+                # outro worker criou o contador ao mesmo tempo
+                db.rollback()
+                return total
+        db.commit()
+        return total
+
+    # Agenda reconciliar() numa sessão de escrita; uma por tabela de cada vez
+    def agendar_reconciliacao(self, modelo):
+        if self.sessoes_escrita is None:
+            return
+        with self._lock:
+            if modelo.__tablename__ not in self._agendadas:
+                self._agendadas[modelo.__tablename__] = self._executor.submit(self._reconciliar_agendada, modelo)
+
+    def _reconciliar_agendada(self, modelo):
+        try:
+            with self.sessoes_escrita() as db:
+                self.reconciliar(db, modelo)
+        except Exception as e:
+            logging.warning(f"Falha ao reconciliar o contador de {modelo.__tablename__}: {e!r}")
+        finally:
+            with self._lock:
+                self._agendadas.pop(modelo.__tablename__, None)
+
+    # Espera as reconciliações agendadas terminarem
+    def aguardar(self):
+        with self._lock:
+            agendadas = list(self._agendadas.values())
+        for agendada in agendadas:
+            agendada.result()
+
+    # Só lê: com o contador ausente ou velho, conta a tabela na sessão recebida
+    # (que pode ser de leitura) e agenda a gravação
+    def total(self, db, modelo) -> int:
+        linha = db.execute(
+            select(self.tabela.c.total, self.tabela.c.reconciliado_em).where(self.tabela.c.tabela == modelo.__tablename__)
+        ).first()
+        if linha is None or time.time() - linha.reconciliado_em > RECONCILIAR_SEGUNDOS:
+            self.agendar_reconciliacao(modelo)
+            return db.query(func.count()).select_from(modelo).scalar()
+        return linha.total
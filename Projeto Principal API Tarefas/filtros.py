@@ -0,0 +1,105 @@
+# Filtros, ordenação e busca textual das listagens, sempre como condições que
+# usam índice: igualdade, prefixo como intervalo (col >= 'ab' AND col < 'ac',
+# já que no SQLite o LIKE 'ab%' não usa o índice) e busca textual por FTS5 no
+# SQLite (tabela virtual "<tabela>_busca", mantida por triggers) ou por índice
+# GIN de tsvector no PostgreSQL. Nos outros bancos a busca cai para LIKE.
+import re
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from sqlalchemy import and_, column, or_, text
+
+
+def prefixo(coluna, valor: str):
+    if valor[-1] == chr(0x10FFFF):
+        return coluna >= valor
+    return and_(coluna >= valor, coluna < valor[:-1] + chr(ord(valor[-1]) + 1))
+
+
+# `ordenar` é o nome de um dos `campos` (nome público -> coluna), com "-" na
+# frente para ordem decrescente. O id entra como desempate, para a ordem ser
+# estável entre páginas. Retorna None para a ordem padrão (por id).
+def ordenacao(ordenar: str, campos: dict, id):
+    if not ordenar or ordenar == "id":
+        return None
+    nome = ordenar.removeprefix("-")
+    if nome not in campos:
+        raise HTTPException(status_code=400, detail=f"Ordenação inválida. Use um destes campos: {', '.join(campos)}.")
+    if ordenar.startswith("-"):
+        return [campos[nome].desc(), id.desc()]
+    return [campos[nome], id]
+
+
+# Trecho da chave de cache com os filtros ativos, em ordem fixa e com os
+# valores escapados (ex.: ":autor=Machado%20de%20Assis:ordenar=-ano")
+def chave(separador: str, **filtros) -> str:
+    return "".join(
+        f"{separador}{nome}={quote(str(valor), safe='')}"
+        for nome, valor in sorted(filtros.items())
+        if valor is not None and valor != ""
+    )
+
+
+def termos(texto: str) -> list:
+    return re.findall(r"\w+", texto or "")
+
+
+def _nome_indice(tabela) -> str:
+    return f"{tabela.name.lower()}_busca"
+
+
+def _documento(conn, colunas) -> str:
+    citar = conn.dialect.identifier_preparer.quote
+    return " || ' ' || ".join(f"coalesce({citar(coluna)}, '')" for coluna in colunas)
+
+
+# Cria o índice de busca textual sobre `colunas` (usado pelas migrações)
+def criar_indice_busca(conn, tabela, colunas: list):
+    nome = _nome_indice(tabela)
+    citar = conn.dialect.identifier_preparer.quote
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nome} ON {citar(tabela.name)} USING gin (to_tsvector('simple', {_documento(conn, colunas)}))"))
+        return
+    if conn.dialect.name != "sqlite":
+        return
+
+    lista = ", ".join(citar(coluna) for coluna in colunas)
+    novos = ", ".join(f"new.{citar(coluna)}" for coluna in colunas)
+    antigos = ", ".join(f"old.{citar(coluna)}" for coluna in colunas)
+    comandos = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {nome} USING fts5({lista}, content='{tabela.name}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {nome}_ai AFTER INSERT ON {citar(tabela.name)} BEGIN "
+        f"INSERT INTO {nome}(rowid, {lista}) VALUES (new.id, {novos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {nome}_ad AFTER DELETE ON {citar(tabela.name)} BEGIN "
+        f"INSERT INTO {nome}({nome}, rowid, {lista}) VALUES ('delete', old.id, {antigos}); END",
+        # só quando muda uma coluna indexada (ex.: concluir uma tarefa não toca o índice)
+        f"CREATE TRIGGER IF NOT EXISTS {nome}_au AFTER UPDATE OF {lista} ON {citar(tabela.name)} BEGIN "
+        f"INSERT INTO {nome}({nome}, rowid, {lista}) VALUES ('delete', old.id, {antigos}); "
+        f"INSERT INTO {nome}(rowid, {lista}) VALUES (new.id, {novos}); END",
+        f"INSERT INTO {nome}({nome}) VALUES ('rebuild')",
+    ]
+    for comando in comandos:
+        conn.execute(text(comando))
+
+
+# Filtra `query` pelos registros de `modelo` que contêm todas as palavras de
+# `texto` (cada uma também como prefixo: "pika" encontra "pikachu")
+def buscar(query, modelo, colunas: list, texto: str):
+    palavras = termos(texto)
+    if not palavras:
+        return query
+    tabela = modelo.__table__
+    bind = query.session.get_bind()
+    if bind.dialect.name == "sqlite":
+        nome = _nome_indice(tabela)
+        ids = text(f"SELECT rowid FROM {nome} WHERE {nome} MATCH :consulta").bindparams(
+            consulta=" ".join(f'"{palavra}"*' for palavra in palavras)
+        )
+        return query.filter(tabela.c.id.in_(ids.columns(column("rowid"))))
+    if bind.dialect.name == "postgresql":
+        return query.filter(
+            text(f"to_tsvector('simple', {_documento(bind, colunas)}) @@ to_tsquery('simple', :consulta)").bindparams(
+                consulta=" & ".join(f"{palavra}:*" for palavra in palavras)
+            )
+        )
+    return query.filter(*(or_(*(tabela.c[coluna].ilike(f"%{palavra}%") for coluna in colunas)) for palavra in palavras))
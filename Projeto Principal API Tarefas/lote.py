@@ -0,0 +1,218 @@
+# Operações em lote: leitura de arrays JSON/NDJSON e escrita set-based
+# (um INSERT ... ON CONFLICT, UPDATE ou DELETE em massa por lote)
+import json
+import os
+from collections import Counter
+
+from fastapi import HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, insert, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+LOTE_MAX_ITENS = int(os.getenv("LOTE_MAX_ITENS", 10000))
+# Limita o número de parâmetros por consulta (SQLite aceita no máximo 32766)
+TAMANHO_PARTE = 500
+
+
+def em_partes(itens, tamanho: int = TAMANHO_PARTE):
+    itens = list(itens)
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+
+async def _linhas(request: Request):
+    resto = b""
+    async for parte in request.stream():
+        resto += parte
+        *linhas, resto = resto.split(b"\n")
+        for linha in linhas:
+            yield linha
+    if resto:
+        yield resto
+
+
+def _erro(indice: int, erro):
+    return {"indice": indice, "status": "invalido", "erro": erro}
+
+
+# Lê o corpo como array JSON ou, com Content-Type application/x-ndjson, como
+# NDJSON (lido em streaming, linha a linha). Retorna os itens válidos como
+# [(indice, item)] e os resultados dos itens inválidos.
+async def ler_lote(request: Request, tipo):
+    validador = TypeAdapter(tipo)
+    validos, resultados = [], []
+
+    def validar(indice, dados):
+        try:
+            validos.append((indice, validador.validate_python(dados)))
+        except ValidationError as e:
+            resultados.append(_erro(indice, e.errors(include_url=False, include_context=False, include_input=False)))
+
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        indice = 0
+        async for linha in _linhas(request):
+            if not linha.strip():
+                continue
+            if indice >= LOTE_MAX_ITENS:
+                raise HTTPException(status_code=413, detail=f"O lote aceita no máximo {LOTE_MAX_ITENS} itens.")
+            try:
+                validar(indice, json.loads(linha))
+            except ValueError:
+                resultados.append(_erro(indice, "JSON inválido."))
+            indice += 1
+    else:
+        try:
+            corpo = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON inválido.")
+        if not isinstance(corpo, list):
+            raise HTTPException(status_code=400, detail="Envie um array JSON ou NDJSON.")
+        if len(corpo) > LOTE_MAX_ITENS:
+            raise HTTPException(status_code=413, detail=f"O lote aceita no máximo {LOTE_MAX_ITENS} itens.")
+        for indice, dados in enumerate(corpo):
+            validar(indice, dados)
+
+    return validos, resultados
+
+
+def resumir(resultados: list):
+    resultados.sort(key=lambda r: r["indice"])
+    return {"resumo": dict(Counter(r["status"] for r in resultados)), "resultados": resultados}
+
+
+# INSERT com ON CONFLICT, nos bancos que o têm
+INSERTS_COM_CONFLITO = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _ids_existentes(db, modelo, colunas_chave, chaves):
+    existentes = {}
+    for parte in em_partes(chaves):
+        consulta = db.query(modelo.id, *colunas_chave).filter(tuple_(*colunas_chave).in_(parte))
+        for id, *chave in consulta:
+            existentes.setdefault(tuple(chave), id)
+    return existentes
+
+
+# Cria os itens cuja chave (`colunas_chave`, coberta por um índice único)
+# ainda não existe. A unicidade fica com o banco: um único INSERT ... ON
+# CONFLICT DO NOTHING, sem consultar antes; com `atualizar_existentes`, os que
+# já existiam viram um ON CONFLICT DO UPDATE (upsert).
+# `itens` é [(indice, dict de valores)]. Não faz commit.
+def criar_em_lote(db, modelo, colunas_chave, itens, atualizar_existentes: bool = False, contadores=None):
+    resultados = []
+    por_chave = {}
+    for indice, valores in itens:
+        chave = tuple(valores[coluna.key] for coluna in colunas_chave)
+        if chave in por_chave:
+            resultados.append({"indice": indice, "status": "duplicado_no_lote"})
+        else:
+            por_chave[chave] = (indice, valores)
+
+    insert_com_conflito = INSERTS_COM_CONFLITO.get(db.get_bind().dialect.name)
+    if insert_com_conflito is None:
+        return resultados + _criar_com_consulta(db, modelo, colunas_chave, por_chave, atualizar_existentes, contadores)
+    if not por_chave:
+        return resultados
+
+    comando = insert_com_conflito(modelo).on_conflict_do_nothing(index_elements=colunas_chave)
+    linhas = db.execute(comando.returning(modelo.id, *colunas_chave), [valores for _, valores in por_chave.values()])
+    criados = {tuple(chave): id for id, *chave in linhas}
+    resultados += [{"indice": indice, "status": "criado", "id": criados[chave]} for chave, (indice, _) in por_chave.items() if chave in criados]
+    if contadores is not None and criados:
+        contadores.ajustar(db, modelo, len(criados))
+
+    repetidos = {chave: item for chave, item in por_chave.items() if chave not in criados}
+    if not repetidos:
+        return resultados
+    if atualizar_existentes:
+        comando = insert_com_conflito(modelo)
+        nomes_chave = {coluna.key for coluna in colunas_chave}
+        colunas = dict.fromkeys(nome for _, valores in repetidos.values() for nome in valores if nome not in nomes_chave)
+        comando = comando.on_conflict_do_update(index_elements=colunas_chave, set_={nome: comando.excluded[nome] for nome in colunas})
+        linhas = db.execute(comando.returning(modelo.id, *colunas_chave), [valores for _, valores in repetidos.values()])
+        atualizados = {tuple(chave): id for id, *chave in linhas}
+        resultados += [{"indice": indice, "status": "atualizado", "id": atualizados.get(chave)} for chave, (indice, _) in repetidos.items()]
+    else:
+        existentes = _ids_existentes(db, modelo, colunas_chave, repetidos)
+        resultados += [{"indice": indice, "status": "duplicado", "id": existentes.get(chave)} for chave, (indice, _) in repetidos.items()]
+    return resultados
+
+
+# Caminho para bancos sem ON CONFLICT: uma consulta de duplicados por parte e
+# INSERT/UPDATE em massa
+def _criar_com_consulta(db, modelo, colunas_chave, por_chave, atualizar_existentes, contadores):
+    resultados = []
+    existentes = _ids_existentes(db, modelo, colunas_chave, por_chave)
+    novos = [(indice, valores) for chave, (indice, valores) in por_chave.items() if chave not in existentes]
+    if novos:
+        ids = db.execute(
+            insert(modelo).returning(modelo.id, sort_by_parameter_order=True),
+            [valores for _, valores in novos],
+        ).scalars().all()
+        resultados += [{"indice": indice, "status": "criado", "id": id} for (indice, _), id in zip(novos, ids)]
+        if contadores is not None:
+            contadores.ajustar(db, modelo, len(ids))
+
+    repetidos = [(existentes[chave], indice, valores) for chave, (indice, valores) in por_chave.items() if chave in existentes]
+    if atualizar_existentes and repetidos:
+        db.execute(update(modelo), [{"id": id, **valores} for id, _, valores in repetidos])
+        resultados += [{"indice": indice, "status": "atualizado", "id": id} for id, indice, _ in repetidos]
+    else:
+        resultados += [{"indice": indice, "status": "duplicado", "id": id} for id, indice, _ in repetidos]
+
+    return resultados
+
+
+def _ids_por_valor(db, modelo, coluna, valores):
+    ids = {}
+    for parte in em_partes(set(valores)):
+        for id, valor in db.query(modelo.id, coluna).filter(coluna.in_(parte)).order_by(modelo.id):
+            ids.setdefault(valor, id)
+    return ids
+
+
+def _atualizar(db, modelo, linhas):
+    with db.begin_nested():
+        db.execute(update(modelo), linhas)
+
+
+# Atualiza em massa os registros localizados por `coluna` (o primeiro de cada
+# valor, como nos endpoints unitários). `itens` é [(indice, valor, dict)].
+# Um item que colidiria com outro registro no índice único fica como
+# "duplicado": o UPDATE em massa roda num savepoint e, se falhar, os itens são
+# refeitos um a um, cada um no seu.
+def atualizar_em_lote(db, modelo, coluna, itens):
+    ids = _ids_por_valor(db, modelo, coluna, [valor for _, valor, _ in itens])
+    encontrados = [(indice, ids[valor], valores) for indice, valor, valores in itens if valor in ids]
+    duplicados = set()
+    if encontrados:
+        try:
+            _atualizar(db, modelo, [{"id": id, **valores} for _, id, valores in encontrados])
+        except IntegrityError:
+            for indice, id, valores in encontrados:
+                try:
+                    _atualizar(db, modelo, [{"id": id, **valores}])
+                except IntegrityError:
+                    duplicados.add(indice)
+    resultados = [{"indice": indice, "status": "duplicado" if indice in duplicados else "atualizado", "id": id} for indice, id, _ in encontrados]
+    resultados += [{"indice": indice, "status": "nao_encontrado"} for indice, valor, _ in itens if valor not in ids]
+    return resultados
+
+
+# Remove em massa os registros localizados por `coluna`. `itens` é [(indice, valor)].
+def remover_em_lote(db, modelo, coluna, itens, contadores=None):
+    ids = _ids_por_valor(db, modelo, coluna, [valor for _, valor in itens])
+    resultados, removidos = [], set()
+    for indice, valor in itens:
+        if valor in ids and ids[valor] not in removidos:
+            removidos.add(ids[valor])
+            resultados.append({"indice": indice, "status": "removido", "id": ids[valor]})
+        else:
+            resultados.append({"indice": indice, "status": "nao_encontrado"})
+    for parte in em_partes(removidos):
+        db.execute(delete(modelo).where(modelo.id.in_(parte)))
+    if contadores is not None and removidos:
+        contadores.ajustar(db, modelo, -len(removidos))
+    return resultados
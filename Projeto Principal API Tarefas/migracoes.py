@@ -0,0 +1,109 @@
+# Migrações de schema numeradas. O create_all só cria as tabelas que ainda não
+# existem; mudanças em tabelas já criadas (índices, constraints) ficam numa
+# lista de funções, aplicadas em ordem, e o banco guarda em schema_versao a
+# última aplicada. Cada migração roda na sua própria transação e deve ser
+# idempotente, porque num banco novo o create_all já criou o schema final.
+import logging
+import os
+
+from sqlalchemy import Column, Integer, MetaData, Table, and_, delete, func, insert, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+# Com 1, criar_indice_unico apaga as linhas repetidas na chave do índice (fica
+# a de menor id) e registra os ids apagados; sem isso, a migração para e lista
+# as chaves repetidas, para a limpeza manual
+REMOVER_DUPLICADOS = os.getenv("MIGRACOES_REMOVER_DUPLICADOS", "0").lower() in ("1", "true", "sim")
+# Chaves repetidas listadas na mensagem de erro
+CHAVES_NO_ERRO = 20
+
+
+class ChavesRepetidas(Exception):
+    pass
+
+
+metadata = MetaData()
+schema_versao = Table(
+    "schema_versao",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("versao", Integer, nullable=False),
+)
+
+
+def versao_atual(conn) -> int:
+    return conn.execute(select(schema_versao.c.versao).where(schema_versao.c.id == 1)).scalar() or 0
+
+
+# `migracoes`: lista de funções (conn) -> None; a posição na lista é a versão
+def aplicar(engine, migracoes: list) -> int:
+    metadata.create_all(bind=engine)
+    try:
+        with engine.begin() as conn:
+            if conn.execute(select(schema_versao.c.id)).first() is None:
+                conn.execute(insert(schema_versao).values(id=1, versao=0))
+    except IntegrityError:
+        # outro worker registrou a versão ao mesmo tempo
+        pass
+
+    with engine.connect() as conn:
+        versao = versao_atual(conn)
+    for numero, migracao in enumerate(migracoes[versao:], start=versao + 1):
+        with engine.begin() as conn:
+            migracao(conn)
+            conn.execute(update(schema_versao).where(schema_versao.c.id == 1).values(versao=numero))
+        logging.info(f"Migração {numero} ({migracao.__name__}) aplicada.")
+    return max(versao, len(migracoes))
+
+
+def indices(conn, tabela: str) -> set:
+    return {indice["name"] for indice in inspect(conn).get_indexes(tabela)}
+
+
+def remover_indices(conn, tabela: str, nomes: list):
+    existentes = indices(conn, tabela)
+    for nome in nomes:
+        if nome in existentes:
+            conn.execute(text(f"DROP INDEX {conn.dialect.identifier_preparer.quote(nome)}"))
+
+
+def _declarado(tabela: Table, nome: str):
+    return next(indice for indice in tabela.indexes if indice.name == nome)
+
+
+# Cria o índice `nome`, declarado no modelo, se ainda não existir
+def criar_indice(conn, tabela: Table, nome: str):
+    if nome not in indices(conn, tabela.name):
+        _declarado(tabela, nome).create(conn)
+
+
+# Cria o índice único `nome`, declarado no modelo, se ainda não existir. Se
+# houver linhas repetidas na chave (que impediriam a criação), levanta
+# ChavesRepetidas com elas ou, com MIGRACOES_REMOVER_DUPLICADOS=1, apaga as
+# repetidas (fica a de menor id). Linhas com NULL na chave não colidem no
+# índice e nunca são apagadas. Retorna quantas linhas foram removidas.
+def criar_indice_unico(conn, tabela: Table, nome: str) -> int:
+    if nome in indices(conn, tabela.name):
+        return 0
+    indice = _declarado(tabela, nome)
+    colunas = list(indice.columns)
+    completas = and_(*(coluna.is_not(None) for coluna in colunas))
+    repetidas = conn.execute(
+        select(*colunas, func.count()).where(completas).group_by(*colunas).having(func.count() > 1).limit(CHAVES_NO_ERRO + 1)
+    ).all()
+    if repetidas and not REMOVER_DUPLICADOS:
+        chaves = "; ".join(f"{tuple(linha[:-1])} x{linha[-1]}" for linha in repetidas[:CHAVES_NO_ERRO])
+        mais = " e outras" if len(repetidas) > CHAVES_NO_ERRO else ""
+        raise ChavesRepetidas(
+            f"Não foi possível criar o índice único {nome}: há linhas repetidas em "
+            f"{tabela.name} ({', '.join(coluna.name for coluna in colunas)}): {chaves}{mais}. "
+            f"Remova as repetidas ou rode com MIGRACOES_REMOVER_DUPLICADOS=1 para manter só a de menor id."
+        )
+
+    manter = select(func.min(tabela.c.id)).where(completas).group_by(*colunas)
+    ids = conn.execute(select(tabela.c.id).where(completas, tabela.c.id.not_in(manter)).order_by(tabela.c.id)).scalars().all()
+    if ids:
+        logging.warning(f"Migração do índice {nome}: {len(ids)} linhas repetidas removidas de {tabela.name} (ids {ids}).")
+        for inicio in range(0, len(ids), 500):
+            conn.execute(delete(tabela).where(tabela.c.id.in_(ids[inicio:inicio + 500])))
+    indice.create(conn)
+    return len(ids)
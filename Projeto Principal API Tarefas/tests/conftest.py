@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app cria o schema e lê as credenciais na importação
+os.environ.setdefault("database_url", f"sqlite:///{tempfile.mkdtemp()}/tarefas.db")
+os.environ.setdefault("login", "usuario")
+os.environ.setdefault("senha", "senha")
+os.environ.setdefault("AUTH_SEGREDO", "segredo-dos-testes")
+
+import app
+import migracoes
+
+AUTH = (os.environ["login"], os.environ["senha"])
+
+
+# Banco SQLite em memória isolado por teste, injetado no lugar das sessões de app
+@pytest.fixture
+def sessao(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    app.Base.metadata.create_all(bind=engine)
+    migracoes.aplicar(engine, app.MIGRACOES)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def sessao_db():
+        db = Sessao()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    for dependencia in (app.sessao_db, app.sessao_leitura, app.sessao_db_sync):
+        monkeypatch.setitem(app.app.dependency_overrides, dependencia, sessao_db)
+    monkeypatch.setattr(app.contadores, "sessoes_escrita", Sessao)
+    yield Sessao
+    app.contadores.aguardar()
@@ -0,0 +1,175 @@
+import base64
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasicCredentials
+from fastapi.testclient import TestClient
+
+import autenticacao
+from autenticacao import Autenticador
+import app
+from conftest import AUTH
+
+# Poucas iterações: os testes verificam o formato, não o custo do hash
+HASH_SENHA = autenticacao.gerar_hash("senha", iteracoes=1000)
+
+
+def contar_hashes(monkeypatch):
+    chamadas = []
+    verificar = autenticacao.verificar_hash
+
+    def contando(senha, armazenado):
+        chamadas.append(armazenado)
+        return verificar(senha, armazenado)
+
+    monkeypatch.setattr(autenticacao, "verificar_hash", contando)
+    return chamadas
+
+
+def test_hash_pbkdf2():
+    armazenado = autenticacao.gerar_hash("senha", iteracoes=1000, sal="sal")
+
+    assert armazenado.startswith("pbkdf2_sha256$1000$sal$")
+    assert autenticacao.verificar_hash("senha", armazenado)
+    assert not autenticacao.verificar_hash("outra", armazenado)
+    assert autenticacao.gerar_hash("senha", iteracoes=1000) != autenticacao.gerar_hash("senha", iteracoes=1000)
+
+
+def test_senha_em_claro_ainda_e_aceita():
+    autenticador = Autenticador({"ana": "senha"})
+
+    assert autenticador.verificar_senha("ana", "senha")
+    assert not autenticador.verificar_senha("ana", "senh")
+
+
+def test_usuario_inexistente_paga_o_hash_falso(monkeypatch):
+    autenticador = Autenticador({"ana": HASH_SENHA})
+    chamadas = contar_hashes(monkeypatch)
+
+    assert not autenticador.verificar_senha("bia", "senha")
+    assert chamadas == [autenticador._hash_falso]
+
+
+def test_cache_evita_o_hash_e_nao_guarda_erros(monkeypatch):
+    autenticador = Autenticador({"ana": HASH_SENHA})
+    chamadas = contar_hashes(monkeypatch)
+
+    assert autenticador.verificar_senha("ana", "senha")
+    assert autenticador.verificar_senha("ana", "senha")
+    assert not autenticador.verificar_senha("ana", "errada")
+    assert not autenticador.verificar_senha("ana", "errada")
+
+    assert len(chamadas) == 3
+
+
+def test_cache_expira_pelo_ttl(monkeypatch):
+    autenticador = Autenticador({"ana": HASH_SENHA}, cache_ttl=10)
+    chamadas = contar_hashes(monkeypatch)
+    agora = time.monotonic()
+    monkeypatch.setattr(autenticacao.time, "monotonic", lambda: agora)
+    autenticador.verificar_senha("ana", "senha")
+
+    monkeypatch.setattr(autenticacao.time, "monotonic", lambda: agora + 11)
+    assert autenticador.verificar_senha("ana", "senha")
+    assert len(chamadas) == 2
+
+
+def test_cache_descarta_o_menos_usado(monkeypatch):
+    autenticador = Autenticador({"ana": HASH_SENHA, "bia": HASH_SENHA, "caio": HASH_SENHA}, cache_tamanho=2)
+    chamadas = contar_hashes(monkeypatch)
+    for usuario in ("ana", "bia", "ana", "caio"):
+        autenticador.verificar_senha(usuario, "senha")
+    chamadas.clear()
+
+    autenticador.verificar_senha("ana", "senha")
+    autenticador.verificar_senha("caio", "senha")
+    assert chamadas == []
+    autenticador.verificar_senha("bia", "senha")
+    assert len(chamadas) == 1
+
+
+def test_token_valido():
+    autenticador = Autenticador({"ana": HASH_SENHA}, segredo="s")
+
+    assert autenticador.validar_token(autenticador.emitir_token("ana")) == "ana"
+    # outro processo com o mesmo segredo aceita o token
+    assert Autenticador({"ana": HASH_SENHA}, segredo="s").validar_token(autenticador.emitir_token("ana")) == "ana"
+
+
+def test_token_expirado(monkeypatch):
+    autenticador = Autenticador({"ana": HASH_SENHA}, segredo="s", token_ttl=60)
+    token = autenticador.emitir_token("ana")
+    agora = time.time()
+
+    monkeypatch.setattr(autenticacao.time, "time", lambda: agora + 61)
+    assert autenticador.validar_token(token) is None
+
+
+def test_token_adulterado():
+    autenticador = Autenticador({"ana": HASH_SENHA, "bia": HASH_SENHA}, segredo="s")
+    dados, _, assinatura = autenticador.emitir_token("ana").partition(".")
+    outro_usuario = base64.urlsafe_b64encode(f"bia:{int(time.time()) + 3600}".encode()).rstrip(b"=").decode()
+
+    assert autenticador.validar_token(f"{outro_usuario}.{assinatura}") is None
+    assert autenticador.validar_token(f"{dados}.{assinatura[:-2]}xx") is None
+    assert autenticador.validar_token(dados) is None
+    assert autenticador.validar_token("lixo") is None
+    assert Autenticador({"ana": HASH_SENHA}, segredo="outro").validar_token(f"{dados}.{assinatura}") is None
+
+
+def test_token_de_usuario_removido():
+    autenticador = Autenticador({"ana": HASH_SENHA}, segredo="s")
+    token = autenticador.emitir_token("ana")
+
+    assert Autenticador({"bia": HASH_SENHA}, segredo="s").validar_token(token) is None
+
+
+def test_autenticar_por_basic_ou_bearer():
+    autenticador = Autenticador({"ana": HASH_SENHA}, segredo="s")
+    token = HTTPAuthorizationCredentials(scheme="Bearer", credentials=autenticador.emitir_token("ana"))
+
+    assert autenticador.autenticar(HTTPBasicCredentials(username="ana", password="senha")) == "ana"
+    assert autenticador.autenticar(HTTPBasicCredentials(username="ana", password="errada")) is None
+    assert autenticador.autenticar(bearer=token) == "ana"
+    # com Bearer, o Basic não é considerado
+    assert autenticador.autenticar(HTTPBasicCredentials(username="ana", password="senha"), HTTPAuthorizationCredentials(scheme="Bearer", credentials="lixo")) is None
+    assert autenticador.autenticar() is None
+
+
+# Endpoints
+
+client = TestClient(app.app)
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_endpoint_com_basic(sessao):
+    assert client.get("/tarefas", auth=AUTH).status_code == 200
+    assert client.get("/tarefas", auth=(AUTH[0], "errada")).status_code == 401
+    resposta = client.get("/tarefas")
+    assert resposta.status_code == 401
+    assert resposta.headers["WWW-Authenticate"] == "Basic"
+
+
+def test_endpoint_com_token(sessao):
+    emitido = client.post("/token", auth=AUTH).json()
+
+    assert emitido["token_type"] == "bearer"
+    assert emitido["expires_in"] == app.autenticador.token_ttl
+    assert client.get("/tarefas", headers=bearer(emitido["access_token"])).status_code == 200
+    assert client.get("/tarefas", headers=bearer(emitido["access_token"] + "x")).status_code == 401
+
+
+def test_token_com_senha_errada(sessao):
+    assert client.post("/token", auth=(AUTH[0], "errada")).status_code == 401
+    assert client.post("/token").status_code == 401
+
+
+def test_endpoint_com_token_expirado(sessao, monkeypatch):
+    monkeypatch.setattr(app.autenticador, "token_ttl", -1)
+    token = client.post("/token", auth=AUTH).json()["access_token"]
+
+    assert client.get("/tarefas", headers=bearer(token)).status_code == 401
@@ -0,0 +1,61 @@
+import email.utils
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+import app
+from conftest import AUTH
+
+client = TestClient(app.app)
+
+# Instante fixo e antigo, para o Last-Modified não cair no segundo atual
+ANTES = 1_700_000_000.5
+
+
+def envelhecer(Sessao, instante=ANTES):
+    with Sessao() as db:
+        db.execute(update(app.UltimaEscritaDB).values(modificado_em=instante))
+        db.commit()
+
+
+def adicionar(nome):
+    response = client.post("/adicionar", json={"nome": nome, "descricao": "d"}, auth=AUTH)
+    assert response.status_code == 200
+
+
+def test_last_modified_e_if_modified_since(sessao):
+    adicionar("t1")
+    envelhecer(sessao)
+
+    response = client.get("/tarefas", auth=AUTH)
+    ultima = response.headers["last-modified"]
+    anterior = email.utils.formatdate(ANTES - 1, usegmt=True)
+
+    assert ultima == email.utils.formatdate(int(ANTES), usegmt=True)
+    assert client.get("/tarefas", headers={"If-Modified-Since": ultima}, auth=AUTH).status_code == 304
+    assert client.get("/tarefas", headers={"If-Modified-Since": anterior}, auth=AUTH).status_code == 200
+
+
+def test_escrita_invalida_o_if_modified_since(sessao):
+    adicionar("t1")
+    envelhecer(sessao)
+    ultima = client.get("/tarefas", auth=AUTH).headers["last-modified"]
+
+    adicionar("t2")
+    response = client.get("/tarefas", headers={"If-Modified-Since": ultima}, auth=AUTH)
+
+    assert response.status_code == 200
+    assert [t["Nome"] for t in response.json()["Tarefas"]] == ["t1", "t2"]
+    # Escrita no segundo atual: sem Last-Modified até o segundo virar
+    assert "last-modified" not in response.headers
+
+
+def test_remocao_tambem_marca_a_escrita(sessao):
+    adicionar("t1")
+    envelhecer(sessao)
+
+    assert client.delete("/deletar/t1", auth=AUTH).status_code == 200
+    with sessao() as db:
+        assert app.ultima_escrita(db) > ANTES